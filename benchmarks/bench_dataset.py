@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# Dataset file formats compared: write, full read, template-key lookup and size on disk
+
+import os
+import io
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import contextlib
+
+os.environ.setdefault('ASSET_LOCALIZATION', 'off')
+os.environ.setdefault('TEMPLATE_DISK_CACHE', '0')
+
+import yaml
+
+from common import load_generate_badge, print_row
+from fixtures import load_payloads
+
+class PureYamlDatasetStore:
+    """dataset.yml written and parsed by PyYAML's Python dumper and loader, what the pipeline used before libyaml."""
+
+    name = 'yaml (python)'
+    file_name = 'dataset-python.yml'
+
+    def write(self, path, data):
+        with open(path, 'w') as file:
+            yaml.dump(data, file, default_flow_style=False, sort_keys=False, allow_unicode=True)
+
+    def read(self, path):
+        with open(path, 'r') as file:
+            return yaml.safe_load(file)
+
+    def get(self, path, keys):
+        data = self.read(path)
+        return {key: data[key] for key in keys if key in data}
+
+def best_ms(function, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return min(times) * 1000, statistics.median(times) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the dataset file formats on the fixture payloads.")
+    parser.add_argument('--size', choices=['small', 'large', 'all'], default='all')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    gb = load_generate_badge()
+    stores = [PureYamlDatasetStore()] + [gb.DATASET_STORES[name] for name in ('yaml', 'json', 'binary')]
+    sizes = ['small', 'large'] if args.size == 'all' else [args.size]
+
+    print_row("format", "size", "write", "read all", "get keys")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            with contextlib.redirect_stdout(io.StringIO()):
+                dataset = gb.patch_dataset_in_memory(gb.flatten_responses(load_payloads(size)))
+            for store in stores:
+                path = os.path.join(work_dir, f'{size}-{store.file_name}')
+                write, _ = best_ms(lambda: store.write(path, dataset), args.repeat)
+                read, _ = best_ms(lambda: store.read(path), args.repeat)
+                get, _ = best_ms(lambda: store.get(path, gb.TEMPLATE_KEYS), args.repeat)
+                # Every format must give back the same template values
+                if store.get(path, gb.TEMPLATE_KEYS) != {key: dataset[key] for key in gb.TEMPLATE_KEYS if key in dataset}:
+                    print(f"\n    FAIL: {store.name} does not round-trip the template keys")
+                    return 1
+                print_row(f"{size} {store.name}", f"{os.path.getsize(path) / 1024:.0f} KB",
+                          f"{write:.2f} ms", f"{read:.2f} ms", f"{get:.2f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# Legacy recursive flatten_json vs the iterative one on synthetic documents of 25k to 200k nodes
+
+import sys
+import argparse
+
+from common import load_generate_badge, best_of, print_row
+
+def make_document(nodes):
+    """A profile-like document with roughly `nodes` nodes: wide lists of small nested records."""
+    records = max(1, nodes // 8)
+    return {"profile": {
+        "activity": [{"id": i, "type": "root", "machine": {"name": f"M{i}", "os": "Linux", "tags": ["a", "b"]}}
+                     for i in range(records)],
+        "team": {"id": 42, "name": "Team"},
+    }}
+
+def make_deep_document(depth):
+    document = {"value": 0}
+    for level in range(depth):
+        document = {"level": level, "child": document}
+    return document
+
+def legacy_flatten(data, parent_key='', sep='_'):
+    """The original recursive implementation, kept as the reference."""
+    items = []
+    if isinstance(data, dict):
+        for k, v in data.items():
+            new_key = f"{parent_key}{sep}{k}" if parent_key else k
+            if isinstance(v, dict):
+                items.extend(legacy_flatten(v, new_key, sep=sep).items())
+            elif isinstance(v, list):
+                for i, item in enumerate(v):
+                    items.extend(legacy_flatten(item, f"{new_key}_{i}", sep=sep).items())
+            else:
+                items.append((new_key, v))
+    elif isinstance(data, list):
+        for i, item in enumerate(data):
+            items.extend(legacy_flatten(item, f"{parent_key}_{i}", sep=sep).items())
+    else:
+        items.append((parent_key, data))
+    return dict(items)
+
+def legacy_with_prefix(document):
+    # The legacy pipeline made one more full copy to add the file prefix
+    return {f"user_{k}": v for k, v in legacy_flatten(document).items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    gb = load_generate_badge()
+
+    print_row("nodes", "keys", "legacy", "iterative", "ns/node")
+    for nodes in (25_000, 50_000, 100_000, 200_000):
+        document = make_document(nodes)
+        legacy_time, legacy_out = best_of(legacy_with_prefix, document, repeat=args.repeat)
+        new_time, new_out = best_of(lambda d: gb.flatten_json(d, prefix='user_'), document, repeat=args.repeat)
+        # Same keys, same values, same order
+        assert list(legacy_out.items()) == list(new_out.items()), "flatteners disagree"
+        print_row(f"{nodes:,}", f"{len(new_out):,}", f"{legacy_time * 1000:.1f} ms", f"{new_time * 1000:.1f} ms",
+                  f"{new_time / nodes * 1e9:.0f}")
+
+    # Depth is no longer bounded by the recursion limit
+    depth = sys.getrecursionlimit() * 2
+    deep = gb.flatten_json(make_deep_document(depth))
+    print(f"\n    depth {depth:,}: {len(deep):,} keys flattened (legacy raises RecursionError)")
+
+    capped = gb.flatten_json(make_document(100_000), max_list_items=20)
+    print(f"    100,000 nodes with max_list_items=20: {len(capped):,} keys")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Metric history at scale: hourly snapshots of many users, then the queries a badge render and a graph make
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from common import load_generate_badge, print_row
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+def snapshots(users, hours, start, seed=0):
+    """Yield (user_id, ts, metrics) hour by hour, with counters that move now and then like a real profile."""
+    rng = random.Random(seed)
+    state = {user_id: {'user_points': rng.randint(0, 5000), 'user_ranking': rng.randint(1, 100000), 'user_owns': rng.randint(0, 300),
+                       'user_system_owns': rng.randint(0, 300), 'user_respects': rng.randint(0, 200),
+                       'user_os_Linux_completion_percentage': round(rng.uniform(0, 100), 2)}
+             for user_id in range(1, users + 1)}
+    for hour in range(hours):
+        ts = start + hour * HOUR
+        for user_id, values in state.items():
+            if rng.random() < 0.05:
+                values['user_points'] += rng.randint(1, 30)
+                values['user_owns'] += 1
+                values['user_os_Linux_completion_percentage'] = min(100.0, round(values['user_os_Linux_completion_percentage'] + 0.37, 2))
+            if rng.random() < 0.2:
+                values['user_ranking'] = max(1, values['user_ranking'] + rng.randint(-50, 50))
+            if rng.random() < 0.01:
+                values['user_respects'] += 1
+            yield user_id, ts, dict(values)
+
+def timed(function, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return min(times) * 1000, statistics.median(times) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a metric history with hourly snapshots and time the queries.")
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=50, help="runs of every query")
+    parser.add_argument('--keep', metavar='FILE', help="write the history to FILE instead of a temporary file")
+    args = parser.parse_args()
+
+    gb = load_generate_badge()
+    now = int(time.time()) // HOUR * HOUR
+    start = now - args.days * DAY
+    hours = args.days * 24
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = args.keep or os.path.join(work_dir, 'history.sqlite3')
+        store = gb.HistoryStore(path, retention='', max_age='0')
+
+        # Write: one transaction per simulated hour, like a batch run over every user
+        started = time.perf_counter()
+        batch, values = [], 0
+        for snapshot in snapshots(args.users, hours, start):
+            batch.append(snapshot)
+            values += len(snapshot[2])
+            if len(batch) == args.users:
+                store.record_many(batch)
+                batch = []
+        elapsed = time.perf_counter() - started
+        stats = store.stats
+        print_row("write", f"{stats['snapshots']} snaps", f"{elapsed:.1f} s", f"{stats['snapshots'] / elapsed:.0f}/s")
+        print_row("delta encoding", f"{values} values", f"{stats['samples']} rows", f"{stats['samples'] / values * 100:.1f}%")
+        print_row("database", f"{os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+        # Queries, on users spread over the whole key range
+        print()
+        print_row("query", "best", "median")
+        gb.history_store.path = path    # history_values() reads the module-level store
+        rng = random.Random(1)
+        user_ids = [rng.randint(1, args.users) for _ in range(args.repeat)]
+        print_row("sample change keys", str(gb.history_values(user_ids[0], ['user_points_change_30d'], now)))
+        queries = {
+            'badge change keys (2)': lambda user_id: gb.history_values(user_id, ['user_points_change_30d', 'user_ranking_change_30d'], now),
+            'latest values': lambda user_id: store.latest(user_id),
+            'series, last 30 days': lambda user_id: store.series(user_id, 'user_points', now - 30 * DAY, now),
+            'year, hourly buckets': lambda user_id: store.downsample(user_id, 'user_ranking', start, now, HOUR),
+            'year, daily buckets': lambda user_id: store.downsample(user_id, 'user_points', start, now, DAY),
+        }
+        for name, query in queries.items():
+            users = iter(user_ids * 2)
+            best, median = timed(lambda: query(next(users)), args.repeat)
+            print_row(name, f"{best:.3f} ms", f"{median:.3f} ms")
+
+        # Retention: daily after 30 days, weekly after a year
+        print()
+        before = store.downsample(user_ids[0], 'user_points', start, now - 31 * DAY, DAY)
+        store.retention = '30d:1d,365d:7d'
+        started = time.perf_counter()
+        removed = store.compact(now)
+        elapsed = time.perf_counter() - started
+        after = store.downsample(user_ids[0], 'user_points', start, now - 31 * DAY, DAY)
+        print_row("compaction", f"{removed} removed", f"{elapsed:.1f} s", "daily kept" if before == after else "DAILY CHANGED")
+        with store.reader() as connection:
+            connection.execute('VACUUM')
+            connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        print_row("database after VACUUM", f"{os.path.getsize(path) / 1024 / 1024:.1f} MB")
+        store.close()
+        gb.history_store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# Cold-start cost of importing the package (python -X importtime), and checks that importing it stays lazy and side-effect free
+
+import os
+import sys
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+from common import ROOT_DIR, print_row
+
+# Modules only the stages that need them may load (rendering, --write-artifacts, --serve, --profile, the metric history)
+LAZY_MODULES = ['PIL', 'imgkit', 'yaml', 'http.server', 'cProfile', 'sqlite3']
+
+def import_time(module, work_dir):
+    """
+    Import `module` in a fresh interpreter.
+    Returns ({module imported on the way: (self us, cumulative us)}, lazy modules that got loaded anyway).
+    """
+    check = f"import sys, {module}; print(' '.join(name for name in {LAZY_MODULES!r} if name in sys.modules))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', check], cwd=work_dir, capture_output=True, text=True,
+                            env={**os.environ, 'PYTHONPATH': ROOT_DIR}, check=True)
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if name.strip() == 'site':
+            timings = {}  # Interpreter startup, what follows is the import being measured
+            continue
+        timings[name.strip()] = (int(own), int(cumulative))
+    return timings, result.stdout.split()
+
+def main():
+    parser = argparse.ArgumentParser(description="Time a cold import of the package with python -X importtime.")
+    parser.add_argument('--module', default='htb_badge.cli', help="module to import (default: htb_badge.cli, what generate-badge.py loads)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="slowest packages to list")
+    parser.add_argument('--max-ms', type=float, help="exit 1 when the median import time is above this")
+    args = parser.parse_args()
+
+    failures = []
+    runs = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for _ in range(args.repeat):
+            timings, loaded = import_time(args.module, work_dir)
+            runs.append(timings)
+            if loaded:
+                failures.append(f"importing {args.module} loaded {', '.join(loaded)}")
+        # Importing must not create data/ or any cache directory
+        created = os.listdir(work_dir)
+        if created:
+            failures.append(f"importing {args.module} created {', '.join(sorted(created))}")
+
+    totals = [timings[args.module][1] / 1000 for timings in runs]
+    print_row("import", "best", "median")
+    print_row(args.module, f"{min(totals):.1f} ms", f"{statistics.median(totals):.1f} ms")
+
+    # Top-level packages pulled in along the way (nested ones count in their parent too), slowest first
+    print()
+    print_row("slowest packages", "self", "cumulative")
+    names = {name for name in runs[0] if '.' not in name and name != 'htb_badge'}
+    cumulative = {name: statistics.median(timings.get(name, (0, 0))[1] for timings in runs) for name in names}
+    for name in sorted(cumulative, key=cumulative.get, reverse=True)[:args.top]:
+        own = statistics.median(timings.get(name, (0, 0))[0] for timings in runs)
+        print_row(name, f"{own / 1000:.1f} ms", f"{cumulative[name] / 1000:.1f} ms")
+
+    if args.max_ms is not None and statistics.median(totals) > args.max_ms:
+        failures.append(f"median import time {statistics.median(totals):.1f} ms is above {args.max_ms:.1f} ms")
+    for failure in failures:
+        print(f"\n    FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# Legacy line-concatenation JSON reader vs the streaming decoder on large multi-object files
+
+import json
+import argparse
+
+from common import load_generate_badge, best_of, print_row
+
+def make_document(objects, entries):
+    """`objects` pretty-printed activity payloads of `entries` items each, written back to back like the UD* files."""
+    payload = {"profile": {"activity": [
+        {"id": i, "date": "2024-10-01T10:00:00.000000Z", "date_diff": f"{i} days ago", "object_type": "machine",
+         "type": "root", "name": f"Machine {i}", "points": i % 50, "machine_avatar": f"/storage/avatars/{i}.png"}
+        for i in range(entries)
+    ]}}
+    return "\n".join(json.dumps(payload, indent=4) for _ in range(objects))
+
+def make_nested_document(depth):
+    """A deeply nested object: every closing line ends with '}', the worst case for the legacy reader."""
+    payload = {"value": 0}
+    for level in range(depth):
+        payload = {"level": level, "child": payload}
+    return json.dumps(payload, indent=4)
+
+def legacy_decode(text):
+    """The original reader: concatenate stripped lines and try json.loads whenever a line ends with '}'."""
+    json_objects = []
+    current_json = ''
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            current_json += line
+        if line.endswith('}'):
+            try:
+                json_objects.append(json.loads(current_json))
+                current_json = ''
+            except json.JSONDecodeError:
+                pass
+    return json_objects
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    gb = load_generate_badge()
+
+    print_row("document", "size", "legacy", "streaming", "speedup")
+    documents = [(f"{objects} x {entries}", make_document(objects, entries))
+                 for objects, entries in ((1, 100), (1, 1000), (4, 1000), (4, 3000))]
+    documents += [(f"nested depth {depth}", make_nested_document(depth)) for depth in (100, 500)]
+
+    for name, text in documents:
+        legacy_time, legacy_objects = best_of(legacy_decode, text, repeat=args.repeat)
+        stream_time, stream_objects = best_of(lambda t: list(gb.iter_json_objects(t)), text, repeat=args.repeat)
+        assert legacy_objects == stream_objects, "decoders disagree"
+        print_row(name, f"{len(text) / 1024:.0f} KB", f"{legacy_time * 1000:.1f} ms",
+                  f"{stream_time * 1000:.1f} ms", f"{legacy_time / stream_time:.0f}x")
+
+    # Malformed input is reported, not skipped
+    try:
+        list(gb.iter_json_objects('{"a": 1}\n{"b": }'))
+    except json.JSONDecodeError as e:
+        print(f"\n    malformed input reported at line {e.lineno}, column {e.colno}: {e.msg}")
+
+if __name__ == "__main__":
+    main()
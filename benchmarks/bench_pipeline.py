@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# Offline timing of every pipeline stage on the fixture payloads, with JSON output and a compare mode
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+import contextlib
+
+from datetime import datetime, timezone
+
+# Keep the run offline and out of the repository caches (read when htb_badge.config is imported)
+os.environ.setdefault('ASSET_LOCALIZATION', 'off')
+os.environ.setdefault('TEMPLATE_DISK_CACHE', '0')
+os.environ.setdefault('API_RATE_LIMIT', '0')
+
+import yaml
+
+from common import load_generate_badge, print_row
+from fixtures import USER_ID, load_payloads
+from stub_api import StubApi
+from bench_transparency import make_badge
+
+STAGES = ['fetch', 'flatten', 'json_to_flat_yaml', 'clean_file', 'patch_in_memory', 'yaml_load',
+          'placeholders', 'html_to_png', 'transparency', 'svg']
+
+# Regressions smaller than this (in %) are treated as noise by --compare
+DEFAULT_THRESHOLD = 10.0
+
+def measure(function, repeat):
+    """Time `repeat` quiet runs of function(), then one more under tracemalloc for the peak Python allocation."""
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - started)
+        tracemalloc.start()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'best_ms': round(min(times) * 1000, 3),
+        'median_ms': round(statistics.median(times) * 1000, 3),
+        'peak_kb': round(peak / 1024, 1),
+        'runs': repeat,
+    }
+
+def bench_size(gb, size, repeat, stages, work_dir, latency):
+    """Run the selected stages on one fixture size. Returns {stage: result}."""
+    payloads = load_payloads(size)
+    results = {}
+
+    def run(stage, function, stage_repeat=repeat):
+        if stage in stages:
+            results[stage] = measure(function, stage_repeat)
+            result = results[stage]
+            print_row(f"{size} {stage}", f"{result['best_ms']:.2f} ms", f"{result['median_ms']:.2f} ms", f"{result['peak_kb']:.0f} KB")
+
+    # Fetch: all 14 endpoints from the local stub, without the response cache or team sharing
+    with StubApi(payloads, latency) as stub:
+        gb.config.API_URL = stub.url
+        gb.http_cache.enabled = False
+        gb.team_data_cache.ttl = 0
+        run('fetch', lambda: gb.fetch_user_data(USER_ID))
+        with contextlib.redirect_stdout(io.StringIO()):
+            responses = gb.fetch_user_data(USER_ID)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        combined = gb.flatten_responses(responses)
+        user_dir = os.path.join(work_dir, size)
+        os.makedirs(user_dir, exist_ok=True)
+        gb.save_responses(responses, user_dir)
+        yaml_path = os.path.join(user_dir, gb.YAML_FILE_NAME)
+        gb.json_to_flat_yaml(yaml_path, user_dir)
+
+    run('flatten', lambda: gb.flatten_responses(responses))
+    run('json_to_flat_yaml', lambda: gb.json_to_flat_yaml(yaml_path, user_dir))
+
+    with open(yaml_path, 'r') as file:
+        lines = file.readlines()
+    run('clean_file', lambda: gb.clean_file(list(lines), gb.PATCH_COMMANDS))
+    run('patch_in_memory', lambda: gb.patch_dataset_in_memory(dict(combined)))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        patched_text = ''.join(gb.patch_lines(list(lines)))
+    run('yaml_load', lambda: yaml.safe_load(patched_text))
+
+    template = gb.compile_template(os.path.join(gb.ROOT_DIR, gb.DIR_TEMPLATES, gb.BADGE_TEMPLATE_NAME))
+    values = gb.get_user_data(yaml.safe_load(patched_text))
+    run('placeholders', lambda: template.render(values))
+
+    if 'html_to_png' in stages:
+        html_path, png_path = os.path.join(user_dir, 'badge.html'), os.path.join(user_dir, 'badge.png')
+        with open(html_path, 'w') as file:
+            file.write(template.render(values)[0])
+        if shutil.which('wkhtmltoimage'):
+            run('html_to_png', lambda: gb.html_to_png_with_transparency(html_path, png_path), max(1, repeat // 3))
+        else:
+            print_row(f"{size} html_to_png", "skipped", "(no wkhtmltoimage)")
+
+    badge = make_badge(1)
+    run('transparency', lambda: gb.make_white_transparent(badge, gb.CHROMA_KEY_TOLERANCE))
+
+    # The native SVG backend replaces both html_to_png and transparency, and must give the same bytes every time
+    run('svg', lambda: gb.render_svg(gb.BADGE_TEMPLATE_NAME, values))
+    if 'svg' in stages and gb.render_svg(gb.BADGE_TEMPLATE_NAME, values) != gb.render_svg(gb.BADGE_TEMPLATE_NAME, dict(values)):
+        print(f"\n    FAIL: the {size} SVG badge is not byte-stable")
+    return results
+
+def compare(old_path, new_path, threshold):
+    """Print the per-stage change between two result files. Returns 1 if any stage got slower than threshold %."""
+    with open(old_path, 'r') as file:
+        old = json.load(file)['results']
+    with open(new_path, 'r') as file:
+        new = json.load(file)['results']
+
+    regressions = 0
+    print_row("stage", "old", "new", "change", "peak change")
+    for size in sorted(set(old) & set(new)):
+        for stage in [stage for stage in STAGES if stage in old[size] and stage in new[size]]:
+            before, after = old[size][stage], new[size][stage]
+            change = (after['best_ms'] - before['best_ms']) / before['best_ms'] * 100 if before['best_ms'] else 0.0
+            peak_change = (after['peak_kb'] - before['peak_kb']) / before['peak_kb'] * 100 if before['peak_kb'] else 0.0
+            flag = ""
+            if change > threshold:
+                flag = "REGRESSION"
+                regressions += 1
+            elif change < -threshold:
+                flag = "faster"
+            print_row(f"{size} {stage}", f"{before['best_ms']:.2f} ms", f"{after['best_ms']:.2f} ms",
+                      f"{change:+.1f}%", f"{peak_change:+.1f}%", flag)
+
+    print(f"\n    {regressions} regression(s) above {threshold:.0f}%")
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every pipeline stage offline on the fixture payloads.")
+    parser.add_argument('--size', choices=['small', 'large', 'all'], default='all')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds the stub API adds to every response")
+    parser.add_argument('--output', metavar='FILE', help="write the results as JSON")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two result files and exit")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="%% slowdown reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare, args.threshold)
+
+    gb = load_generate_badge()
+    sizes = ['small', 'large'] if args.size == 'all' else [args.size]
+
+    print_row("stage", "best", "median", "peak alloc")
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes:
+            results[size] = bench_size(gb, size, args.repeat, set(args.stages), work_dir, args.latency)
+
+    report = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'max_rss_mb': round(gb.get_peak_memory_mb(), 1),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"\n    Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# API calls per run of an hourly schedule, without cache, with the fixed endpoint TTLs and with the learned ones
+
+import os
+import io
+import sys
+import json
+import random
+import argparse
+import tempfile
+import contextlib
+
+# Keep the run offline and out of the repository caches (read when htb_badge.config is imported)
+os.environ.setdefault('ASSET_LOCALIZATION', 'off')
+os.environ.setdefault('TEMPLATE_DISK_CACHE', '0')
+os.environ.setdefault('API_RATE_LIMIT', '0')
+
+from common import load_generate_badge, print_row
+from fixtures import USER_ID, load_payloads
+from stub_api import StubApi
+
+HOUR = 3600
+
+# Chance that an endpoint's payload changes within an hour, for an active player
+CHANGE_RATES = {
+    'user': 0.25, 'user_activity': 0.25, 'user_machines': 0.08, 'user_os': 0.08, 'user_challenges': 0.05,
+    'user_fortresses': 0.005, 'user_sherlocks': 0.02, 'user_endgames': 0.003, 'user_prolabs': 0.003,
+    'team': 0.1, 'team_bracket': 0.01, 'team_rank_best': 0.003, 'team_machines': 0.1, 'team_challenges': 0.05,
+}
+
+MODES = {
+    'no cache': {'enabled': False, 'adaptive': False},
+    'fixed TTLs': {'enabled': True, 'adaptive': False},
+    'learned TTLs': {'enabled': True, 'adaptive': True},
+}
+
+def change_schedule(hours, activity=1.0, seed=0):
+    """The endpoints whose payload changes before each run, the same for every mode."""
+    rng = random.Random(seed)
+    return [{name for name, rate in CHANGE_RATES.items() if rng.random() < rate * activity} for _ in range(hours)]
+
+def simulate(gb, payloads, schedule, mode, cache_dir):
+    """Run the schedule on a simulated clock. Returns (requests per endpoint, stale payloads served per endpoint)."""
+    clock = [1_700_000_000.0]
+    gb.http_cache.directory = cache_dir
+    gb.http_cache.enabled = mode['enabled']
+    gb.http_cache.adaptive = mode['adaptive']
+    gb.http_cache.clock = lambda: clock[0]
+    gb.team_data_cache.ttl = 0
+
+    revisions = dict.fromkeys(payloads, 0)
+    requests = dict.fromkeys(payloads, 0)
+    stale = dict.fromkeys(payloads, 0)
+    with StubApi(payloads) as stub:
+        gb.config.API_URL = stub.url
+        urls = {**gb.get_user_endpoints(USER_ID), **gb.get_team_endpoints(payloads['user']['profile']['team']['id'])}
+        names = {url[len(stub.url):].split('?', 1)[0]: name for name, url in urls.items()}
+
+        for changed in schedule:
+            for name in changed:
+                revisions[name] += 1
+                stub.bodies[name] = json.dumps({**payloads[name], 'revision': revisions[name]}).encode()
+            before = dict(stub.paths)
+            with contextlib.redirect_stdout(io.StringIO()):
+                responses = gb.fetch_user_data(USER_ID)
+            for path, count in stub.paths.items():
+                name = names[path[len('/api/v4'):]]
+                requests[name] += count - before.get(path, 0)
+            for name, data in responses.items():
+                if data.get('revision', 0) != revisions[name]:
+                    stale[name] += 1
+            clock[0] += HOUR
+    return requests, stale
+
+def main():
+    parser = argparse.ArgumentParser(description="Count the API calls of an hourly schedule with fixed and learned refresh intervals.")
+    parser.add_argument('--days', type=int, default=14)
+    parser.add_argument('--activity', type=float, default=1.0, help="scale the change rates, e.g. 0.1 for a mostly idle player")
+    parser.add_argument('--per-endpoint', action='store_true', help="also print the calls and stale payloads of every endpoint")
+    args = parser.parse_args()
+
+    gb = load_generate_badge()
+    payloads = load_payloads('small')
+    schedule = change_schedule(args.days * 24, args.activity)
+    runs = len(schedule)
+
+    results = {}
+    for mode_name, mode in MODES.items():
+        with tempfile.TemporaryDirectory() as cache_dir:
+            results[mode_name] = simulate(gb, payloads, schedule, mode, cache_dir)
+
+    print_row("mode", "calls/run", "vs no cache", "stale served")
+    baseline = sum(results['no cache'][0].values())
+    for mode_name, (requests, stale) in results.items():
+        total = sum(requests.values())
+        print_row(mode_name, f"{total / runs:.2f}", f"{(total - baseline) / baseline * 100:+.0f}%", f"{sum(stale.values()) / (runs * len(payloads)) * 100:.1f}%")
+
+    if args.per_endpoint:
+        print()
+        print_row("endpoint", *[f"{mode_name[:5]} calls" for mode_name in MODES], "learned stale")
+        for name in payloads:
+            print_row(name, *[str(results[mode_name][0][name]) for mode_name in MODES], str(results['learned TTLs'][1][name]))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# Before/after cost of the white-to-transparent pass on synthetic badges at 1x and 2x size
+
+import argparse
+import warnings
+
+from PIL import Image, ImageDraw
+
+from common import load_generate_badge, best_of, print_row
+
+def make_badge(scale):
+    """A badge-like image: dark rounded panel with anti-aliased text on a white page."""
+    width, height = 950 * scale, 420 * scale
+    img = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    draw.rounded_rectangle((15 * scale, 15 * scale, width - 15 * scale, 360 * scale), radius=28 * scale, fill=(17, 25, 39))
+    for row in range(6):
+        draw.text((60 * scale, (40 + row * 50) * scale), "HTB Metrics 1234 #567", fill=(164, 177, 205))
+    draw.text((60 * scale, 380 * scale), "Last activity: 2 days ago", fill=(0, 0, 0))
+    return img
+
+def legacy_transparency(img):
+    """The original per-pixel loop, kept as the reference implementation."""
+    img = img.convert("RGBA")
+    new_data = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)  # getdata() is deprecated in recent Pillow
+        pixels = list(img.getdata())
+    for item in pixels:
+        if item[:3] == (255, 255, 255):
+            new_data.append((255, 255, 255, 0))
+        else:
+            new_data.append(item)
+    img.putdata(new_data)
+    return img
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    gb = load_generate_badge()
+
+    print_row("size", "legacy", "bands", "chroma-key", "speedup")
+    for scale in (1, 2):
+        img = make_badge(scale)
+        legacy_time, legacy_img = best_of(legacy_transparency, img, repeat=args.repeat)
+        bands_time, bands_img = best_of(gb.make_white_transparent, img, repeat=args.repeat)
+        keyed_time, _ = best_of(gb.make_white_transparent, img, 24, repeat=args.repeat)
+
+        # The band implementation must produce exactly the same pixels as the loop
+        assert legacy_img.tobytes() == bands_img.tobytes(), "output differs from the legacy implementation"
+
+        print_row(f"{scale}x ({img.width}x{img.height})", f"{legacy_time * 1000:.1f} ms", f"{bands_time * 1000:.1f} ms",
+                  f"{keyed_time * 1000:.1f} ms", f"{legacy_time / bands_time:.0f}x")
+
+if __name__ == "__main__":
+    main()
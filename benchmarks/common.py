@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# Shared helpers for the benchmark scripts
+
+import os
+import sys
+import time
+import types
+import importlib
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PACKAGE_MODULES = ['config', 'common', 'trace', 'client', 'transport', 'cache', 'fetch', 'flatten', 'patch',
+                   'dataset', 'history', 'template', 'svg', 'render', 'server', 'pipeline', 'cli']
+
+def load_generate_badge():
+    """
+    Import every htb_badge module and return all their names in one namespace (gb.fetch_user_data, gb.http_cache, ...),
+    plus the modules themselves (gb.config.API_URL is the value to repoint).
+    """
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    names = {}
+    for module_name in PACKAGE_MODULES:
+        module = importlib.import_module(f'htb_badge.{module_name}')
+        names.update((name, value) for name, value in vars(module).items() if not name.startswith('__'))
+        names[module_name] = module
+    return types.SimpleNamespace(**names)
+
+def best_of(function, *args, repeat=5):
+    """Run function(*args) `repeat` times and return (best time in seconds, last result)."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def print_row(name, *columns):
+    print(f"    {name:<32}" + "".join(f"{column:>14}" for column in columns))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# Fixture payloads shaped like the 14 HTB API responses, for a small profile and a very large one
+
+import os
+import sys
+import json
+import random
+import argparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+USER_ID = 780424
+TEAM_ID = 4242
+
+# How many records the list-heavy endpoints return for each profile size
+SIZES = {
+    'small': {'activity': 20, 'fortresses': 4, 'sherlocks': 10, 'endgames': 3, 'prolabs': 3, 'categories': 12, 'members': 10},
+    'large': {'activity': 5000, 'fortresses': 40, 'sherlocks': 1500, 'endgames': 30, 'prolabs': 30, 'categories': 120, 'members': 500},
+}
+
+OPERATING_SYSTEMS = ["Linux", "Windows", "FreeBSD", "OpenBSD", "Solaris", "Android", "Other"]
+ATTACK_PATHS = ["Web", "Active Directory", "Privilege Escalation", "Reversing", "Crypto", "Forensics", "Mobile"]
+CHALLENGE_CATEGORIES = ["Web", "Pwn", "Crypto", "Reversing", "Forensics", "Misc", "Mobile", "OSINT", "Hardware",
+                        "Blockchain", "GamePwn", "Window's Infinity"]
+
+def progress(rng, name, **extra):
+    owned = rng.randint(0, 40)
+    total = owned + rng.randint(0, 60)
+    return {"name": name, "owned_flags": owned, "total_flags": total,
+            "completion_percentage": round(100 * owned / total, 2) if total else 0, **extra}
+
+def build_payloads(size='small', seed=0):
+    """Return {endpoint name: payload} for all 14 endpoints, deterministic for a given size and seed."""
+    counts = SIZES[size]
+    rng = random.Random(seed)
+
+    profile = {"profile": {
+        "id": USER_ID, "sso_id": 1234567, "name": "yonasuriv", "system_owns": 123, "user_owns": 145,
+        "user_bloods": 3, "system_bloods": 2, "respects": 87, "rank": "Elite Hacker", "rank_id": 5,
+        "current_rank_progress": 42.5, "next_rank": "Guru", "next_rank_points": 15.3, "rank_ownership": "57.8",
+        "rank_requirement": 70, "ranking": 312, "points": 4321, "avatar": "/storage/avatars/0123456789abcdef_thumb.png",
+        "timezone": "Europe/Madrid", "country_name": "Spain", "country_code": "ES", "university_name": None,
+        "description": "x" * (40 if size == 'small' else 4000), "github": "https://github.com/yonasuriv",
+        "isVip": True, "isDedicatedVip": False, "public": True,
+        "team": {"id": TEAM_ID, "name": "Fixture Team", "ranking": 77, "avatar": "/storage/teams/team_thumb.png"},
+    }}
+
+    activity = {"profile": {"activity": [
+        {"date": f"2024-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}T10:00:00.000000Z",
+         "date_diff": f"{i + 1} days ago", "object_type": rng.choice(["machine", "challenge", "fortress"]),
+         "type": rng.choice(["user", "root", "challenge"]), "first_blood": rng.random() < 0.02, "id": 1000 + i,
+         "name": f"Target{i}", "points": rng.randint(0, 50), "machine_avatar": f"/storage/avatars/m{i}_thumb.png"}
+        for i in range(counts['activity'])
+    ]}}
+
+    def attack_paths():
+        return {path: {"solved": rng.randint(0, 50), "total": rng.randint(50, 100), "avg_user_solved": rng.randint(0, 50)}
+                for path in ATTACK_PATHS}
+
+    def categories(count):
+        names = [CHALLENGE_CATEGORIES[i % len(CHALLENGE_CATEGORIES)] + ("" if i < len(CHALLENGE_CATEGORIES) else f" {i}")
+                 for i in range(count)]
+        return [progress(rng, name, avg_challenge_owns=rng.randint(0, 40)) for name in names]
+
+    payloads = {
+        "user": profile,
+        "user_machines": {"profile": {"machine_owns": {"solved": 145, "total": 420}, "attack_paths": attack_paths()}},
+        "user_os": {"profile": {"operating_systems": [
+            {"name": os_name, "owned_machines": rng.randint(0, 90), "total_machines": rng.randint(90, 300),
+             "completion_percentage": rng.randint(0, 100)} for os_name in OPERATING_SYSTEMS]}},
+        "user_challenges": {"profile": {"challenge_owns": {"solved": 88, "total": 600},
+                                        "challenge_categories": categories(counts['categories'])}},
+        "user_fortresses": {"profile": {"fortresses": [
+            progress(rng, f"Fortress{i}", id=i, image=f"/storage/fortresses/{i}.png") for i in range(counts['fortresses'])]}},
+        "user_sherlocks": {"profile": {"sherlocks": [
+            progress(rng, f"Sherlock{i}", id=i, difficulty=rng.choice(["Easy", "Medium", "Hard"])) for i in range(counts['sherlocks'])]}},
+        "user_endgames": {"profile": {"endgames": [
+            progress(rng, f"Endgame{i}", id=i, avatar=f"/storage/endgames/{i}.png") for i in range(counts['endgames'])]}},
+        "user_prolabs": {"profile": {"prolabs": [
+            progress(rng, f"ProLab{i}", id=i, certificate=None) for i in range(counts['prolabs'])]}},
+        "user_activity": activity,
+        "team": {"id": TEAM_ID, "name": "Fixture Team", "points": 9876, "motto": "fixtures", "description": "team",
+                 "country_name": "Spain", "country_code": "ES", "public": True,
+                 "captain": {"id": USER_ID, "name": "yonasuriv", "avatar": "/storage/avatars/c_thumb.png"},
+                 "members": [{"id": USER_ID + i, "name": f"member{i}", "rank": rng.randint(1, 8), "points": rng.randint(0, 500)}
+                             for i in range(counts['members'])]},
+        "team_bracket": {"data": {"rank": 77, "points": 9876, "current_bracket": "Top 100", "next_bracket": "Top 50",
+                                  "points_for_next_bracket": 120}},
+        "team_rank_best": {"data": {"rank": 41, "date": "2024-03-01"}},
+        "team_machines": {"data": {"machine_owns": {"solved": 1200, "total": 4200}, "attack_paths": attack_paths()}},
+        "team_challenges": {"data": {"solved": 800, "total": 6000, "challenge_categories": categories(counts['categories'])}},
+    }
+    return payloads
+
+def load_payloads(size='small'):
+    """Read the recorded fixtures from FIXTURES_DIR/<size>, or build them when they are not there."""
+    directory = os.path.join(FIXTURES_DIR, size)
+    if not os.path.isdir(directory):
+        return build_payloads(size)
+    payloads = {}
+    for name in build_payloads('small'):
+        with open(os.path.join(directory, f'{name}.json'), 'r') as file:
+            payloads[name] = json.load(file)
+    return payloads
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the fixture payloads to benchmarks/fixtures/<size>/.")
+    parser.add_argument('sizes', nargs='*', default=['small'], choices=sorted(SIZES))
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        directory = os.path.join(FIXTURES_DIR, size)
+        os.makedirs(directory, exist_ok=True)
+        total = 0
+        for name, payload in build_payloads(size).items():
+            path = os.path.join(directory, f'{name}.json')
+            with open(path, 'w') as file:
+                json.dump(payload, file, indent=1)
+            total += os.path.getsize(path)
+        print(f"    {size}: 14 payloads, {total / 1024:.0f} KB in {directory}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# Local stand-in for the HTB API, serving fixture payloads on a background thread
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+from threading import Lock, Thread
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fixtures import load_payloads
+
+# Endpoint name for every API path (same payload whatever the user or team id)
+ROUTES = [
+    ("user", re.compile(r'^/api/v4/profile/\d+$')),
+    ("user_machines", re.compile(r'^/api/v4/profile/chart/machines/attack/\d+$')),
+    ("user_os", re.compile(r'^/api/v4/profile/progress/machines/os/\d+$')),
+    ("user_challenges", re.compile(r'^/api/v4/profile/progress/challenges/\d+$')),
+    ("user_fortresses", re.compile(r'^/api/v4/profile/progress/fortress/\d+$')),
+    ("user_sherlocks", re.compile(r'^/api/v4/profile/progress/sherlocks/\d+$')),
+    ("user_endgames", re.compile(r'^/api/v4/profile/progress/endgame/\d+$')),
+    ("user_prolabs", re.compile(r'^/api/v4/profile/progress/prolab/\d+$')),
+    ("user_activity", re.compile(r'^/api/v4/profile/activity/\d+$')),
+    ("team", re.compile(r'^/api/v4/public/team/info/\d+$')),
+    ("team_bracket", re.compile(r'^/api/v4/public/rankings/team/ranking_bracket/\d+$')),
+    ("team_rank_best", re.compile(r'^/api/v4/public/rankings/team/best/\d+$')),
+    ("team_machines", re.compile(r'^/api/v4/public/team/chart/machines/attack/\d+$')),
+    ("team_challenges", re.compile(r'^/api/v4/public/team/chart/challenge/categories/\d+$')),
+]
+
+def load_cassette(directory):
+    """Read the API responses recorded with HTTP_TRANSPORT=record (generate-badge.py) as {endpoint name: payload}."""
+    payloads = {}
+    for root, _, file_names in os.walk(os.path.join(directory, 'api')):
+        for file_name in file_names:
+            if not file_name.endswith('.json'):
+                continue
+            with open(os.path.join(root, file_name), 'r') as file:
+                entry = json.load(file)
+            path = urlsplit(entry['url']).path
+            name = next((name for name, pattern in ROUTES if pattern.match(path)), None)
+            if name and entry['status'] == 200:
+                payloads[name] = json.loads(entry['body'])
+    return payloads
+
+class StubApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128    # A whole batch connects at once
+
+class StubApi:
+    """
+    Serves {endpoint name: payload} over HTTP like the HTB API, with an optional per-request latency.
+    Use as a context manager; `url` is the value to give to HTB_API_URL / API_URL.
+    A path in `statuses` is answered with that status code and an empty body instead, with Retry-After: 0 so clients retry at once.
+    """
+
+    def __init__(self, payloads, latency=0.0, host='127.0.0.1', port=0):
+        self.bodies = {name: json.dumps(payload).encode() for name, payload in payloads.items()}
+        self.latency = latency
+        self.requests = 0
+        self.paths = {}         # Requests per path
+        self.statuses = {}      # Path -> status code served instead of its payload
+        self.lock = Lock()
+        self.httpd = StubApiServer((host, port), self.make_handler())
+        self.thread = Thread(target=self.httpd.serve_forever, name='stub-api', daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api/v4"
+
+    def make_handler(self):
+        stub = self
+
+        class StubApiHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'   # Keep-alive, like the real API
+            disable_nagle_algorithm = True  # Headers and body are separate writes
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                with stub.lock:
+                    stub.requests += 1
+                    stub.paths[path] = stub.paths.get(path, 0) + 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                body = next((stub.bodies.get(name) for name, pattern in ROUTES if pattern.match(path)), None)
+                status = 200 if body is not None else 404
+                if path in stub.statuses:
+                    status, body = stub.statuses[path], None
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                if status != 200:
+                    self.send_header('Retry-After', '0')
+                self.send_header('Content-Length', str(len(body or b'')))
+                self.end_headers()
+                self.wfile.write(body or b'')
+
+            def log_message(self, format, *args):
+                pass
+
+        return StubApiHandler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the fixture payloads like the HTB API.")
+    parser.add_argument('--size', default='small', choices=['small', 'large'])
+    parser.add_argument('--cassette', metavar='DIR', help="serve the responses recorded in DIR instead of the fixtures")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+
+    payloads = load_cassette(args.cassette) if args.cassette else load_payloads(args.size)
+    source = f"{len(payloads)} recorded responses" if args.cassette else f"{args.size} fixtures"
+    with StubApi(payloads, args.latency, port=args.port) as stub:
+        print(f"    Serving {source} on {stub.url} (HTB_API_URL={stub.url})")
+        try:
+            stub.thread.join()
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+# Hack The Box metrics badge generator
+# Importing the package is cheap: the names below load their module on first use, and no module
+# creates files, opens connections or starts processes at import.
+
+import importlib
+
+# Public name -> module defining it
+EXPORTS = {
+    'BadgeError': 'common',
+    'get_job_paths': 'common',
+    'generate_badge': 'pipeline',
+    'run_batch': 'pipeline',
+    'fetch_user_data': 'fetch',
+    'plan_endpoints': 'fetch',
+    'flatten_responses': 'flatten',
+    'patch_dataset_in_memory': 'patch',
+    'get_dataset_store': 'dataset',
+    'history_store': 'history',
+    'compile_template': 'template',
+    'render_badge': 'render',
+    'render_svg': 'svg',
+    'start_renderer_pool': 'render',
+    'stop_renderer_pool': 'render',
+    'set_transport': 'transport',
+    'tracer': 'trace',
+    'main': 'cli',
+}
+
+__all__ = list(EXPORTS)
+
+def __getattr__(name):
+    if name in EXPORTS:
+        return getattr(importlib.import_module(f'.{EXPORTS[name]}', __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,369 @@
+# On-disk caches (API responses, avatars) and request coalescing shared by the pipeline and the server
+
+import os
+import json
+import math
+import glob
+import time
+import hashlib
+import requests
+
+from io import BytesIO
+from threading import Lock
+from concurrent.futures import Future
+
+from .config import ADAPTIVE_TTL, ADAPTIVE_TTL_DECAY, ADAPTIVE_TTL_MAX_FACTOR, ADAPTIVE_TTL_MIN_FACTOR, ADAPTIVE_TTL_STALENESS, ASSET_FETCH_TIMEOUT, ASSET_LOCALIZATION, AVATAR_CACHE_ENABLED, AVATAR_CACHE_MAX_BYTES, AVATAR_TTL, DIR_AVATAR_CACHE, DIR_HTTP_CACHE, HTTP_CACHE_ENABLED, HTTP_CACHE_MAX_AGE, HTTP_CACHE_MAX_BYTES
+from .common import write_atomic
+from .trace import tracer
+from .client import api_get, asset_session, session
+from .template import get_asset_reference
+
+class HttpCache:
+    """
+    On-disk cache of API responses, one JSON file per endpoint URL.
+    Each entry keeps the decoded body, the ETag / Last-Modified validators and the fetch time,
+    so fresh entries are served without a request and stale ones are revalidated with a conditional GET.
+    With `adaptive`, each entry also learns its own TTL from how often its payload actually changes.
+    """
+
+    def __init__(self, directory, max_bytes=HTTP_CACHE_MAX_BYTES, max_age=HTTP_CACHE_MAX_AGE, enabled=True, adaptive=ADAPTIVE_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.enabled = enabled
+        self.adaptive = adaptive
+        self.clock = time.time
+        self.lock = Lock()
+        self.stats = {'hits': 0, 'revalidated': 0, 'unchanged': 0, 'misses': 0, 'bytes_saved': 0}
+
+    def entry_path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+    def load(self, url):
+        """Return the cached entry for a URL, or None if there is no usable entry."""
+        try:
+            with open(self.entry_path(url), 'r') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('url') == url else None
+
+    def store(self, url, entry):
+        """Atomically write an entry, so concurrent fetches never read a half-written file."""
+        write_atomic(self.entry_path(url), json.dumps(entry))  # Creates the directory on first use, importing the module creates nothing
+
+    def count(self, stat, amount=1):
+        with self.lock:
+            self.stats[stat] += amount
+
+    def fetch(self, session, url, ttl=0):
+        """
+        GET a URL through the cache.
+        Returns a (status_code, data) tuple, where status_code is the real or revalidated HTTP status.
+        """
+        with tracer.span('api', 'cache', url=url) as span:
+            status_code, data, cache_status = self.lookup(session, url, ttl)
+            span.update(status=status_code, cache=cache_status)
+        return status_code, data
+
+    def entry_ttl(self, entry, ttl):
+        """TTL of a cached entry: the one it learned, kept within the factors of the endpoint TTL, else the endpoint TTL."""
+        if not self.adaptive or not ttl or not entry or 'ttl' not in entry:
+            return ttl
+        return min(max(entry['ttl'], ttl * ADAPTIVE_TTL_MIN_FACTOR), ttl * ADAPTIVE_TTL_MAX_FACTOR)
+
+    def learn_ttl(self, entry, ttl, now, changed):
+        """
+        Update the change statistics of an entry at a refresh and return its next TTL.
+        With changes seen over the observed time (older refreshes weigh less and less) and the endpoint TTL
+        as a prior of one change, the change rate is (changes + 1) / (observed + ttl / k), and the TTL that keeps
+        the chance of serving an outdated payload at ADAPTIVE_TTL_STALENESS is k / rate, k = -ln(1 - staleness).
+        """
+        if not entry:
+            return {'ttl': ttl, 'observed': 0.0, 'changes': 0.0}
+        observed = entry.get('observed', 0.0) * ADAPTIVE_TTL_DECAY + max(0.0, now - entry['fetched_at'])
+        changes = entry.get('changes', 0.0) * ADAPTIVE_TTL_DECAY + (1 if changed else 0)
+        k = -math.log(1 - ADAPTIVE_TTL_STALENESS)
+        learned = (ttl + k * observed) / (1 + changes)
+        return {'ttl': self.entry_ttl({'ttl': learned}, ttl), 'observed': observed, 'changes': changes}
+
+    def lookup(self, session, url, ttl):
+        """fetch() body, also returning how the cache answered: off, hit, revalidated, unchanged or miss."""
+        if not self.enabled:
+            response = api_get(session, url)
+            return response.status_code, response.json() if response.status_code == 200 else None, 'off'
+
+        entry = self.load(url)
+        now = self.clock()
+
+        # Fresh entry: no request at all
+        if entry and now - entry['fetched_at'] < self.entry_ttl(entry, ttl):
+            self.count('hits')
+            self.count('bytes_saved', entry['size'])
+            return 200, entry['body'], 'hit'
+
+        # Stale entry: ask the API whether it changed
+        conditional_headers = {}
+        if entry and entry.get('etag'):
+            conditional_headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            conditional_headers['If-Modified-Since'] = entry['last_modified']
+
+        response = api_get(session, url, headers=conditional_headers)
+
+        # A 304 with nothing to revalidate (e.g. a proxy answering for another client): ask again without validators
+        if response.status_code == 304 and not entry:
+            response = api_get(session, url)
+
+        if response.status_code == 304 and entry:
+            entry.update(self.learn_ttl(entry, ttl, now, changed=False))
+            entry['fetched_at'] = now
+            self.store(url, entry)
+            self.count('revalidated')
+            self.count('bytes_saved', entry['size'])
+            return 200, entry['body'], 'revalidated'
+
+        if response.status_code != 200:
+            self.count('misses')
+            return response.status_code, None, 'miss'
+
+        # Without validators from the API, a payload identical to the cached one still counts as unchanged
+        digest = hashlib.sha256(response.content).hexdigest()
+        changed = not entry or entry.get('digest') != digest
+        self.count('misses' if changed else 'unchanged')
+        data = response.json()
+        self.store(url, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': now,
+            'digest': digest,
+            'size': len(response.content),
+            'body': data,
+            **self.learn_ttl(entry, ttl, now, changed),
+        })
+        return 200, data, 'miss' if changed else 'unchanged'
+
+    def refresh_state(self, url, ttl):
+        """(seconds until the entry of a URL goes stale, its current TTL), or None when it is not cached."""
+        entry = self.load(url) if self.enabled else None
+        if not entry:
+            return None
+        current = self.entry_ttl(entry, ttl)
+        return max(0, entry['fetched_at'] + current - self.clock()), current
+
+    def evict(self):
+        """Delete entries older than max_age, then the least recently used ones until under max_bytes."""
+        if not os.path.isdir(self.directory):
+            return
+        now = time.time()
+        entries = []
+        for file_name in os.listdir(self.directory):
+            path = os.path.join(self.directory, file_name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age:
+                os.remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            os.remove(path)
+            total_bytes -= size
+
+    def summary(self):
+        stats = self.stats
+        return (f"{stats['hits']} hits, {stats['revalidated']} revalidated, {stats['unchanged']} refetched unchanged, {stats['misses']} misses "
+                f"({stats['bytes_saved'] / 1024:.1f} KB not downloaded)")
+
+http_cache = HttpCache(DIR_HTTP_CACHE, enabled=HTTP_CACHE_ENABLED)
+
+class AvatarCache:
+    """
+    On-disk cache of user avatars, keyed by avatar URL and content hash.
+    urls/<sha(url)>.json maps a URL to the hash of its content (with its validators), and each content hash is kept
+    once, as pre-scaled <hash>-<width>.png variants for the widths the templates display it at.
+    The variants are touched on use and evicted least recently used first above max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=AVATAR_CACHE_MAX_BYTES, ttl=AVATAR_TTL, enabled=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self.lock = Lock()
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'scaled': 0}
+
+    def index_path(self, url):
+        return os.path.join(self.directory, 'urls', hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+    def variant_path(self, content_hash, width):
+        return os.path.join(self.directory, f'{content_hash}-{width}.png')
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def load_index(self, url):
+        try:
+            with open(self.index_path(url), 'r') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('url') == url else None
+
+    def get(self, url, width):
+        """
+        Return the path of the avatar scaled to `width`, downloading it only when the URL is new or changed.
+        Returns None when the avatar cannot be downloaded or decoded.
+        """
+        entry = self.load_index(url)
+        now = time.time()
+        # Without the variant for this width the content is needed again, so the request is not conditional
+        if entry and not os.path.exists(self.variant_path(entry['hash'], width)):
+            entry = None
+        if entry and now - entry['fetched_at'] < self.ttl:
+            self.count('hits')
+            return self.touch(self.variant_path(entry['hash'], width))
+
+        conditional_headers = {}
+        if entry and entry.get('etag'):
+            conditional_headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            conditional_headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = asset_session.get(url, headers=conditional_headers, timeout=ASSET_FETCH_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"Warning: could not download avatar {url} ({e.__class__.__name__})")
+            return None
+
+        if response.status_code == 304 and entry:
+            entry['fetched_at'] = now
+            write_atomic(self.index_path(url), json.dumps(entry))
+            self.count('revalidated')
+            return self.touch(self.variant_path(entry['hash'], width))
+        if response.status_code != 200:
+            print(f"Warning: could not download avatar {url} (status code {response.status_code})")
+            return None
+
+        self.count('misses')
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        path = self.variant_path(content_hash, width)
+        if not os.path.exists(path) and not self.scale(response.content, path, width):
+            return None
+        entry = {
+            'url': url,
+            'hash': content_hash,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': now,
+        }
+        write_atomic(self.index_path(url), json.dumps(entry))
+        return path
+
+    def scale(self, content, path, width):
+        """Store the avatar resized to `width` (never upscaled) as PNG. Returns False if it is not an image."""
+        from PIL import Image  # Only loaded when an avatar is actually scaled, PIL dominates the import time
+        try:
+            with Image.open(BytesIO(content)) as img:
+                img = img.convert('RGBA')
+                if img.width > width:
+                    img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+                write_atomic(path, lambda file: img.save(file, 'PNG', optimize=True))
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not scale avatar ({e})")
+            return False
+        self.count('scaled')
+        return True
+
+    def touch(self, path):
+        """Mark a variant as used (its mtime drives the LRU eviction)."""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def localize(self, url, width, mode=ASSET_LOCALIZATION):
+        """Return what the template should reference for an avatar URL: the cached, scaled copy or the URL itself."""
+        if not self.enabled or mode == 'off' or not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+            return url
+        path = self.get(url, width)
+        return get_asset_reference(path, mode) if path else url
+
+    def evict(self):
+        """Delete the least recently used variants until under max_bytes, then the URL entries left without one."""
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for file_name in os.listdir(self.directory):
+            path = os.path.join(self.directory, file_name)
+            if not file_name.endswith('.png'):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        evicted = False
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            os.remove(path)
+            total_bytes -= size
+            evicted = True
+
+        # A URL entry without any variant left would only ever be revalidated for nothing
+        if evicted:
+            hashes = {os.path.basename(path).rsplit('-', 1)[0] for _, _, path in entries if os.path.exists(path)}
+            for index_path in glob.glob(os.path.join(self.directory, 'urls', '*.json')):
+                try:
+                    with open(index_path, 'r') as file:
+                        content_hash = json.load(file).get('hash')
+                except (OSError, ValueError):
+                    content_hash = None
+                if content_hash not in hashes:
+                    os.remove(index_path)
+
+    def summary(self):
+        stats = self.stats
+        return f"{stats['hits']} hits, {stats['revalidated']} revalidated, {stats['misses']} downloaded, {stats['scaled']} scaled"
+
+avatar_cache = AvatarCache(DIR_AVATAR_CACHE, enabled=AVATAR_CACHE_ENABLED)
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the function,
+    the others wait for its result (or exception) instead of running it again.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.calls = {}     # key -> Future of the call in flight
+
+    def do(self, key, function, *args, **kwargs):
+        """Return (result, shared), shared being True when the result came from another caller's call."""
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(function(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.calls[key]
+        return future.result(), False
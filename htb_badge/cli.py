@@ -0,0 +1,140 @@
+# Command line entry point (generate-badge.py, python -m htb_badge)
+
+import os
+import argparse
+
+from colorama import Fore, Style
+
+from .config import BADGE_OUTPUT_FORMAT, BADGE_OUTPUT_FORMATS, BADGE_TEMPLATE_NAME, BATCH_WORKERS, DIR_IMAGES, FETCH_ALL_ENDPOINTS, HTTP_CASSETTE_DIR, HTTP_TRANSPORT, PROFILE_TOP_FUNCTIONS, RENDER_WORKERS, REPLAY_LATENCY, SERVE_HOST, SERVE_PORT, USER_ID, WRITE_ARTIFACTS
+from .common import BadgeError, get_job_paths, get_template_name
+from .trace import tracer
+from .client import api_rate_limiter
+from . import transport
+from .transport import set_transport
+from .cache import avatar_cache, http_cache
+from .fetch import get_team_endpoints, get_user_endpoints, plan_endpoints, print_fetch_plan
+from .template import bundle_assets, compile_template
+from .render import start_renderer_pool, stop_renderer_pool
+from .history import history_store
+from .pipeline import generate_badge, read_batch_file, run_batch
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Hack The Box metrics badges.")
+    parser.add_argument('--user-id', default=USER_ID, help=f"user to generate the badge for (default: {USER_ID})")
+    parser.add_argument('--template', default=BADGE_TEMPLATE_NAME, help="template name: default, compact, wide or a badge-*.html file")
+    parser.add_argument('--format', choices=BADGE_OUTPUT_FORMATS, default=BADGE_OUTPUT_FORMAT, help=f"badge file format, svg draws the template's layout without wkhtmltoimage (default: {BADGE_OUTPUT_FORMAT})")
+    parser.add_argument('--batch', nargs='+', metavar='USER_ID', help="generate badges for several users in one process")
+    parser.add_argument('--batch-file', metavar='FILE', help="file with one 'USER_ID [TEMPLATE]' per line ('-' for stdin)")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help=f"badges generated at once in batch mode (default: {BATCH_WORKERS})")
+    parser.add_argument('--write-artifacts', action='store_true', default=WRITE_ARTIFACTS, help="keep the intermediate JSON files and the dataset file (DATASET_FORMAT) for debugging")
+    parser.add_argument('--fetch-all', action='store_true', default=FETCH_ALL_ENDPOINTS, help="fetch every endpoint, not only the ones the template needs")
+    parser.add_argument('--force', action='store_true', help="render even if the badge inputs did not change")
+    parser.add_argument('--bundle-assets', action='store_true', help=f"download the remote assets of every template into {DIR_IMAGES} and exit")
+    parser.add_argument('--plan', action='store_true', help="print the requests the render would make and exit")
+    parser.add_argument('--serve', action='store_true', help="serve badges over HTTP (GET /badge/<user_id>.png?template=compact)")
+    parser.add_argument('--host', default=SERVE_HOST, help=f"address to serve on (default: {SERVE_HOST})")
+    parser.add_argument('--port', type=int, default=SERVE_PORT, help=f"port to serve on (default: {SERVE_PORT})")
+    parser.add_argument('--render-workers', type=int, default=RENDER_WORKERS, help=f"long-lived renderer processes, 0 to render in-process (default: {RENDER_WORKERS})")
+    parser.add_argument('--transport', choices=['live', 'record', 'replay'], default=HTTP_TRANSPORT, help=f"where HTTP responses come from (default: {HTTP_TRANSPORT})")
+    parser.add_argument('--cassette', metavar='DIR', default=HTTP_CASSETTE_DIR, help=f"directory responses are recorded to and replayed from (default: {HTTP_CASSETTE_DIR})")
+    parser.add_argument('--replay-latency', metavar='SECONDS', default=REPLAY_LATENCY, help="delay added to every replayed response, or 'recorded' for the recorded one")
+    parser.add_argument('--trace', metavar='FILE', help="write a timed span per stage and request to FILE (Chrome trace JSON, or JSON lines for .jsonl)")
+    parser.add_argument('--profile', nargs='?', const='', metavar='FILE', help="run under cProfile, print the top functions and optionally save the stats to FILE")
+    return parser.parse_args(argv)
+
+def run_profiled(function, *args, stats_path=None):
+    """Run function(*args) under cProfile, print the slowest functions by cumulative time and return its result."""
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args)
+    finally:
+        print(Style.BRIGHT + Fore.YELLOW + "\n Profile.. \n" + Style.RESET_ALL)
+        stats = pstats.Stats(profiler)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP_FUNCTIONS)
+        if stats_path:
+            stats.dump_stats(stats_path)
+            print(f"    🔹 Profile written to {stats_path} (python -m pstats {stats_path})")
+
+# Main execution
+def main(argv=None):
+    args = parse_args(argv)
+    if args.trace or args.batch or args.batch_file:
+        tracer.enable()
+    if args.transport != 'live':
+        try:
+            set_transport(args.transport, args.cassette, args.replay_latency)
+        except BadgeError as e:
+            print(f"\n{Fore.RED} {e}{Style.RESET_ALL}")
+            return 1
+    try:
+        if args.profile is not None:
+            return run_profiled(run_command, args, stats_path=args.profile)
+        return run_command(args)
+    finally:
+        if args.trace:
+            tracer.write(args.trace)
+            print(f"    🔹 Trace written to {args.trace} ({len(tracer.events)} spans)")
+
+def run_command(args):
+    template_name = get_template_name(args.template)
+
+    if args.bundle_assets:
+        return 0 if bundle_assets() else 1
+
+    if args.plan:
+        template_path = get_job_paths(args.user_id, template_name)['template_path']
+        if not os.path.exists(template_path):
+            print(f"\n{Fore.RED} template {template_path} not found{Style.RESET_ALL}")
+            return 1
+        plan = {name: [] for name in {**get_user_endpoints(None), **get_team_endpoints(None)}} if args.fetch_all else plan_endpoints(compile_template(template_path, localize=False).placeholders, history_store.enabled)
+        print_fetch_plan(args.user_id, template_path, plan)
+        return 0
+
+    if args.serve:
+        from .server import BadgeServer
+
+        start_renderer_pool(args.render_workers)
+        try:
+            BadgeServer(args.host, args.port, args.workers, template_name).serve_forever()
+        finally:
+            stop_renderer_pool()
+            http_cache.evict()
+            avatar_cache.evict()
+        return 0
+
+    if args.batch or args.batch_file:
+        jobs = [(user_id, None) for user_id in args.batch or []]
+        if args.batch_file:
+            jobs += read_batch_file(args.batch_file)
+        start_renderer_pool(args.render_workers)
+        try:
+            results = run_batch(jobs, template_name, args.workers, args.write_artifacts, args.fetch_all, args.force, args.format)
+        finally:
+            stop_renderer_pool()
+        http_cache.evict()
+        avatar_cache.evict()
+        return 0 if all(result[2] for result in results) else 1
+
+    try:
+        generate_badge(args.user_id, template_name, write_artifacts=args.write_artifacts, fetch_all=args.fetch_all, force=args.force, output_format=args.format)
+    except BadgeError as e:
+        print(f"\n{Fore.RED} {e}{Style.RESET_ALL}")
+        return 1
+    except Exception as e:
+        print(f"\nAn error occurred during execution: {e}")
+        return 1
+    finally:
+        print(f"    🔹 HTTP cache: {http_cache.summary()}")
+        print(f"    🔹 Avatar cache: {avatar_cache.summary()}")
+        print(f"    🔹 API: {api_rate_limiter.summary()}")
+        if history_store.enabled:
+            print(f"    🔹 History: {history_store.summary()}")
+        if transport.cassette:
+            print(f"    🔹 Cassette: {transport.cassette.summary()}")
+        # Keep the response and avatar caches within their size and age limits
+        http_cache.evict()
+        avatar_cache.evict()
+    return 0
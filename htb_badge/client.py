@@ -0,0 +1,141 @@
+# HTTP sessions and the rate-limited, retrying API client
+
+import math
+import time
+import random
+import requests
+
+from threading import Lock
+from requests.adapters import HTTPAdapter
+from email.utils import parsedate_to_datetime
+
+from .config import API_BACKOFF_BASE, API_BACKOFF_MAX, API_MAX_RETRIES, API_RATE_BURST, API_RATE_LIMIT, API_TIMEOUT, FETCH_CONCURRENCY, RETRY_STATUS_CODES
+from .trace import tracer
+
+# Request Headers
+headers = {
+    'Content-Type': 'application/json',
+    'Accept': 'application/json',
+    'User-Agent': 'Python-Script/1.0'
+}
+
+# Shared keep-alive session, so every endpoint reuses the same pooled TLS connections
+session = requests.Session()
+session.headers.update(headers)
+session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=FETCH_CONCURRENCY))
+
+# Separate session for avatars and template assets: its own connection pool for the asset hosts, without the JSON API headers
+asset_session = requests.Session()
+asset_session.mount('https://', HTTPAdapter(pool_maxsize=FETCH_CONCURRENCY))
+
+class RateLimiter:
+    """
+    Token bucket shared by every API request of the process: `rate` requests per second on average,
+    bursts of up to `burst`. pause() holds back every caller, e.g. for the Retry-After of a 429.
+    """
+
+    def __init__(self, rate=API_RATE_LIMIT, burst=API_RATE_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'server_errors': 0, 'network_errors': 0,
+                      'wait_seconds': 0.0, 'backoff_seconds': 0.0, 'paused_seconds': 0.0}
+
+    def count(self, stat, amount=1):
+        with self.lock:
+            self.stats[stat] += amount
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if self.rate > 0:
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                else:
+                    self.tokens = self.burst  # No limit
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.stats['requests'] += 1
+                    return
+                delay = max(self.paused_until - now, (1 - self.tokens) / self.rate if self.rate > 0 else 0)
+                self.stats['wait_seconds'] += delay
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Hold back every request for `seconds` (the whole process shares the server's throttling)."""
+        with self.lock:
+            now = time.monotonic()
+            until = now + seconds
+            # Wall-clock time paused, overlapping pauses counted once
+            self.stats['paused_seconds'] += max(0.0, until - max(self.paused_until, now))
+            self.paused_until = max(self.paused_until, until)
+
+    def retry_after(self):
+        """Whole seconds a client should wait before asking again once the retries gave up on throttling: the rest of the pause, 1 to API_BACKOFF_MAX."""
+        with self.lock:
+            return max(1, math.ceil(min(API_BACKOFF_MAX, self.paused_until - time.monotonic())))
+
+    def summary(self):
+        stats = self.stats
+        return (f"{stats['requests']} requests, {stats['retries']} retries ({stats['throttled']} throttled, "
+                f"{stats['server_errors']} server errors, {stats['network_errors']} network errors), "
+                f"paused {stats['paused_seconds']:.1f}s by throttling, {stats['wait_seconds'] + stats['backoff_seconds']:.1f}s waited across requests")
+
+def get_retry_delay(response, attempt):
+    """
+    Seconds to wait before retrying: the Retry-After header when the server sent one (seconds or HTTP date),
+    otherwise an exponential backoff with full jitter.
+    """
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return min(API_BACKOFF_MAX, max(0.0, float(retry_after)))
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                return min(API_BACKOFF_MAX, max(0.0, retry_at.timestamp() - time.time()))
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(API_BACKOFF_MAX, API_BACKOFF_BASE * 2 ** attempt))
+
+def api_get(session, url, headers=None, limiter=None, max_retries=API_MAX_RETRIES):
+    """
+    GET an API URL through the rate limiter, retrying throttling (429), server errors (5xx) and network errors.
+    Any other status (403/404 for private profiles included) is returned at once.
+    Returns the last response, or raises the last network error once the retries are exhausted.
+    """
+    limiter = limiter or api_rate_limiter
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            with tracer.span('GET', 'http', url=url, attempt=attempt) as span:
+                response = session.get(url, headers=headers, timeout=API_TIMEOUT)
+                span.update(status=response.status_code, bytes_in=len(response.content))
+        except (requests.ConnectionError, requests.Timeout):
+            limiter.count('network_errors')
+            if attempt == max_retries:
+                raise
+            response = None
+        else:
+            if response.status_code == 429:
+                limiter.count('throttled')
+            elif response.status_code in RETRY_STATUS_CODES:
+                limiter.count('server_errors')
+            else:
+                return response
+            if attempt == max_retries:
+                return response
+
+        delay = get_retry_delay(response, attempt)
+        if response is not None and response.status_code == 429:
+            limiter.pause(delay)  # The limit is per client, so every thread backs off
+        limiter.count('retries')
+        limiter.count('backoff_seconds', delay)
+        time.sleep(delay)
+
+api_rate_limiter = RateLimiter()
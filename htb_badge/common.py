@@ -0,0 +1,70 @@
+# Errors and per-badge paths shared by every stage
+
+import os
+
+from threading import get_ident
+from colorama import Fore, Style
+
+from .config import BADGE_OUTPUT_DIR, BADGE_TEMPLATE_NAME, DIR_BATCH_BADGES, DIR_BATCH_USERS, DIR_TEMPLATES, DIR_USER, YAML_FILE_NAME
+
+class BadgeError(Exception):
+    """
+    Raised when a badge cannot be generated for a user (private profile, missing data, ...).
+    kind says what failed: 'private' (private or unknown profile), 'throttled' (rate limited by the API, worth
+    retrying after retry_after seconds), 'upstream' (API or network error), 'render', or 'error' for anything else.
+    """
+
+    def __init__(self, message, kind='error', retry_after=None):
+        super().__init__(message)
+        self.kind = kind
+        self.retry_after = retry_after
+
+def write_atomic(path, content):
+    """
+    Write a file through a temporary file moved into place, so a concurrent reader never sees it half written.
+    content is bytes, str (UTF-8) or a function writing to the open binary file.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+    with open(tmp_path, 'wb') as file:
+        if callable(content):
+            content(file)
+        else:
+            file.write(content.encode('utf-8') if isinstance(content, str) else content)
+    os.replace(tmp_path, path)
+
+def print_banner(user_id, paths):
+    print(Fore.BLUE + "\n Initializing Script.. \n" + Style.RESET_ALL)
+
+    print(f"    🔹 User ID set to    => {Style.BRIGHT}{Fore.BLUE}{user_id}{Style.RESET_ALL}")
+    print(f"    🔹 Badge output name => {Style.BRIGHT}{Fore.BLUE}{paths['output_name']}{Style.RESET_ALL}")
+    print(f"    🔹 Badge output dir  => {Style.BRIGHT}{Fore.BLUE}{os.path.dirname(paths['output_png'])}{Style.RESET_ALL}")
+    print(f"    🔹 Selected template => {Style.BRIGHT}{Fore.BLUE}{paths['template_name']}{Style.RESET_ALL}")
+
+def get_template_name(template):
+    """Accept 'compact', 'badge-compact' or 'badge-compact.html' and return the template file name."""
+    if template.endswith('.html'):
+        return template
+    if template.startswith('badge-'):
+        return f'{template}.html'
+    return f'badge-{template}.html'
+
+def get_job_paths(user_id, template_name=BADGE_TEMPLATE_NAME, batch=False):
+    """
+    Return every path used to generate one badge.
+    Single runs keep the historical layout (data/user, data/badge-*.png),
+    batch runs get a working directory and an output file per user so they never overwrite each other.
+    """
+    output_name = os.path.splitext(template_name)[0]
+    user_dir = f'{DIR_BATCH_USERS}/{user_id}' if batch else DIR_USER
+    output_base = f'{DIR_BATCH_BADGES}/{user_id}-{output_name}' if batch else f'{BADGE_OUTPUT_DIR}/{output_name}'
+    return {
+        'template_name': template_name,
+        'template_path': f'{DIR_TEMPLATES}/{template_name}',
+        'output_name': output_name,
+        'user_dir': user_dir,
+        'yaml_path': f'{user_dir}/{YAML_FILE_NAME}',
+        'output_html': f'{output_base}.html',
+        'output_png': f'{output_base}.png',
+        'output_svg': f'{output_base}.svg',
+    }
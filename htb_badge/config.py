@@ -0,0 +1,228 @@
+# Settings, most of them overridable with environment variables (read once, at import)
+
+import os
+
+# Define the root directory for your project (the folder holding the htb_badge package)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Constants
+API_URL = os.environ.get("HTB_API_URL", "https://labs.hackthebox.com/api/v4")   # Point it to a local stand-in for testing
+BASE_URL = "https://labs.hackthebox.com"
+
+# User Config
+USER_ID = 780424 # 6-digit user ID (linked to ID1) - 780424 - 000000
+
+BADGE_TEMPLATE_NAME = 'badge-default.html'
+
+# Badge file format: 'png' (the template rendered by wkhtmltoimage) or 'svg' (the same layout drawn natively, see htb_badge/svg.py)
+BADGE_OUTPUT_FORMAT = os.environ.get('BADGE_OUTPUT_FORMAT', 'png')
+BADGE_OUTPUT_FORMATS = ('png', 'svg')
+
+# Maximum number of endpoint requests in flight at once
+FETCH_CONCURRENCY = int(os.environ.get('FETCH_CONCURRENCY', 8))
+
+# Maximum number of badges generated at once in batch mode
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+
+# Client-side rate limit shared by every API request of the process (token bucket), 0 disables it
+API_RATE_LIMIT = float(os.environ.get('API_RATE_LIMIT', 5))         # Requests per second on average
+API_RATE_BURST = int(os.environ.get('API_RATE_BURST', 10))          # Requests allowed at once after a quiet period
+API_MAX_RETRIES = int(os.environ.get('API_MAX_RETRIES', 4))         # Retries of throttled (429), 5xx and network errors
+API_BACKOFF_BASE = 0.5                                              # First backoff step in seconds, doubled on each retry
+API_BACKOFF_MAX = 30.0                                              # Longest single wait, Retry-After included
+API_TIMEOUT = 30                                                    # Seconds before a request is given up
+RETRY_STATUS_CODES = {500, 502, 503, 504}                           # Retried like a 429
+PRIVATE_STATUS_CODES = {403, 404}                                   # What HTB answers for a private profile
+
+# Long-lived renderer processes (0 renders in the calling process, one render at a time per thread)
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', 0))
+RENDER_WORKER_MAX_JOBS = int(os.environ.get('RENDER_WORKER_MAX_JOBS', 200))         # Recycle a worker after this many badges
+RENDER_WORKER_MAX_MEMORY_MB = int(os.environ.get('RENDER_WORKER_MAX_MEMORY_MB', 512))  # ..or once its resident memory goes above this
+RENDER_TIMEOUT = float(os.environ.get('RENDER_TIMEOUT', 120))                       # Seconds a badge may wait for the pool before it fails
+
+# Keep only the first N items of every list when flattening (e.g. the activity feed), unset keeps them all.
+# last_activity reads the second activity entry, so this must be 2 or more.
+FLATTEN_MAX_LIST_ITEMS = int(os.environ['FLATTEN_MAX_LIST_ITEMS']) if os.environ.get('FLATTEN_MAX_LIST_ITEMS') else None
+
+# Optional YAML file with the list of dataset cleaning commands, replacing PATCH_COMMANDS
+PATCH_RULES_FILE = os.environ.get('PATCH_RULES_FILE', 'config/patch-rules.yml')
+
+# Dataset cleaning commands, applied in order (override them with a YAML list in PATCH_RULES_FILE)
+PATCH_COMMANDS = [
+    # 'silent -r "_thumb"',                             # Silent: remove "_thumb"
+    # '-rF "user_profile_sso_id"',                      # Remove entire line with "user_profile_sso_id"
+    # '-c "user_profile_" "user_"',                     # Replace "user_profile_" with "user_"
+    # '+k "some_key" "new_key"',                        # Insert"new_key" before "some_key"
+    # 'k+ "some_key" "more_value"',                     # Insert "more_value" after "some_key"
+    # '+v "some_value" "new_prefix"',                   # Insert "new_prefix" before "some_value"
+    # '+v " /storage/" "https://labs.hackthebox.com"'   # Insert URL before "/storage/"
+    # 
+    
+    '-r "_thumb"',
+    '-rF "user_profile_sso_id"',
+    '-c "_attack_paths_" "ap_"',
+    '-c "user_profile_user_" "user_profile_"',
+    '-c "user_profile_" "user_"',
+    '-c "operating_systems" "os"',
+    '-c "challenge_categories" "challenge_cat"',
+    '-c "Window\'s Infinity" "Windows Infinity"',
+    '+v " /storage/" "https://labs.hackthebox.com"'
+    
+]
+
+# Fetch every endpoint instead of only the ones the template needs (see plan_endpoints)
+FETCH_ALL_ENDPOINTS = os.environ.get('FETCH_ALL_ENDPOINTS', '0') == '1'
+
+# Badge server (--serve): address and in-memory cache of rendered badges
+SERVE_HOST = os.environ.get('SERVE_HOST', '127.0.0.1')
+SERVE_PORT = int(os.environ.get('SERVE_PORT', 8000))
+SERVE_CACHE_TTL = int(os.environ.get('SERVE_CACHE_TTL', 300))                          # Seconds a rendered badge is served from memory
+SERVE_CACHE_MAX_ITEMS = int(os.environ.get('SERVE_CACHE_MAX_ITEMS', 1024))
+SERVE_CACHE_MAX_BYTES = int(os.environ.get('SERVE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Functions listed by --profile, slowest cumulative time first
+PROFILE_TOP_FUNCTIONS = int(os.environ.get('PROFILE_TOP_FUNCTIONS', 25))
+
+# Also write every intermediate file (UD*/UT* JSON, the dataset file) and run the stages through them, for debugging
+WRITE_ARTIFACTS = os.environ.get('WRITE_ARTIFACTS', '0') == '1'
+
+# Format of that dataset file: 'json' (dataset.json and a key-offset index), 'binary' (dataset.bin, typed values
+# and an index) or 'yaml' (dataset.yml, parsed whole on every read)
+DATASET_FORMAT = os.environ.get('DATASET_FORMAT', 'json')
+
+# 0 only makes pure white transparent, N > 0 fades out the N levels closest to white (anti-aliased edges)
+CHROMA_KEY_TOLERANCE = int(os.environ.get('CHROMA_KEY_TOLERANCE', 0))
+
+# How remote template assets (icons, logos, stylesheets) are localized at compile time:
+# 'inline' (data: URIs), 'file' (file:// URLs to the copies in DIR_IMAGES) or 'off' (left to wkhtmltoimage)
+ASSET_LOCALIZATION = os.environ.get('ASSET_LOCALIZATION', 'inline')
+ASSET_FETCH_TIMEOUT = float(os.environ.get('ASSET_FETCH_TIMEOUT', 10))
+
+# wkhtmltoimage options used for every badge (part of the render digest)
+RENDER_OPTIONS = {
+    'enable-local-file-access': '',     # Allow local file access if necessary
+    'transparent': '',                  # Might not work directly for transparency
+    'quiet': '',                        # Suppress wkhtmltoimage output (thread-safe, unlike swapping sys.stdout)
+    # 'width': '875',                     # Force the width to 826px
+    # 'disable-smart-width': '',          # Disable smart width adjustment
+}
+
+# Skip the render when the badge inputs match the digest stored in the existing PNG
+RENDER_SKIP_UNCHANGED = os.environ.get('RENDER_SKIP_UNCHANGED', '1') == '1'
+# How last_update counts toward the render digest: 'ignore' (never re-render for it), 'date' (re-render once a day) or 'include'
+RENDER_DIGEST_LAST_UPDATE = os.environ.get('RENDER_DIGEST_LAST_UPDATE', 'ignore')
+# PNG text chunk holding the render digest
+RENDER_DIGEST_KEY = 'badge-render-digest'
+
+# Fixed values
+DIR_DATA = 'data'
+DIR_USER = f'{DIR_DATA}/user'
+BADGE_OUTPUT_DIR = f'{DIR_DATA}'
+DIR_ASSETS = 'assets'
+YAML_FILE_NAME = 'dataset.yml'
+DIR_CSS = f'{DIR_ASSETS}/css'
+DIR_JS = f'{DIR_ASSETS}/js'
+DIR_TEMPLATES = f'{DIR_ASSETS}/templates'
+DIR_IMAGES = f'{DIR_ASSETS}/images'
+DIR_BATCH_USERS = f'{DIR_DATA}/users'
+DIR_BATCH_BADGES = f'{DIR_DATA}/badges'
+DIR_HTTP_CACHE = f'{DIR_DATA}/cache/http'
+DIR_TEMPLATE_CACHE = f'{DIR_DATA}/cache/templates'
+DIR_AVATAR_CACHE = f'{DIR_DATA}/cache/avatars'
+
+# Metric history: every run appends the numeric fields below to an SQLite file (set HISTORY=0 to disable)
+HISTORY_ENABLED = os.environ.get('HISTORY', '1') != '0'
+HISTORY_DB = os.environ.get('HISTORY_DB', f'{DIR_DATA}/history.sqlite3')
+HISTORY_METRICS = ['user_points', 'user_ranking', 'user_owns', 'user_system_owns', 'user_respects']
+# Per-item progress recorded under the item name (user_os_Linux_completion_percentage), for lists flattened as <group>_<i>_<field>
+HISTORY_GROUPS = {
+    'user_os': ['owned_machines', 'completion_percentage'],
+    'user_challenge_cat': ['owned_flags', 'completion_percentage'],
+}
+# Retention tiers 'AGE:BUCKET,...': samples older than AGE are compacted to the last one per BUCKET
+# (default: daily after 30 days, weekly after a year), and HISTORY_MAX_AGE drops older ones ('0' keeps everything)
+HISTORY_RETENTION = os.environ.get('HISTORY_RETENTION', '30d:1d,365d:7d')
+HISTORY_MAX_AGE = os.environ.get('HISTORY_MAX_AGE', '0')
+HISTORY_COMPACT_INTERVAL = os.environ.get('HISTORY_COMPACT_INTERVAL', '1d')
+
+# Keep compiled templates on disk too (keyed by template file hash), set TEMPLATE_DISK_CACHE=0 to disable
+TEMPLATE_DISK_CACHE = os.environ.get('TEMPLATE_DISK_CACHE', '1') != '0'
+
+# Dataset keys a badge template can use as $placeholder$
+TEMPLATE_KEYS = [
+    'user_name',
+    'user_rank',
+    'user_owns',
+    'user_system_owns',
+    'user_ranking',
+    'user_avatar',
+    'user_points',
+    'user_respects',
+    'last_update',
+    'last_activity',
+    'user_points_change_30d',   # <metric>_change_<N>d keys come from the metric history
+    'user_ranking_change_30d',
+]
+
+# HTTP cache settings (set HTTP_CACHE=0 to always hit the API)
+HTTP_CACHE_ENABLED = os.environ.get('HTTP_CACHE', '1') != '0'
+HTTP_CACHE_MAX_BYTES = 50 * 1024 * 1024     # Evict the least recently used entries above 50 MB
+HTTP_CACHE_MAX_AGE = 7 * 24 * 3600          # Drop entries not refreshed for a week
+
+# Where HTTP responses come from: 'live' (the network), 'record' (the network, saving every response
+# to the cassette directory) or 'replay' (the saved responses only, no network at all)
+HTTP_TRANSPORT = os.environ.get('HTTP_TRANSPORT', 'live')
+HTTP_CASSETTE_DIR = os.environ.get('HTTP_CASSETTE_DIR', f'{DIR_DATA}/cassette')
+REPLAY_LATENCY = os.environ.get('REPLAY_LATENCY', '0')     # Seconds added to every replayed response, or 'recorded'
+
+# Seconds the team payloads fetched for one member are shared with the other members of the team
+TEAM_DATA_TTL = int(os.environ.get('TEAM_DATA_TTL', 300))
+
+# Avatar cache settings (set AVATAR_CACHE=0 to let the renderer download the avatar itself)
+AVATAR_CACHE_ENABLED = os.environ.get('AVATAR_CACHE', '1') != '0'
+AVATAR_CACHE_MAX_BYTES = int(os.environ.get('AVATAR_CACHE_MAX_BYTES', 20 * 1024 * 1024))   # LRU eviction above 20 MB
+AVATAR_TTL = 24 * 3600                      # Revalidate an avatar URL once a day
+
+# Width in pixels each template displays the avatar at (.header-avatar), avatars are stored pre-scaled to it
+AVATAR_SIZES = {
+    'badge-default.html': 178,
+    'badge-compact.html': 178,
+    'badge-wide.html': 200,
+}
+AVATAR_DEFAULT_SIZE = 200
+
+# Seconds during which a cached response is reused without asking the API at all, per endpoint
+# (override one with ENDPOINT_TTL_<NAME>, e.g. ENDPOINT_TTL_USER_PROLABS=172800).
+# Once expired, the entry is revalidated with a conditional request (ETag / Last-Modified).
+ENDPOINT_TTLS = {name: int(os.environ.get(f'ENDPOINT_TTL_{name.upper()}', ttl)) for name, ttl in {
+    "user": 300,
+    "user_machines": 3600,
+    "user_os": 6 * 3600,
+    "user_challenges": 3600,
+    "user_fortresses": 24 * 3600,
+    "user_sherlocks": 6 * 3600,
+    "user_endgames": 24 * 3600,
+    "user_prolabs": 24 * 3600,
+    "user_activity": 300,
+    "team": 3600,
+    "team_bracket": 24 * 3600,
+    "team_rank_best": 24 * 3600,
+    "team_machines": 6 * 3600,
+    "team_challenges": 6 * 3600,
+}.items()}
+
+# Learn each cached URL's refresh interval from how often its payload actually changed, starting from its
+# ENDPOINT_TTLS value: the TTL aims at an ADAPTIVE_TTL_STALENESS chance of serving an outdated payload, within
+# ENDPOINT_TTLS times the factors below (set ADAPTIVE_TTL=0 to keep the fixed TTLs)
+ADAPTIVE_TTL = os.environ.get('ADAPTIVE_TTL', '1') != '0'
+ADAPTIVE_TTL_STALENESS = float(os.environ.get('ADAPTIVE_TTL_STALENESS', 0.1))
+ADAPTIVE_TTL_DECAY = 0.9                    # Weight kept by the past refreshes at every new one
+ADAPTIVE_TTL_MIN_FACTOR = float(os.environ.get('ADAPTIVE_TTL_MIN_FACTOR', 0.25))
+ADAPTIVE_TTL_MAX_FACTOR = float(os.environ.get('ADAPTIVE_TTL_MAX_FACTOR', 4))
+
+# Dynamically generated values
+YAML_FILE_PATH = f'{DIR_USER}/{YAML_FILE_NAME}'
+BADGE_TEMPLATE_PATH = f'{DIR_TEMPLATES}/{BADGE_TEMPLATE_NAME}'
+BADGE_OUTPUT_NAME = os.path.splitext(BADGE_TEMPLATE_NAME)[0]
+BADGE_OUTPUT_HTML = f'{BADGE_OUTPUT_DIR}/{BADGE_OUTPUT_NAME}.html' 
+BADGE_OUTPUT_PNG = f'{BADGE_OUTPUT_DIR}/{BADGE_OUTPUT_NAME}.png'
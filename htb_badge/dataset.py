@@ -0,0 +1,298 @@
+# Dataset files: compact JSON or binary stores with a key-offset index, and the YAML export
+
+import os
+import sys
+import json
+import mmap
+import struct
+import argparse
+
+from .config import DATASET_FORMAT, TEMPLATE_KEYS
+from .common import BadgeError, write_atomic
+
+def map_file(path):
+    """Return a read-only mmap of a file, or None for an empty file (which cannot be mapped)."""
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+# Key index shared by the JSON and binary formats: a header, fixed-size entries sorted by key, then the keys.
+# A lookup bisects the entries in the mapped file, so it reads a few entries instead of parsing the whole index.
+INDEX_HEADER = struct.Struct('<II')      # number of keys, size of the key block
+INDEX_ENTRY = struct.Struct('<IHBII')    # key offset in the key block, key length, value type, value offset, value length
+
+def pack_index(entries):
+    """Build the index of [(key, value type, value offset, value length)]."""
+    entries = sorted((str(key).encode('utf-8'), value_type, offset, length) for key, value_type, offset, length in entries)
+    table, keys = [], []
+    key_offset = 0
+    for encoded_key, value_type, offset, length in entries:
+        table.append(INDEX_ENTRY.pack(key_offset, len(encoded_key), value_type, offset, length))
+        keys.append(encoded_key)
+        key_offset += len(encoded_key)
+    return INDEX_HEADER.pack(len(entries), key_offset) + b''.join(table) + b''.join(keys)
+
+class IndexView:
+    """Read access to an index packed by pack_index() at `start` in a buffer (usually an mmap)."""
+
+    def __init__(self, buffer, start=0):
+        self.buffer = buffer
+        self.count, keys_size = INDEX_HEADER.unpack_from(buffer, start)
+        self.table_start = start + INDEX_HEADER.size
+        self.keys_start = self.table_start + self.count * INDEX_ENTRY.size
+        self.size = INDEX_HEADER.size + self.count * INDEX_ENTRY.size + keys_size
+
+    def entry(self, position):
+        """Return (key bytes, value type, value offset, value length) of the position-th key in sorted order."""
+        key_offset, key_length, value_type, offset, length = INDEX_ENTRY.unpack_from(self.buffer, self.table_start + position * INDEX_ENTRY.size)
+        key_start = self.keys_start + key_offset
+        return self.buffer[key_start:key_start + key_length], value_type, offset, length
+
+    def find(self, key):
+        """Return (value type, value offset, value length) for a key, or None."""
+        encoded_key = key.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.entry(middle)[0] < encoded_key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            found_key, value_type, offset, length = self.entry(low)
+            if found_key == encoded_key:
+                return value_type, offset, length
+        return None
+
+    def __iter__(self):
+        """Yield (key, value type, value offset, value length) in the order the values were written."""
+        entries = [self.entry(position) for position in range(self.count)]
+        for encoded_key, value_type, offset, length in sorted(entries, key=lambda entry: entry[2]):
+            yield str(encoded_key, 'utf-8'), value_type, offset, length
+
+class DatasetStore:
+    """
+    One on-disk format of the flat dataset.
+    write() stores a mapping, read() loads all of it and get() returns only the requested keys
+    (those missing from the dataset are left out), which the indexed formats do without decoding the rest.
+    """
+
+    name = None
+    file_name = None
+    extensions = ()
+
+    def write(self, path, data):
+        raise NotImplementedError
+
+    def read(self, path):
+        raise NotImplementedError
+
+    def get(self, path, keys):
+        data = self.read(path)
+        return {key: data[key] for key in keys if key in data}
+
+class JsonDatasetStore(DatasetStore):
+    """
+    dataset.json: a plain JSON object with one key per line (readable, diffable), and next to it
+    dataset.json.index with the byte offset and length of every value in the file
+    (and the file size, so an index left over from another dataset is never trusted).
+    """
+
+    name = 'json'
+    file_name = 'dataset.json'
+    extensions = ('.json',)
+
+    INDEX_MAGIC = b'HTBI'
+    SIZE = struct.Struct('<4sQ')    # magic, size of the dataset file
+
+    def index_path(self, path):
+        return f'{path}.index'
+
+    def write(self, path, data):
+        encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+        chunks, entries = ['{\n'], []
+        offset = 2
+        for key, value in data.items():
+            prefix = ('  ' if not entries else ',\n  ') + encoder.encode(str(key)) + ': '
+            value_text = encoder.encode(value)
+            offset += len(prefix) if prefix.isascii() else len(prefix.encode('utf-8'))
+            length = len(value_text) if value_text.isascii() else len(value_text.encode('utf-8'))
+            entries.append((key, 0, offset, length))
+            chunks += [prefix, value_text]
+            offset += length
+        chunks.append('\n}\n')
+        content = ''.join(chunks).encode('utf-8')
+
+        write_atomic(path, content)
+        write_atomic(self.index_path(path), self.SIZE.pack(self.INDEX_MAGIC, len(content)) + pack_index(entries))
+
+    def read(self, path):
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def get(self, path, keys):
+        try:
+            index_data = map_file(self.index_path(path))
+        except OSError:
+            index_data = None
+        if index_data is None:
+            return super().get(path, keys)  # No index, parse the whole file
+
+        with index_data:
+            magic, size = self.SIZE.unpack_from(index_data, 0) if len(index_data) >= self.SIZE.size else (None, None)
+            if magic != self.INDEX_MAGIC or size != os.path.getsize(path):
+                return super().get(path, keys)
+            index = IndexView(index_data, self.SIZE.size)
+            found = {key: index.find(key) for key in keys}
+        data = map_file(path)
+        if data is None:
+            return {}
+        with data:
+            return {key: json.loads(data[entry[1]:entry[1] + entry[2]]) for key, entry in found.items() if entry}
+
+class BinaryDatasetStore(DatasetStore):
+    """
+    dataset.bin: a header, the key index, then the values.
+    Strings, integers, floats, booleans and None are stored natively, anything else as JSON.
+    get() maps the file, looks the keys up in the index and decodes only their values.
+    """
+
+    name = 'binary'
+    file_name = 'dataset.bin'
+    extensions = ('.bin',)
+
+    MAGIC = b'HTBD'
+    VERSION = 1
+    HEADER = struct.Struct('<4sB')      # magic, version
+    INT64 = struct.Struct('<q')
+    FLOAT64 = struct.Struct('<d')
+    NONE, FALSE, TRUE, INT, FLOAT, STR, JSON = range(7)
+
+    def encode(self, value):
+        """Return (type, bytes) for one value."""
+        if value is None:
+            return self.NONE, b''
+        if isinstance(value, bool):
+            return (self.TRUE if value else self.FALSE), b''
+        if isinstance(value, int) and -2 ** 63 <= value < 2 ** 63:
+            return self.INT, self.INT64.pack(value)
+        if isinstance(value, float):
+            return self.FLOAT, self.FLOAT64.pack(value)
+        if isinstance(value, str):
+            return self.STR, value.encode('utf-8')
+        return self.JSON, json.dumps(value, ensure_ascii=False, default=str).encode('utf-8')
+
+    def decode(self, value_type, content):
+        if value_type == self.NONE:
+            return None
+        if value_type in (self.FALSE, self.TRUE):
+            return value_type == self.TRUE
+        if value_type == self.INT:
+            return self.INT64.unpack(content)[0]
+        if value_type == self.FLOAT:
+            return self.FLOAT64.unpack(content)[0]
+        if value_type == self.STR:
+            return str(content, 'utf-8')
+        return json.loads(content)
+
+    def write(self, path, data):
+        entries, values = [], []
+        offset = 0
+        for key, value in data.items():
+            value_type, content = self.encode(value)
+            entries.append((key, value_type, offset, len(content)))
+            values.append(content)
+            offset += len(content)
+        write_atomic(path, self.HEADER.pack(self.MAGIC, self.VERSION) + pack_index(entries) + b''.join(values))
+
+    def open_index(self, data):
+        magic, version = self.HEADER.unpack_from(data, 0) if len(data) >= self.HEADER.size else (None, None)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise BadgeError(f"not a version {self.VERSION} binary dataset")
+        return IndexView(data, self.HEADER.size)
+
+    def read(self, path):
+        data = map_file(path)
+        if data is None:
+            return {}
+        with data:
+            index = self.open_index(data)
+            values_start = self.HEADER.size + index.size
+            return {key: self.decode(value_type, data[values_start + offset:values_start + offset + length])
+                    for key, value_type, offset, length in index}
+
+    def get(self, path, keys):
+        data = map_file(path)
+        if data is None:
+            return {}
+        with data:
+            index = self.open_index(data)
+            values_start = self.HEADER.size + index.size
+            found = {}
+            for key in keys:
+                entry = index.find(key)
+                if entry:
+                    value_type, offset, length = entry
+                    found[key] = self.decode(value_type, data[values_start + offset:values_start + offset + length])
+            return found
+
+class YamlDatasetStore(DatasetStore):
+    """dataset.yml, the historical format: always parsed whole, through libyaml (CSafeLoader / CSafeDumper) when PyYAML has it."""
+
+    name = 'yaml'
+    file_name = 'dataset.yml'
+    extensions = ('.yml', '.yaml')
+
+    def write(self, path, data):
+        import yaml
+
+        dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+        text = yaml.dump(data, Dumper=dumper, default_flow_style=False, sort_keys=False, allow_unicode=True)
+        write_atomic(path, text.encode('utf-8'))
+
+    def read(self, path):
+        import yaml
+
+        with open(path, 'r', encoding='utf-8') as file:
+            return yaml.load(file, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader)) or {}
+
+# Available dataset formats (DATASET_FORMAT), add a DatasetStore here to plug in another one
+DATASET_STORES = {store.name: store for store in (JsonDatasetStore(), BinaryDatasetStore(), YamlDatasetStore())}
+
+def get_dataset_store(name=DATASET_FORMAT):
+    if name not in DATASET_STORES:
+        raise BadgeError(f"unknown dataset format '{name}' ({', '.join(DATASET_STORES)})")
+    return DATASET_STORES[name]
+
+def get_dataset_store_for(path):
+    """Return the store of a dataset file, from its extension."""
+    for store in DATASET_STORES.values():
+        if path.endswith(store.extensions):
+            return store
+    raise BadgeError(f"unknown dataset file {path} (expected {', '.join(ext for store in DATASET_STORES.values() for ext in store.extensions)})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m htb_badge.dataset', description="Read or convert a dataset file.")
+    parser.add_argument('path', help="dataset.json, dataset.bin or dataset.yml")
+    parser.add_argument('keys', nargs='*', help="only print these keys (default: the template keys)")
+    parser.add_argument('--all', action='store_true', help="print every key")
+    parser.add_argument('--export', metavar='FILE', help="convert the whole dataset to FILE (format from its extension, e.g. dataset.yml)")
+    args = parser.parse_args(argv)
+
+    try:
+        store = get_dataset_store_for(args.path)
+        if args.export:
+            get_dataset_store_for(args.export).write(args.export, store.read(args.path))
+            print(f"    🔹 {args.path} exported to {args.export}")
+            return 0
+        data = store.read(args.path) if args.all else store.get(args.path, args.keys or TEMPLATE_KEYS)
+    except (OSError, BadgeError) as e:
+        print(f"    {e}")
+        return 1
+    for key, value in data.items():
+        print(f"{key}: {value}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
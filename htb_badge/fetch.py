@@ -0,0 +1,308 @@
+# API endpoints, fetch plan and the concurrent fetch of one user's (and their team's) payloads
+
+import os
+import json
+import glob
+import time
+import requests
+
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from colorama import Fore, Style
+
+from . import config
+from .config import API_MAX_RETRIES, ENDPOINT_TTLS, FETCH_CONCURRENCY, HISTORY_GROUPS, HISTORY_METRICS, PRIVATE_STATUS_CODES, TEAM_DATA_TTL
+from .common import BadgeError
+from .client import api_rate_limiter, session
+from .cache import SingleFlight, http_cache
+
+def get_user_endpoints(user_id):
+    """Build the user URLs to dynamically fetch data from (config.API_URL is read on every call, so it can be repointed)."""
+    api_url = config.API_URL
+    return {
+        "user": f"{api_url}/profile/{user_id}",
+        "user_machines": f"{api_url}/profile/chart/machines/attack/{user_id}",
+        "user_os": f"{api_url}/profile/progress/machines/os/{user_id}",
+        "user_challenges": f"{api_url}/profile/progress/challenges/{user_id}",
+        "user_fortresses": f"{api_url}/profile/progress/fortress/{user_id}",
+        "user_sherlocks": f"{api_url}/profile/progress/sherlocks/{user_id}",
+        "user_endgames": f"{api_url}/profile/progress/endgame/{user_id}",
+        "user_prolabs": f"{api_url}/profile/progress/prolab/{user_id}",
+        "user_activity": f"{api_url}/profile/activity/{user_id}",
+    }
+
+def get_team_endpoints(team_id):
+    """Build the team URLs to dynamically fetch data from."""
+    api_url = config.API_URL
+    return {
+        "team": f"{api_url}/public/team/info/{team_id}",
+        "team_bracket": f"{api_url}/public/rankings/team/ranking_bracket/{team_id}",
+        "team_rank_best": f"{api_url}/public/rankings/team/best/{team_id}?period=1Y",
+        "team_machines": f"{api_url}/public/team/chart/machines/attack/{team_id}",
+        "team_challenges": f"{api_url}/public/team/chart/challenge/categories/{team_id}",
+    }
+
+# Endpoint producing each template key once the dataset is cleaned up (None: generated by the patch step)
+PLACEHOLDER_SOURCES = {
+    'user_name': 'user',
+    'user_rank': 'user',
+    'user_owns': 'user',
+    'user_system_owns': 'user',
+    'user_ranking': 'user',
+    'user_avatar': 'user',
+    'user_points': 'user',
+    'user_respects': 'user',
+    'last_update': None,
+    'last_activity': 'user_activity',   # The patch step reads it from user_profile_activity_1_date_diff
+    'user_points_change_30d': 'user',   # Current value minus the one in the metric history
+    'user_ranking_change_30d': 'user',
+}
+
+# Endpoint producing each HISTORY_GROUPS list once the dataset is cleaned up
+HISTORY_GROUP_SOURCES = {
+    'user_os': 'user_os',
+    'user_challenge_cat': 'user_challenges',
+}
+
+def plan_endpoints(placeholders, history=False):
+    """
+    Map a template's placeholders back to the endpoints producing them.
+    The profile is always fetched, it tells private profiles apart and carries the TEAM_ID.
+    Placeholders without a known source fall back to every user endpoint (every team endpoint for team_* keys),
+    so a custom template never loses data. With history, the endpoints of the recorded metrics (HISTORY_METRICS and
+    the HISTORY_GROUPS lists, shown as <group>_*) are added, so every run records the same series whatever the template.
+    Returns endpoint name -> sorted placeholders needing it, in endpoint order.
+    """
+    user_names, team_names = list(get_user_endpoints(None)), list(get_team_endpoints(None))
+    needed = {'user': set()}
+    if history:
+        placeholders = set(placeholders) | set(HISTORY_METRICS)
+        for group in HISTORY_GROUPS:
+            for name in [HISTORY_GROUP_SOURCES[group]] if group in HISTORY_GROUP_SOURCES else user_names:
+                needed.setdefault(name, set()).add(f'{group}_*')
+    for key in placeholders:
+        if key in PLACEHOLDER_SOURCES:
+            sources = [PLACEHOLDER_SOURCES[key]] if PLACEHOLDER_SOURCES[key] else []
+        elif key.startswith('team_'):
+            sources = team_names
+        else:
+            sources = user_names
+        for name in sources:
+            needed.setdefault(name, set()).add(key)
+    return {name: sorted(needed[name]) for name in user_names + team_names if name in needed}
+
+def format_seconds(seconds):
+    """Round a duration to its largest unit: 45s, 20m, 6h, 2d."""
+    for unit, size in (('d', 24 * 3600), ('h', 3600), ('m', 60)):
+        if seconds >= size:
+            return f"{seconds / size:.0f}{unit}"
+    return f"{seconds:.0f}s"
+
+def print_fetch_plan(user_id, template_path, plan):
+    """Print the requests a render of template_path will make."""
+    print(Style.BRIGHT + Fore.YELLOW + "\n Fetch plan.. \n" + Style.RESET_ALL)
+    print(f"    🔹 Template: {Fore.MAGENTA}{template_path}{Style.RESET_ALL}\n")
+
+    urls = {**get_user_endpoints(user_id), **get_team_endpoints('{team_id}')}
+    for name, keys in plan.items():
+        print(f"    {Fore.GREEN}GET{Style.RESET_ALL} {urls[name]}")
+        print(f"        {name}: {', '.join(keys) or ('private profile check, TEAM_ID' if name == 'user' else '--fetch-all')}")
+        refresh = http_cache.refresh_state(urls[name], ENDPOINT_TTLS.get(name, 0))
+        if refresh:
+            fresh_for, ttl = refresh
+            state = f"served from the cache for {format_seconds(fresh_for)}" if fresh_for else "stale, refreshed on the next run"
+            print(f"        cached: {state} (refresh interval {format_seconds(ttl)})")
+
+    skipped = [name for name in urls if name not in plan]
+    print(f"\n    🔹 {len(plan)} requests planned, {len(skipped)} skipped" + (f": {', '.join(skipped)}" if skipped else "."))
+
+def user_fetch_data(url, ttl=0):
+    """
+    Fetch data from a given URL (through the HTTP cache) and return JSON response if successful.
+    Only 403/404 mean the profile is private; throttling and server errors that outlived the retries are reported as such.
+    """
+    try:
+        status_code, data = http_cache.fetch(session, url, ttl)
+    except requests.RequestException as e:
+        print(f"Failed to retrieve data from {url}: {e.__class__.__name__}")
+        raise BadgeError(f"could not reach the API ({e.__class__.__name__})", 'upstream') from e
+
+    if status_code == 200:
+        return data
+    elif status_code in PRIVATE_STATUS_CODES:
+        print(f"Failed to retrieve data from {url}. Status code: {status_code} - The profile is private.")
+        raise BadgeError(f"profile is private (status code {status_code})", 'private')
+    elif status_code == 429:
+        print(f"Failed to retrieve data from {url}. Status code: {status_code} - Rate limited by the API.")
+        raise BadgeError(f"rate limited by the API after {API_MAX_RETRIES} retries", 'throttled', api_rate_limiter.retry_after())
+    else:
+        print(f"Failed to retrieve data from {url}. Status code: {status_code}")
+        raise BadgeError(f"API error (status code {status_code})", 'upstream')
+
+def team_fetch_data(url, ttl=0):
+    """Fetch data from a given URL (through the HTTP cache) and return JSON response if successful."""
+    try:
+        status_code, data = http_cache.fetch(session, url, ttl)
+    except requests.RequestException as e:
+        print(f"Failed to retrieve data from {url}: {e.__class__.__name__}")
+        return None
+    if status_code == 200:
+        return data
+    else:
+        print(f"Failed to retrieve data from {url}. Status code: {status_code}")
+        return None
+
+class TeamDataCache:
+    """
+    Team payloads shared by the pipelines of every member of a team: each (TEAM_ID, endpoint) is fetched once
+    per `ttl` seconds, and members discovering the same team at once wait for a single request.
+    Failed fetches are not kept, the next member retries them.
+    """
+
+    def __init__(self, ttl=TEAM_DATA_TTL):
+        self.ttl = ttl
+        self.entries = {}       # (team_id, endpoint name) -> (fetched_at, data)
+        self.flights = SingleFlight()
+        self.lock = Lock()
+        self.stats = {'fetched': 0, 'shared': 0}
+
+    def get(self, team_id, name, url, http_ttl=0):
+        key = (str(team_id), name)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                self.stats['shared'] += 1
+                return entry[1]
+
+        data, shared = self.flights.do(key, self.fetch, key, url, http_ttl)
+        with self.lock:
+            self.stats['shared' if shared else 'fetched'] += 1
+        return data
+
+    def fetch(self, key, url, http_ttl):
+        data = team_fetch_data(url, http_ttl)
+        if data is not None:
+            now = time.monotonic()
+            with self.lock:
+                # Forget the expired teams while at it, a long serve process meets many of them
+                for expired in [other for other, (fetched_at, _) in self.entries.items() if now - fetched_at >= self.ttl]:
+                    del self.entries[expired]
+                self.entries[key] = (now, data)
+        return data
+
+    def summary(self):
+        return f"{self.stats['fetched']} fetched, {self.stats['shared']} shared between members"
+
+team_data_cache = TeamDataCache()
+
+def get_team_id(profile_data):
+    """Return the team id from a profile response, or None if the user has no team."""
+    team_info = (profile_data or {}).get("profile", {}).get("team", None)
+    if team_info and isinstance(team_info, dict):
+        return team_info.get('id', None)
+    return None
+
+def fetch_all_endpoints(user_id, endpoints=None):
+    """
+    Fetch the user and team endpoints concurrently over the shared session (only the names in `endpoints` if given).
+    The team requests are queued as soon as the profile response reveals the TEAM_ID,
+    so the whole stage costs roughly the slowest single request instead of the sum of all of them.
+    Team payloads go through team_data_cache, so the members of one team share a single fetch.
+    Returns two dicts (user and team futures) keyed by endpoint name, in endpoint order.
+    """
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as executor:
+        user_futures = {name: executor.submit(user_fetch_data, url, ENDPOINT_TTLS.get(name, 0)) for name, url in get_user_endpoints(user_id).items() if endpoints is None or name in endpoints}
+
+        # Queue the team endpoints while the remaining user endpoints are still in flight
+        team_futures = {}
+        team_id = get_team_id(user_futures["user"].result())
+        if team_id:
+            team_futures = {name: executor.submit(team_data_cache.get, team_id, name, url, ENDPOINT_TTLS.get(name, 0)) for name, url in get_team_endpoints(team_id).items() if endpoints is None or name in endpoints}
+
+    return user_futures, team_futures
+
+def save_to_json(data, user_dir, filename):
+    """Save the fetched data to a JSON file. Returns False if the file could not be written."""
+    try:
+        with open(os.path.join(user_dir, filename), 'w') as json_file:
+            json.dump(data, json_file, indent=4)
+        print(f"    🔹 {Fore.MAGENTA}{filename}{Style.RESET_ALL}")
+        return True
+    except Exception as e:
+        print(f"Failed to save data to {filename}: {e}")
+        return False
+
+# Function to check if 'team' key exists in the profile response
+def check_team_in_profile(profile_data):
+    team_id = None
+    
+    # Check if the profile was retrieved
+    if profile_data:
+        # Navigate through the data and check if the team id is present
+        team_info = profile_data.get("profile", {}).get("team", None)
+
+        # Safely handle the case where 'team' is not found
+        if team_info and isinstance(team_info, dict):
+            team_id = get_team_id(profile_data)
+            if team_id:
+                # print(f"{Fore.GREEN} Generating team data files.. {Style.RESET_ALL}\n")
+                print(Style.BRIGHT + Fore.YELLOW + "\n Generating team data files.. " + Style.RESET_ALL)
+                print(Style.BRIGHT + Fore.CYAN + "\n    🔷 Team ID found => " + Style.RESET_ALL + Style.BRIGHT + Fore.GREEN + f"{team_id}\n" + Style.RESET_ALL)
+            else:
+                print(f"\n{Fore.RED} Team ID not found in the team information.{Style.RESET_ALL}\n")
+        else:
+            print(f"\n{Fore.RED} Team information not found in the profile data.{Style.RESET_ALL}\n")
+    else:
+        print(f"\n{Fore.RED} Profile data not found.{Style.RESET_ALL}\n")
+
+    return team_id
+
+def fetch_user_data(user_id, endpoints=None):
+    """
+    Fetch every endpoint for a user, or only the names in `endpoints` (see plan_endpoints).
+    Returns a dict of endpoint name -> response, user endpoints first then team endpoints, in endpoint order.
+    Endpoints that returned no data are left out.
+    """
+    # print(f"\n{Fore.GREEN} Initializing Data Fetch.. {Style.RESET_ALL}")
+    print(Style.BRIGHT + Fore.YELLOW + "\n Fetching user data.. " + Style.RESET_ALL)
+
+    # Fire all requests at once, then collect each response in endpoint order
+    user_futures, team_futures = fetch_all_endpoints(user_id, endpoints)
+    responses = {name: future.result() for name, future in user_futures.items() if future.result()}
+
+    print(f"\n    User data fetched successfully.")
+
+    if endpoints is not None and not any(name.startswith('team') for name in endpoints):
+        print(f"\n{Fore.MAGENTA} The template uses no team data. Skipping team data fetch.{Style.RESET_ALL}")
+        return responses
+
+    # Check team info in the profile response (already fetched above)
+    team_id = check_team_in_profile(user_futures["user"].result())
+
+    if team_id:
+        # The team requests were already started alongside the user ones, just collect them in order
+        responses.update((name, future.result()) for name, future in team_futures.items() if future.result())
+        print(f"    Team data fetched successfully.")
+    else:
+        print(f"\n{Fore.MAGENTA} No valid TEAM_ID found. Skipping team data fetch.{Style.RESET_ALL}")
+
+    return responses
+
+def save_responses(responses, user_dir):
+    """Save the fetched responses as numbered UD*/UT* JSON files in user_dir."""
+    print(Style.BRIGHT + Fore.YELLOW + "\n Generating data files.. \n" + Style.RESET_ALL)
+
+    # Drop the data files of a previous run, they may come from other endpoints
+    for stale_file in glob.glob(os.path.join(user_dir, 'U[DT]*.json')):
+        os.remove(stale_file)
+
+    save_failed = False
+    for fileid, (name, data) in enumerate(responses.items(), start=1):
+        file_prefix = 'UT' if name.startswith('team') else 'UD'
+        save_failed |= not save_to_json(data, user_dir, f"{file_prefix}{fileid}-{name}.json")
+
+    if save_failed:
+        print("Error: One or more files failed to save.")
+        raise BadgeError("one or more data files failed to save")
+
+    print(f"\n    Data files created successfully.")
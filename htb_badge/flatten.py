@@ -0,0 +1,146 @@
+# Flattening of the API responses into the single-level dataset
+
+import os
+import re
+import json
+
+from colorama import Fore, Style
+
+from .config import FLATTEN_MAX_LIST_ITEMS
+from .common import BadgeError
+from .dataset import get_dataset_store
+
+def flatten_json(data, parent_key='', sep='_', prefix='', max_list_items=None, out=None):
+    """
+    Flatten the JSON structure iteratively (no recursion, so any depth works).
+    Concatenate nested keys with a separator to make them unique, list items get their index appended.
+    Every leaf is written straight into `out` (a new dict by default) with `prefix` in front of its key,
+    so nothing is copied per nesting level. Only the first max_list_items of each list are kept if set.
+    """
+    if out is None:
+        out = {}
+
+    # Base case where the value is not a dict or list
+    if not isinstance(data, (dict, list)):
+        out[f"{prefix}{parent_key}"] = data
+        return out
+
+    def children(key, value):
+        if isinstance(value, dict):
+            return ((f"{key}{sep}{k}" if key else k, v) for k, v in value.items())
+        # Handle lists of dictionaries (e.g., prolabs or challenge categories)
+        items = value if max_list_items is None else value[:max_list_items]
+        return ((f"{key}_{i}", item) for i, item in enumerate(items))
+
+    # Explicit stack of child iterators: leaves are written in document order as they are reached,
+    # containers suspend their parent until they are fully walked
+    stack = [children(parent_key, data)]
+    while stack:
+        for key, value in stack[-1]:
+            if isinstance(value, (dict, list)):
+                stack.append(children(key, value))
+                break
+            out[f"{prefix}{key}"] = value
+        else:
+            stack.pop()
+    return out
+
+# Skips the whitespace between two top-level JSON values
+JSON_WHITESPACE = re.compile(r'\s*')
+json_decoder = json.JSONDecoder()
+
+def iter_json_objects(text):
+    """
+    Yield every top-level JSON value of a document in a single linear pass.
+    Works for a single (pretty-printed) object as well as several concatenated or newline-delimited ones.
+    Raises json.JSONDecodeError, with the line and column, at the first malformed value.
+    """
+    idx = JSON_WHITESPACE.match(text, 0).end()
+    end = len(text)
+    while idx < end:
+        obj, idx = json_decoder.raw_decode(text, idx)
+        yield obj
+        idx = JSON_WHITESPACE.match(text, idx).end()
+
+def read_json_files(directory):
+    """
+    Read all JSON files from the given directory, sorted by numerical prefixes.
+    If no number is found, those files will be sorted alphabetically.
+    """
+    def extract_fileid(filename):
+        # Extracts the first number from the filename, or returns a default large number for sorting if none found
+        match = re.findall(r'\d+', filename)
+        return int(match[0]) if match else float('inf')  # Default to a large number if no number is found
+
+    json_files = sorted(
+        [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.json')],
+        key=lambda x: extract_fileid(os.path.basename(x))
+    )
+    return json_files
+
+def flatten_response(name, data, out=None):
+    """Flatten one endpoint response, prefixing its keys with user_ or team_, into `out`."""
+    prefix = 'team_' if name.startswith('team') else 'user_'
+    return flatten_json(data, prefix=prefix, max_list_items=FLATTEN_MAX_LIST_ITEMS, out=out)
+
+def flatten_responses(responses):
+    """Build the flat dataset straight from the fetched responses, without going through files."""
+    # print(f"\n{Fore.GREEN} Generating Dataset.. {Style.RESET_ALL}")
+    print(Style.BRIGHT + Fore.YELLOW + "\n Generating Dataset.. " + Style.RESET_ALL)
+
+    combined_data = {}
+    for name, data in responses.items():
+        try:
+            flatten_response(name, data, combined_data)
+        except AttributeError as e:
+            print(f"Error processing JSON object from {name}: {e}")
+
+    print(f"\n    A dataset with a flattened structure has been successfully generated.")
+    return combined_data
+
+def flatten_json_files(user_dir):
+    """Build the flat dataset from the UD*/UT* JSON files written with --write-artifacts."""
+    # print(f"\n{Fore.GREEN} Generating Dataset.. {Style.RESET_ALL}")
+    print(Style.BRIGHT + Fore.YELLOW + "\n Generating Dataset.. " + Style.RESET_ALL)
+
+    # Directories to read JSON files from
+    directories = [user_dir]
+
+    # Dictionary to store the combined data
+    combined_data = {}
+
+    # Read and append all JSON files' content from both directories in order
+    for directory in directories:
+        json_files = read_json_files(directory)
+        
+        for json_file in json_files:
+            with open(json_file, 'r') as f:
+                try:
+                    json_objects = list(iter_json_objects(f.read()))
+                except json.JSONDecodeError as e:
+                    print(f"Malformed JSON in {json_file} at line {e.lineno}, column {e.colno}: {e.msg}")
+                    raise BadgeError(f"malformed JSON in {json_file}") from e
+
+                # Flatten each JSON object and add to the combined data
+                for json_obj in json_objects:
+                    try:
+                        # Check the first two characters of the file name and append the appropriate prefix
+                        file_name = os.path.basename(json_file)
+                        prefix = ''
+                        if file_name.startswith('UD'):
+                            prefix = 'user_'
+                        elif file_name.startswith('UT'):
+                            prefix = 'team_'
+
+                        # Flatten straight into the combined data
+                        flatten_json(json_obj, prefix=prefix, max_list_items=FLATTEN_MAX_LIST_ITEMS, out=combined_data)
+                        
+                    except AttributeError as e:
+                        print(f"Error processing JSON object in file {json_file}: {e}")
+
+    print(f"\n    A dataset with a flattened structure has been successfully generated.")
+    return combined_data
+
+def json_to_flat_yaml(yaml_path, user_dir):
+    """Flatten the UD*/UT* JSON files into a YAML dataset (libyaml dumper when available)."""
+    get_dataset_store('yaml').write(yaml_path, flatten_json_files(user_dir))
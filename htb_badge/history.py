@@ -0,0 +1,429 @@
+# Metric history: numeric profile fields over time in SQLite, with range queries, downsampling and retention
+
+import os
+import re
+import sys
+import time
+import argparse
+
+from threading import Lock
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from colorama import Fore, Style
+
+from .config import HISTORY_COMPACT_INTERVAL, HISTORY_DB, HISTORY_ENABLED, HISTORY_GROUPS, HISTORY_MAX_AGE, HISTORY_METRICS, HISTORY_RETENTION, TEMPLATE_KEYS
+from .common import BadgeError
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 24 * 3600, 'w': 7 * 24 * 3600}
+
+def parse_duration(text):
+    """Seconds in '90', '90s', '15m', '12h', '30d' or '2w'."""
+    match = re.fullmatch(r'\s*(\d+)\s*([smhdw]?)\s*', str(text))
+    if not match:
+        raise BadgeError(f"invalid duration '{text}' (e.g. 90s, 15m, 12h, 30d, 2w)")
+    return int(match[1]) * DURATION_UNITS[match[2] or 's']
+
+def parse_retention(text):
+    """Parse 'AGE:BUCKET,...' (e.g. '30d:1d,365d:7d') into [(age, bucket)] in seconds, youngest tier first."""
+    tiers = []
+    for tier in filter(None, (part.strip() for part in text.split(','))):
+        age, _, bucket = tier.partition(':')
+        if not bucket:
+            raise BadgeError(f"invalid retention tier '{tier}' (expected AGE:BUCKET, e.g. 30d:1d)")
+        tiers.append((parse_duration(age), parse_duration(bucket)))
+    return sorted(tiers)
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def extract_metrics(dataset, metrics=HISTORY_METRICS, groups=HISTORY_GROUPS):
+    """
+    Pick the history metrics out of a flat dataset. Returns {metric: value}.
+    Group items are named after their 'name' field rather than their list position,
+    so user_os_0_completion_percentage becomes user_os_Linux_completion_percentage.
+    """
+    values = {key: dataset[key] for key in metrics if is_number(dataset.get(key))}
+    for group, fields in groups.items():
+        position = 0
+        while f'{group}_{position}_name' in dataset:
+            name = dataset[f'{group}_{position}_name']
+            for field in fields:
+                value = dataset.get(f'{group}_{position}_{field}')
+                if is_number(value):
+                    values[f'{group}_{name}_{field}'] = value
+            position += 1
+    return values
+
+# Template keys computed from the history: <metric>_change_<days>d
+CHANGE_KEY_PATTERN = re.compile(r'^(\w+?)_change_(\d+)d$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY, first_ts INTEGER NOT NULL, last_ts INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS samples (
+    user_id INTEGER NOT NULL,
+    metric_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value NUMERIC NOT NULL,
+    PRIMARY KEY (user_id, metric_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# Samples followed by a later one in the same bucket, before a bucket-aligned cutoff
+DELETE_SUPERSEDED_IN_BUCKET = """
+DELETE FROM samples WHERE ts < :cutoff AND EXISTS (
+    SELECT 1 FROM samples AS later
+    WHERE later.user_id = samples.user_id AND later.metric_id = samples.metric_id
+      AND later.ts > samples.ts AND later.ts < (samples.ts / :bucket + 1) * :bucket
+)
+"""
+
+# Samples repeating the value before them (left behind once the samples between them are gone)
+DELETE_REPEATED = """
+DELETE FROM samples WHERE (user_id, metric_id, ts) IN (
+    SELECT user_id, metric_id, ts FROM (
+        SELECT user_id, metric_id, ts, value,
+               LAG(value) OVER (PARTITION BY user_id, metric_id ORDER BY ts) AS previous
+        FROM samples WHERE ts < :cutoff
+    ) WHERE value = previous
+)
+"""
+
+# Samples older than the cutoff except the one still holding at the cutoff
+DELETE_SUPERSEDED_BEFORE = """
+DELETE FROM samples WHERE ts < :cutoff AND EXISTS (
+    SELECT 1 FROM samples AS later
+    WHERE later.user_id = samples.user_id AND later.metric_id = samples.metric_id
+      AND later.ts > samples.ts AND later.ts <= :cutoff
+)
+"""
+
+class HistoryStore:
+    """
+    Metric history in one SQLite file, delta-encoded: a sample is only written when a metric differs
+    from its previous value, and it holds until the next one (users.last_ts says how far the series goes).
+    A year of hourly snapshots of slowly moving counters stays a few rows per metric, and every query
+    is a range scan of the (user_id, metric_id, ts) primary key, whatever the number of users.
+    """
+
+    def __init__(self, path, retention=HISTORY_RETENTION, max_age=HISTORY_MAX_AGE, compact_interval=HISTORY_COMPACT_INTERVAL, enabled=True):
+        self.path = path
+        self.retention = retention
+        self.max_age = max_age
+        self.compact_interval = compact_interval
+        self.enabled = enabled
+        self.lock = Lock()
+        self.connection = None
+        self.metric_ids = {}
+        self.compacted_at = None
+        self.stats = {'snapshots': 0, 'samples': 0, 'unchanged': 0, 'compactions': 0}
+
+    def connect(self):
+        """Open the database on first use, so importing the module creates nothing. Call with the lock held."""
+        if self.connection is None:
+            import sqlite3
+
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')       # Readers (--serve) never wait for a writing batch
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            self.metric_ids = dict(connection.execute('SELECT name, id FROM metrics'))
+            row = connection.execute("SELECT value FROM meta WHERE key = 'compacted_at'").fetchone()
+            self.compacted_at = int(row[0]) if row else 0
+            self.connection = connection
+        return self.connection
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            connection = self.connect()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield connection
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+
+    @contextmanager
+    def reader(self):
+        with self.lock:
+            yield self.connect()
+
+    def metric_id(self, connection, name, create=False):
+        """Id of a metric, created on first write (another process may have created it meanwhile)."""
+        if name not in self.metric_ids:
+            if create:
+                connection.execute('INSERT OR IGNORE INTO metrics (name) VALUES (?)', (name,))
+            row = connection.execute('SELECT id FROM metrics WHERE name = ?', (name,)).fetchone()
+            if row is None:
+                return None
+            self.metric_ids[name] = row[0]
+        return self.metric_ids[name]
+
+    def record(self, user_id, values, ts=None):
+        """Append one snapshot {metric: value} of a user. Returns the number of samples written."""
+        return self.record_many([(user_id, int(time.time()) if ts is None else ts, values)])
+
+    def record_many(self, snapshots):
+        """Append [(user_id, ts, {metric: value})] in one transaction. Returns the number of samples written."""
+        rows = []
+        unchanged = 0
+        previous = {}   # (user_id, metric_id) -> last value, read once then followed through the batch
+        with self.transaction() as connection:
+            for user_id, ts, values in snapshots:
+                user_id, ts = int(user_id), int(ts)
+                for name, value in values.items():
+                    metric_id = self.metric_id(connection, name, create=True)
+                    key = (user_id, metric_id)
+                    if key not in previous:
+                        row = connection.execute('SELECT value FROM samples WHERE user_id = ? AND metric_id = ? AND ts <= ? ORDER BY ts DESC LIMIT 1',
+                                                 (user_id, metric_id, ts)).fetchone()
+                        previous[key] = row[0] if row else None
+                    if previous[key] is not None and previous[key] == value:
+                        unchanged += 1
+                        continue
+                    rows.append((user_id, metric_id, ts, value))
+                    previous[key] = value
+                connection.execute('INSERT INTO users (user_id, first_ts, last_ts) VALUES (?, ?, ?) '
+                                   'ON CONFLICT (user_id) DO UPDATE SET first_ts = MIN(first_ts, excluded.first_ts), last_ts = MAX(last_ts, excluded.last_ts)',
+                                   (user_id, ts, ts))
+            connection.executemany('INSERT OR REPLACE INTO samples (user_id, metric_id, ts, value) VALUES (?, ?, ?, ?)', rows)
+            self.stats['snapshots'] += len(snapshots)
+            self.stats['samples'] += len(rows)
+            self.stats['unchanged'] += unchanged
+        return len(rows)
+
+    def users(self):
+        with self.reader() as connection:
+            return [row[0] for row in connection.execute('SELECT user_id FROM users ORDER BY user_id')]
+
+    def metrics(self, user_id):
+        """Names of the metrics recorded for a user."""
+        with self.reader() as connection:
+            return [row[0] for row in connection.execute('SELECT name FROM metrics WHERE id IN (SELECT DISTINCT metric_id FROM samples WHERE user_id = ?) ORDER BY name',
+                                                         (int(user_id),))]
+
+    def tracked(self, user_id):
+        """(first ts, last ts) of a user's snapshots, or None."""
+        with self.reader() as connection:
+            return connection.execute('SELECT first_ts, last_ts FROM users WHERE user_id = ?', (int(user_id),)).fetchone()
+
+    def value_at(self, user_id, metric, ts):
+        """Value of a metric at a time (that of its last change at or before ts), or None."""
+        with self.reader() as connection:
+            metric_id = self.metric_id(connection, metric)
+            if metric_id is None:
+                return None
+            row = connection.execute('SELECT value FROM samples WHERE user_id = ? AND metric_id = ? AND ts <= ? ORDER BY ts DESC LIMIT 1',
+                                     (int(user_id), metric_id, int(ts))).fetchone()
+            return row[0] if row else None
+
+    def latest(self, user_id):
+        """Last value of every metric of a user. Returns {metric: value}."""
+        with self.reader() as connection:
+            rows = connection.execute('SELECT metrics.name, (SELECT value FROM samples WHERE user_id = ? AND metric_id = metrics.id ORDER BY ts DESC LIMIT 1) FROM metrics',
+                                      (int(user_id),))
+            return {name: value for name, value in rows if value is not None}
+
+    def series(self, user_id, metric, start=0, end=None):
+        """
+        Changes of a metric between start and end (inclusive), led by the value holding at start.
+        Returns [(ts, value)].
+        """
+        end = sys.maxsize if end is None else int(end)
+        with self.reader() as connection:
+            metric_id = self.metric_id(connection, metric)
+            if metric_id is None:
+                return []
+            user_id, start = int(user_id), int(start)
+            points = connection.execute('SELECT ts, value FROM samples WHERE user_id = ? AND metric_id = ? AND ts >= ? AND ts <= ? ORDER BY ts',
+                                        (user_id, metric_id, start, end)).fetchall()
+            if not points or points[0][0] > start:
+                before = connection.execute('SELECT value FROM samples WHERE user_id = ? AND metric_id = ? AND ts < ? ORDER BY ts DESC LIMIT 1',
+                                            (user_id, metric_id, start)).fetchone()
+                if before:
+                    points.insert(0, (start, before[0]))
+            return points
+
+    def downsample(self, user_id, metric, start, end, bucket):
+        """
+        One point per `bucket` seconds between start and end: the value at the end of the bucket,
+        carried over buckets without a change. Buckets are aligned on the epoch (1d buckets are UTC days)
+        and limited to the time the user was tracked. Returns [(bucket start, value)].
+        """
+        bucket = int(bucket)
+        tracked = self.tracked(user_id)
+        if tracked is None:
+            return []
+        start, end = max(int(start), tracked[0]), min(int(end), tracked[1])
+        if start > end:
+            return []
+        first, last = start // bucket, end // bucket
+        with self.reader() as connection:
+            metric_id = self.metric_id(connection, metric)
+            if metric_id is None:
+                return []
+            user_id = int(user_id)
+            # The value of the bucket is that of its last sample (SQLite takes bare columns from the MAX() row)
+            changes = {row[0]: row[1] for row in connection.execute(
+                'SELECT ts / :bucket, value, MAX(ts) FROM samples WHERE user_id = :user AND metric_id = :metric AND ts >= :start AND ts <= :end GROUP BY ts / :bucket',
+                {'bucket': bucket, 'user': user_id, 'metric': metric_id, 'start': first * bucket, 'end': end})}
+            before = connection.execute('SELECT value FROM samples WHERE user_id = ? AND metric_id = ? AND ts < ? ORDER BY ts DESC LIMIT 1',
+                                        (user_id, metric_id, first * bucket)).fetchone()
+        points, value = [], before[0] if before else None
+        for position in range(first, last + 1):
+            value = changes.get(position, value)
+            if value is not None:
+                points.append((position * bucket, value))
+        return points
+
+    def change(self, user_id, metric, seconds, now=None):
+        """
+        How much a metric moved over the last `seconds` (or since the user is tracked, if that is more recent).
+        Returns None when the metric was never recorded.
+        """
+        now = int(time.time()) if now is None else int(now)
+        tracked = self.tracked(user_id)
+        current = self.value_at(user_id, metric, now)
+        if tracked is None or current is None:
+            return None
+        past = self.value_at(user_id, metric, max(now - seconds, tracked[0]))
+        if past is None:
+            return None
+        difference = current - past
+        return round(difference, 2) if isinstance(difference, float) else difference
+
+    def compact(self, now=None):
+        """
+        Apply the retention tiers, then HISTORY_MAX_AGE: older samples are reduced to the last one per bucket,
+        samples no longer differing from the previous one are dropped, and with a max age everything older goes
+        except the value still holding at that point. Returns the number of samples removed.
+        """
+        now = int(time.time()) if now is None else int(now)
+        tiers = parse_retention(self.retention)
+        max_age = parse_duration(self.max_age)
+        removed = 0
+        with self.transaction() as connection:
+            for age, bucket in tiers:
+                cutoff = (now - age) // bucket * bucket
+                removed += connection.execute(DELETE_SUPERSEDED_IN_BUCKET, {'cutoff': cutoff, 'bucket': bucket}).rowcount
+            if tiers:
+                removed += connection.execute(DELETE_REPEATED, {'cutoff': now - tiers[0][0]}).rowcount
+            if max_age:
+                cutoff = now - max_age
+                removed += connection.execute('DELETE FROM samples WHERE user_id IN (SELECT user_id FROM users WHERE last_ts < ?)', (cutoff,)).rowcount
+                connection.execute('DELETE FROM users WHERE last_ts < ?', (cutoff,))
+                removed += connection.execute(DELETE_SUPERSEDED_BEFORE, {'cutoff': cutoff}).rowcount
+                connection.execute('UPDATE samples SET ts = :cutoff WHERE ts < :cutoff', {'cutoff': cutoff})
+                connection.execute('UPDATE users SET first_ts = :cutoff WHERE first_ts < :cutoff', {'cutoff': cutoff})
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('compacted_at', ?)", (str(now),))
+            self.compacted_at = now
+            self.stats['compactions'] += 1
+        return removed
+
+    def compact_if_due(self, now=None):
+        """Compact when the last compaction (by any process) is older than HISTORY_COMPACT_INTERVAL. Returns the samples removed."""
+        now = int(time.time()) if now is None else int(now)
+        with self.lock:
+            self.connect()  # Reads the last compaction time on first use
+        if now - self.compacted_at < parse_duration(self.compact_interval):
+            return 0
+        return self.compact(now)
+
+    def summary(self):
+        stats = self.stats
+        return (f"{stats['snapshots']} snapshots, {stats['samples']} samples written "
+                f"({stats['unchanged']} unchanged values skipped), {stats['compactions']} compactions")
+
+history_store = HistoryStore(HISTORY_DB, enabled=HISTORY_ENABLED)
+
+def record_history(user_id, dataset, now=None):
+    """
+    Append the metrics of a patched dataset to the history, compacting it when due.
+    The history never fails a badge: errors are reported and None is returned, else the number of samples written.
+    """
+    import sqlite3
+
+    try:
+        written = history_store.record(user_id, extract_metrics(dataset), now)
+        history_store.compact_if_due(now)
+    except (sqlite3.Error, OSError, ValueError, BadgeError) as e:
+        print(f"Warning: could not record the metric history of {user_id} ({e})")
+        return None
+    return written
+
+def history_values(user_id, keys=TEMPLATE_KEYS, now=None):
+    """Compute the <metric>_change_<N>d template keys from the history. Returns {key: value}."""
+    import sqlite3
+
+    values = {}
+    for key in keys:
+        match = CHANGE_KEY_PATTERN.match(key)
+        if not match:
+            continue
+        try:
+            values[key] = history_store.change(user_id, match[1], int(match[2]) * DURATION_UNITS['d'], now)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            print(f"Warning: could not read the metric history of {user_id} ({e})")
+            return {}
+    return values
+
+def format_ts(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d %H:%M')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m htb_badge.history', description="Query or compact the metric history.")
+    parser.add_argument('--db', default=HISTORY_DB, help=f"history database (default: {HISTORY_DB})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    show = commands.add_parser('show', help="print the history of a user")
+    show.add_argument('user_id')
+    show.add_argument('metrics', nargs='*', help="metrics to print (default: all of them)")
+    show.add_argument('--since', default='30d', help="how far back to go (default: 30d)")
+    show.add_argument('--bucket', help="one point per bucket, e.g. 1h or 1d (default: every change)")
+    compact = commands.add_parser('compact', help="apply the retention tiers now")
+    compact.add_argument('--retention', default=HISTORY_RETENTION, help=f"AGE:BUCKET tiers (default: {HISTORY_RETENTION})")
+    compact.add_argument('--max-age', default=HISTORY_MAX_AGE, help=f"drop samples older than this, 0 to keep them (default: {HISTORY_MAX_AGE})")
+    commands.add_parser('stats', help="print the size of the history")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"    No history in {args.db}")
+        return 1
+    store = HistoryStore(args.db)
+    try:
+        if args.command == 'show':
+            now = int(time.time())
+            start = now - parse_duration(args.since)
+            for metric in args.metrics or store.metrics(args.user_id):
+                points = (store.downsample(args.user_id, metric, start, now, parse_duration(args.bucket)) if args.bucket
+                          else store.series(args.user_id, metric, start, now))
+                print(Style.BRIGHT + Fore.YELLOW + f"\n {metric}" + Style.RESET_ALL)
+                for ts, value in points:
+                    print(f"    {format_ts(ts)}  {value}")
+        elif args.command == 'compact':
+            store.retention, store.max_age = args.retention, args.max_age
+            print(f"    🔹 {store.compact()} samples removed from {args.db}")
+        else:
+            with store.reader() as connection:
+                users, samples, metrics = connection.execute(
+                    'SELECT (SELECT COUNT(*) FROM users), (SELECT COUNT(*) FROM samples), (SELECT COUNT(*) FROM metrics)').fetchone()
+            print(f"    🔹 {users} users, {metrics} metrics, {samples} samples, {os.path.getsize(args.db) / 1024:.0f} KB, "
+                  f"last compacted {format_ts(store.compacted_at) if store.compacted_at else 'never'}")
+    except BadgeError as e:
+        print(f"    {e}")
+        return 1
+    finally:
+        store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
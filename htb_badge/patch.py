@@ -0,0 +1,329 @@
+# Dataset clean-up rules and metadata (last_update, last_activity)
+
+import os
+import re
+
+from colorama import Fore, Style
+from datetime import datetime, timezone
+
+from .config import PATCH_COMMANDS, PATCH_RULES_FILE, YAML_FILE_NAME
+from .common import BadgeError
+
+# Color codes for terminal output
+class Colors:
+    RED = '\033[91m'
+    GREEN = '\033[92m'
+    RESET = '\033[0m'
+
+def print_red(text):
+    print(f"{Colors.RED}{text}{Colors.RESET}")
+
+def print_green(text):
+    print(f"{Colors.GREEN}{text}{Colors.RESET}")
+
+# Step 1: Find the file with the unique extension in the DIR_USER
+# def find_unique_file(DIR_USER, DATA_FILE_EXTENSION):
+#     files = glob.glob(os.path.join(DIR_USER, DATA_FILE_EXTENSION))
+#     if len(files) != 1:
+#         print(f"Error: Expected one file, but found {len(files)}.")
+#         exit(1)
+#     return files[0]
+
+# Step 2: Print the number of lines and characters in the file
+def print_file_stats(yaml_path):
+    with open(yaml_path, 'r') as file:
+        lines = file.readlines()
+        print_lines_stats(lines, YAML_FILE_NAME)
+        return lines
+
+def print_lines_stats(lines, name):
+    num_lines = len(lines)
+    num_chars = sum(len(line) for line in lines)
+    print(f"\n    🔹 File name: {name}")
+    print(f"    🔹 File details: {num_lines} lines, {num_chars} characters.")
+
+# Step 3: Append metadata at the beginning of the document
+def append_metadata(lines, require_activity=True):
+    last_update = datetime.now(timezone.utc).strftime('%d %b %Y, %H:%M:%S (UTC%z)').replace('+0000', '+00:00')
+    last_activity = None
+    for line in lines:
+        if 'user_profile_activity_1_date_diff' in line:
+            last_activity = line.split(":")[-1].strip()
+            break
+    if not last_activity and require_activity:
+        print("Error: 'user_profile_activity_1_date_diff' not found in the file.")
+        raise BadgeError("'user_profile_activity_1_date_diff' not found in the dataset")
+
+    found_last_update, found_last_activity = False, False
+    for idx, line in enumerate(lines):
+        if line.startswith("last_update:"):
+            lines[idx] = f"last_update: {last_update}\n"
+            found_last_update = True
+        elif line.startswith("last_activity:"):
+            lines[idx] = f"last_activity: {last_activity}\n"
+            found_last_activity = True
+
+    metadata = []
+    if not found_last_update:
+        metadata.append(f"last_update: {last_update}\n")
+    if not found_last_activity and last_activity:
+        metadata.append(f"last_activity: {last_activity}\n")
+    
+    if metadata:
+        lines = metadata + lines
+    return lines
+
+# Step 3 (in memory): Add the metadata keys at the beginning of the dataset
+def add_metadata(data, require_activity=True):
+    last_update = datetime.now(timezone.utc).strftime('%d %b %Y, %H:%M:%S (UTC%z)').replace('+0000', '+00:00')
+    last_activity = data.get('user_profile_activity_1_date_diff')
+    if not last_activity and require_activity:
+        print("Error: 'user_profile_activity_1_date_diff' not found in the file.")
+        raise BadgeError("'user_profile_activity_1_date_diff' not found in the dataset")
+
+    metadata = {'last_update': last_update}
+    if last_activity:
+        metadata['last_activity'] = str(last_activity).strip()
+    metadata.update((key, value) for key, value in data.items() if key not in metadata)
+    return metadata
+
+# Step 4: Cleaning rules, compiled once into a rule set
+PATCH_RULE_PATTERNS = {
+    '-r': re.compile(r'-r "(.*)"'),                 # Remove a specific text from a line
+    '-rF': re.compile(r'-rF "(.*)"'),               # Remove an entire line containing a key
+    '-c': re.compile(r'-c "(.*)" "(.*)"'),          # Replace old text with new text
+    '+k': re.compile(r'\+k "(.*)" "(.*)"'),         # Insert new text before the key (text)
+    'k+': re.compile(r'k\+ "(.*)" "(.*)"'),         # Insert new text after the key (text)
+    '+v': re.compile(r'\+v "(.*)" "(.*)"'),         # Insert new text before the value (text)
+    'v+': re.compile(r'v\+ "(.*)" "(.*)"'),         # Insert new text after the value (text)
+}
+
+def compile_rules(commands):
+    """Parse the cleaning commands once into (kind, text, new_text, silent) rules, keeping their order."""
+    rules = []
+    for command in commands:
+        silent = False
+
+        # Check if the command is marked as silent
+        if command.startswith("silent "):
+            command = command.replace("silent ", "", 1)
+            silent = True
+
+        kind = command.split(' ', 1)[0]
+        match = PATCH_RULE_PATTERNS[kind].match(command) if kind in PATCH_RULE_PATTERNS else None
+        if not match:
+            print(f"Warning: ignoring invalid cleaning command: {command}")
+            continue
+        text, new_text = (match.groups() + (None,))[:2]
+        # Only the removal and replacement commands honour "silent"
+        rules.append((kind, text, new_text, silent and kind in ('-r', '-rF', '-c')))
+    return rules
+
+class PatchRules:
+    """
+    The compiled cleaning rules plus one combined matcher over all their texts.
+    Rules only ever rewrite the line (or entry) they match, so they are applied line by line in a single pass,
+    and a line containing none of the rule texts is skipped without evaluating any rule.
+    """
+
+    def __init__(self, commands):
+        self.commands = list(commands)
+        self.rules = compile_rules(self.commands)
+        texts = sorted({text for _, text, _, _ in self.rules}, key=len, reverse=True)
+        self.matcher = re.compile('|'.join(re.escape(text) for text in texts)) if texts else None
+
+    def matches(self, line):
+        return self.matcher is not None and self.matcher.search(line) is not None
+
+    def apply_to_lines(self, lines):
+        """Apply the rules to YAML text lines in place. Returns the lines and the list of changes."""
+        changes = []
+        for idx, line in enumerate(lines):
+            if not self.matches(line):
+                continue
+            for kind, text, new_text, silent in self.rules:
+                old_value = line.strip()
+                action = None
+
+                if kind == '-r':
+                    if text in line:
+                        line, action = line.replace(text, ""), "deletion"
+                elif kind == '-rF':
+                    if text in line.split(':', 1)[0]:  # Match key before the colon
+                        line, action = "", "deletion (entire line)"
+                elif kind == '-c':
+                    if text in line:
+                        line, action = line.replace(text, new_text), "replacement"
+                elif kind == '+k':
+                    if text in line and ':' in line.split(text)[0]:  # Key domain check
+                        line, action = new_text + " " + line, "insertion before key"
+                elif kind == 'k+':
+                    if text in line and ':' in line.split(text)[0]:  # Key domain check
+                        line, action = line.strip() + " " + new_text + "\n", "insertion after key"
+                elif kind == '+v':
+                    if ':' in line and text in line.split(':', 1)[1]:  # Value domain check
+                        key, value = line.split(':', 1)  # Split key and value at the first colon
+                        line, action = key + ": " + new_text + "" + value.strip() + "\n", "insertion before value"
+                elif kind == 'v+':
+                    if ':' in line and text in line.split(':', 1)[1]:  # Value domain check
+                        key, value = line.split(':', 1)  # Split key and value at the first colon
+                        line, action = key + ": " + value.strip() + " " + new_text, "insertion after value"
+
+                if action and not silent:
+                    changes.append((idx + 1, old_value, line.strip(), action))
+            lines[idx] = line
+        return lines, changes
+
+    def apply_to_mapping(self, data):
+        """
+        Apply the rules to the flat dataset itself, without going through YAML text.
+        Key-side rules rewrite keys, value-side rules only touch string values, which are matched as they
+        appear after "key:" in the dataset file (so ' /storage/' still matches a value starting with /storage/).
+        Returns a new dict and the list of changes.
+        """
+        result = {}
+        changes = []
+        for position, (key, value) in enumerate(data.items(), start=1):
+            if not self.matches(f"{key}: {value}"):
+                result[key] = value
+                continue
+
+            removed = False
+            for kind, text, new_text, silent in self.rules:
+                old_value = f"{key}: {value}"
+                is_text = isinstance(value, str)
+                action = None
+
+                if kind == '-r':
+                    if text in key or (is_text and text in value):
+                        key = key.replace(text, "")
+                        value = value.replace(text, "") if is_text else value
+                        action = "deletion"
+                elif kind == '-rF':
+                    if text in key:
+                        removed, action = True, "deletion (entire line)"
+                elif kind == '-c':
+                    if text in key or (is_text and text in value):
+                        key = key.replace(text, new_text)
+                        value = value.replace(text, new_text) if is_text else value
+                        action = "replacement"
+                elif kind == '+k':
+                    if is_text and text in value:
+                        key, action = f"{new_text} {key}", "insertion before key"
+                elif kind == 'k+':
+                    if is_text and text in value:
+                        value, action = f"{value} {new_text}", "insertion after key"
+                elif kind == '+v':
+                    if is_text and text in f" {value}":
+                        value, action = f"{new_text}{value}", "insertion before value"
+                elif kind == 'v+':
+                    if is_text and text in f" {value}":
+                        value, action = f"{value} {new_text}", "insertion after value"
+
+                if action and not silent:
+                    changes.append((position, old_value, "" if removed else f"{key}: {value}", action))
+                if removed:
+                    break
+
+            if not removed:
+                result[key] = value
+        return result, changes
+
+# Compiled rule sets, keyed by their commands
+compiled_patch_rules = {}
+
+def get_patch_rules(commands):
+    """Return the compiled rule set for a list of commands, compiling it only once per process."""
+    key = tuple(commands)
+    if key not in compiled_patch_rules:
+        compiled_patch_rules[key] = PatchRules(commands)
+    return compiled_patch_rules[key]
+
+def load_patch_commands(file_path=PATCH_RULES_FILE):
+    """Read the cleaning commands from a YAML list if the rules file exists, else use the built-in ones."""
+    if file_path and os.path.exists(file_path):
+        import yaml
+
+        with open(file_path, 'r') as file:
+            commands = yaml.safe_load(file) or []
+        if not isinstance(commands, list) or not all(isinstance(command, str) for command in commands):
+            raise BadgeError(f"{file_path} must contain a list of cleaning commands")
+        return commands
+    return PATCH_COMMANDS
+
+# Cleaning function
+def clean_file(lines, commands):
+    return get_patch_rules(commands).apply_to_lines(lines)
+
+# Step 5: Output the changes made
+def report_changes(changes, initial_lines, initial_chars, final_lines, final_chars):
+    if not changes:
+        print("No changes were made.")
+    else:
+        print(f"\n{Fore.YELLOW} Starting dataset clean-up and formatting.. {Style.RESET_ALL}")
+        # print(Style.BRIGHT + Fore.YELLOW + "\n Generating Dataset.. \n" + Style.RESET_ALL)
+        for change in changes:
+            line_num, old_value, new_value, action = change
+            # print(f"Line {line_num}: {action} performed")
+            # print_red(f"    OLD LINE: {old_value}")
+            # print_green(f"    NEW LINE: {new_value}")
+    
+    # # Print initial file stats
+    # print(f"\nInitial file statistics: {initial_lines} lines, {initial_chars} characters")
+    # # Print final file stats
+    # print(f"Final file statistics: {final_lines} lines, {final_chars} characters")
+    # Print the difference
+    # print(f"Difference: {final_lines - initial_lines} lines, {final_chars - initial_chars} characters")
+
+    # print(f"\nCleanning summary: {initial_lines}/{final_lines} lines (-{final_lines - initial_lines} lines of code), {initial_chars}/{final_chars} characters ({final_chars - initial_chars} characters)")
+    print(f"\n    🔹 Changes made: {len(changes)} ({final_chars - initial_chars} characters and {final_lines - initial_lines} lines of code removed.)")
+    # print(f"\nDifference: {final_lines - initial_lines} lines of code less, {final_chars - initial_chars} characters.")
+
+# Patch the dataset in place
+def patch_dataset(yaml_path, require_activity=True):
+    # yaml_path = find_unique_file(DIR_USER, DATA_FILE_EXTENSION)
+    
+    # Capture initial file stats
+    lines = print_file_stats(yaml_path)
+    lines = patch_lines(lines, require_activity)
+
+    # Write the cleaned file back to disk
+    with open(yaml_path, 'w') as file:
+        file.writelines(lines)
+
+# Patch the flat dataset as a mapping, without dumping and re-parsing YAML
+def patch_dataset_in_memory(combined_data, require_activity=True):
+    entries = [f"{key}: {value}\n" for key, value in combined_data.items()]
+    print_lines_stats(entries, f"{YAML_FILE_NAME} (in memory)")
+    initial_lines = len(entries)
+    initial_chars = sum(len(entry) for entry in entries)
+
+    # Apply metadata update (append or update values)
+    data = add_metadata(combined_data, require_activity)
+
+    # Apply cleaning commands (compiled once, applied in a single pass)
+    data, changes = get_patch_rules(load_patch_commands()).apply_to_mapping(data)
+
+    # Capture final stats
+    entries = [f"{key}: {value}\n" for key, value in data.items()]
+    report_changes(changes, initial_lines, initial_chars, len(entries), sum(len(entry) for entry in entries))
+    return data
+
+# Add the metadata and apply the cleaning commands to the dataset lines
+def patch_lines(lines, require_activity=True):
+    initial_lines = len(lines)
+    initial_chars = sum(len(line) for line in lines)
+    
+    # Apply metadata update (append or update values)
+    lines = append_metadata(lines, require_activity)  # Capture updated lines
+    
+    # Apply cleaning commands (compiled once, applied in a single pass)
+    lines, changes = clean_file(lines, load_patch_commands())
+
+    # Capture final file stats
+    final_lines = len(lines)
+    final_chars = sum(len(line) for line in lines)
+    
+    # Output the changes
+    report_changes(changes, initial_lines, initial_chars, final_lines, final_chars)
+    return lines
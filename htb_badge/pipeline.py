@@ -0,0 +1,136 @@
+# One badge end to end (fetch, flatten, patch, render) and batch runs
+
+import os
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from colorama import Fore, Style
+
+from .config import BADGE_OUTPUT_FORMAT, BADGE_TEMPLATE_NAME, BATCH_WORKERS, DATASET_FORMAT, FETCH_ALL_ENDPOINTS, RENDER_SKIP_UNCHANGED, TEMPLATE_KEYS, WRITE_ARTIFACTS
+from .common import BadgeError, get_job_paths, get_template_name, print_banner
+from .trace import tracer
+from .client import api_rate_limiter
+from . import transport
+from .cache import avatar_cache, http_cache
+from .fetch import fetch_user_data, plan_endpoints, save_responses, team_data_cache
+from .flatten import flatten_json_files, flatten_responses
+from .patch import patch_dataset_in_memory
+from .dataset import get_dataset_store
+from .history import history_store, history_values, record_history
+from .template import compile_template
+from .render import render_badge
+
+def generate_badge(user_id, template_name=BADGE_TEMPLATE_NAME, batch=False, write_artifacts=WRITE_ARTIFACTS, fetch_all=FETCH_ALL_ENDPOINTS, force=False, output_format=BADGE_OUTPUT_FORMAT):
+    """
+    Run the whole fetch -> flatten -> patch -> render pipeline for one user.
+    Only the endpoints the template's placeholders come from are fetched, unless fetch_all is set,
+    and the render is skipped when the badge inputs did not change, unless force is set.
+    The numeric fields of every run are appended to the metric history (HISTORY_DB) unless HISTORY=0.
+    Each stage hands its objects straight to the next one; with write_artifacts the stages instead go
+    through the UD*/UT* JSON files and the dataset file (DATASET_FORMAT), which are kept for debugging.
+    The badge is a PNG, or with output_format='svg' the template's layout drawn as an SVG without a renderer.
+    Raises BadgeError when the badge cannot be generated. Returns the path of the generated badge file.
+    """
+    paths = get_job_paths(user_id, template_name, batch)
+    if not os.path.exists(paths['template_path']):
+        raise BadgeError(f"template {paths['template_path']} not found")
+
+    os.makedirs(os.path.dirname(paths['output_png']), exist_ok=True)
+
+    print_banner(user_id, paths)
+    with tracer.span('pipeline', user=user_id, template=template_name) as job:
+        with tracer.span('plan', user=user_id) as span:
+            endpoints = None if fetch_all else plan_endpoints(compile_template(paths['template_path'], localize=False).placeholders, history_store.enabled)
+            span['endpoints'] = 'all' if endpoints is None else len(endpoints)
+        with tracer.span('fetch', user=user_id) as span:
+            responses = fetch_user_data(user_id, endpoints)
+            span['responses'] = len(responses)
+        require_activity = endpoints is None or 'user_activity' in endpoints
+
+        if write_artifacts:
+            os.makedirs(paths['user_dir'], exist_ok=True)
+            with tracer.span('save_responses', user=user_id):
+                save_responses(responses, paths['user_dir'])
+            with tracer.span('flatten_files', user=user_id) as span:
+                combined_data = flatten_json_files(paths['user_dir'])
+                span['keys'] = len(combined_data)
+            with tracer.span('patch', user=user_id) as span:
+                full_dataset = patch_dataset_in_memory(combined_data, require_activity)
+                span['keys'] = len(full_dataset)
+            # Keep the patched dataset on disk, and render from the template keys read back through its index
+            store = get_dataset_store(DATASET_FORMAT)
+            dataset_path = os.path.join(paths['user_dir'], store.file_name)
+            with tracer.span('dataset_write', user=user_id, format=store.name) as span:
+                store.write(dataset_path, full_dataset)
+                span['bytes_out'] = os.path.getsize(dataset_path)
+            with tracer.span('dataset_get', user=user_id, format=store.name) as span:
+                dataset = store.get(dataset_path, TEMPLATE_KEYS)
+                span['keys'] = len(dataset)
+        else:
+            with tracer.span('flatten', user=user_id) as span:
+                combined_data = flatten_responses(responses)
+                span['keys'] = len(combined_data)
+            with tracer.span('patch', user=user_id) as span:
+                full_dataset = dataset = patch_dataset_in_memory(combined_data, require_activity)
+                span['keys'] = len(dataset)
+
+        # Append this run to the metric history, which also provides the <metric>_change_<N>d template keys
+        if history_store.enabled:
+            with tracer.span('history', user=user_id) as span:
+                span['samples'] = record_history(user_id, full_dataset)
+                dataset.update(history_values(user_id))
+
+        job['rendered'] = render_badge(paths, dataset, RENDER_SKIP_UNCHANGED and not force, output_format)
+    return paths[f'output_{output_format}']
+
+def read_batch_file(file_path):
+    """
+    Read batch jobs from a file ('-' for stdin), one "USER_ID [TEMPLATE]" per line.
+    Blank lines and lines starting with '#' are ignored.
+    """
+    file = sys.stdin if file_path == '-' else open(file_path, 'r')
+    jobs = []
+    with file:
+        for line in file:
+            fields = line.split('#', 1)[0].split()
+            if fields:
+                jobs.append((fields[0], get_template_name(fields[1]) if len(fields) > 1 else None))
+    return jobs
+
+def run_batch(jobs, default_template=BADGE_TEMPLATE_NAME, workers=BATCH_WORKERS, write_artifacts=WRITE_ARTIFACTS, fetch_all=FETCH_ALL_ENDPOINTS, force=False, output_format=BADGE_OUTPUT_FORMAT):
+    """
+    Generate one badge per (user_id, template) job in this process, with at most `workers` running at once.
+    A failing user is reported and never stops the others. Returns the list of per-user results.
+    """
+    def run_job(user_id, template_name):
+        started = time.perf_counter()
+        try:
+            output = generate_badge(user_id, template_name, batch=True, write_artifacts=write_artifacts, fetch_all=fetch_all, force=force, output_format=output_format)
+            return (user_id, template_name, True, output, time.perf_counter() - started)
+        except Exception as e:
+            return (user_id, template_name, False, str(e) or e.__class__.__name__, time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(run_job, user_id, template_name or default_template) for user_id, template_name in jobs]
+        # Report in the order the jobs were given
+        results = [future.result() for future in futures]
+
+    print(Style.BRIGHT + Fore.YELLOW + "\n Batch report.. \n" + Style.RESET_ALL)
+    for user_id, template_name, ok, detail, elapsed in results:
+        status = f"{Fore.GREEN}OK  {Style.RESET_ALL}" if ok else f"{Fore.RED}FAIL{Style.RESET_ALL}"
+        print(f"    {status} {user_id:>8} {template_name:<20} {elapsed:6.2f}s  {detail}")
+
+    succeeded = sum(1 for result in results if result[2])
+    print(f"\n    🔹 {succeeded}/{len(results)} badges generated.")
+    print(f"    🔹 HTTP cache: {http_cache.summary()}")
+    print(f"    🔹 Avatar cache: {avatar_cache.summary()}")
+    print(f"    🔹 Team data: {team_data_cache.summary()}")
+    print(f"    🔹 API: {api_rate_limiter.summary()}")
+    if history_store.enabled:
+        print(f"    🔹 History: {history_store.summary()}")
+    if transport.cassette:
+        print(f"    🔹 Cassette: {transport.cassette.summary()}")
+    if tracer.enabled:
+        tracer.print_percentiles()
+    return results
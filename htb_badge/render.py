@@ -0,0 +1,363 @@
+# Badge rendering: wkhtmltoimage, transparency, render digests, the pool of warm renderer processes and the SVG backend
+# PIL and imgkit are imported by the functions that render, so importing the pipeline does not pay for them
+
+import os
+import json
+import hashlib
+import resource
+import itertools
+import multiprocessing
+import multiprocessing.connection
+
+from collections import deque
+from threading import Lock, Thread
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from colorama import Fore, Style
+
+from .config import ASSET_LOCALIZATION, AVATAR_DEFAULT_SIZE, AVATAR_SIZES, BADGE_OUTPUT_FORMAT, BADGE_OUTPUT_FORMATS, CHROMA_KEY_TOLERANCE, RENDER_DIGEST_KEY, RENDER_DIGEST_LAST_UPDATE, RENDER_OPTIONS, RENDER_SKIP_UNCHANGED, RENDER_TIMEOUT, RENDER_WORKER_MAX_JOBS, RENDER_WORKER_MAX_MEMORY_MB
+from .common import BadgeError
+from .trace import tracer
+from .cache import avatar_cache
+from .template import compile_template, get_user_data, replace_placeholders_in_html
+from .svg import get_icon_references, get_svg_layout_digest, read_svg_digest, write_svg
+
+# Make the white background transparent using whole-image band operations
+def make_white_transparent(img, tolerance=0):
+    """
+    Return an RGBA copy of the image where pure white pixels are fully transparent.
+    With a tolerance > 0, works as an anti-aliased chroma key instead: the alpha fades in over the
+    `tolerance` levels closest to white, so the anti-aliased edges blend instead of leaving a white fringe.
+    """
+    from PIL import ImageChops
+
+    img = img.convert("RGBA")  # Ensure the image is in RGBA mode
+    r, g, b, a = img.split()
+
+    # Darkest channel of every pixel, 255 only where the pixel is pure white
+    darkest = ImageChops.darker(ImageChops.darker(r, g), b)
+
+    if tolerance <= 0:
+        # 255 where white, 0 elsewhere; subtracting it zeroes the alpha of white pixels only
+        white = darkest.point(lambda v: 255 if v == 255 else 0)
+        alpha = ImageChops.subtract(a, white)
+    else:
+        # 0 at pure white, ramping up to 255 once a channel is `tolerance` levels away from white
+        key = darkest.point(lambda v: min(255, (255 - v) * 255 // tolerance))
+        alpha = ImageChops.multiply(a, key)
+
+    img.putalpha(alpha)
+    return img
+
+# Convert HTML to PNG with transparency, returns False if the PNG could not be generated
+def html_to_png_with_transparency(html_path, png_path, digest=None, renderer_config=None):
+    import imgkit
+    from PIL import Image, PngImagePlugin
+
+    # Step 1: Convert HTML to PNG using imgkit
+    try:
+        imgkit.from_file(html_path, png_path, options=RENDER_OPTIONS, config=renderer_config)
+        #print(f"\n{Fore.GREEN} ✔️ Badge created succesfully.")
+        print(Style.BRIGHT + Fore.GREEN + f"\n ✔️  Badge created succesfully and saved in the {os.path.dirname(png_path)} folder." + Style.RESET_ALL)
+    except Exception as e:
+        print(f"\nError generating PNG from {html_path}: {e}\n")
+        return False
+
+    # Step 2: Check if the PNG file was created successfully
+    if not os.path.exists(png_path):
+        print(f"\nPNG file {png_path} was not created. Exiting.\n")
+        return False
+
+    # Step 3: Open the PNG image and process the transparency
+    img = make_white_transparent(Image.open(png_path), CHROMA_KEY_TOLERANCE)
+
+    # Save the image, stamped with the render digest so an unchanged badge is not rendered again
+    pnginfo = None
+    if digest:
+        pnginfo = PngImagePlugin.PngInfo()
+        pnginfo.add_text(RENDER_DIGEST_KEY, digest)
+    img.save(png_path, "PNG", pnginfo=pnginfo)
+    # print(f"\nConverted {html_path} to PNG with transparent background saved as {png_path}")
+    return True
+
+def get_peak_memory_mb():
+    """Peak resident memory of this process and its finished children (wkhtmltoimage), in MB."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024  # ru_maxrss is in KB on Linux
+
+def get_memory_mb():
+    """
+    Current resident memory of this process in MB, or None where /proc is not available.
+    Unlike ru_maxrss, it goes back down, so one large render does not condemn every later check.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            pages = int(file.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+def render_worker(connection, max_jobs, max_memory_mb):
+    """
+    Body of a renderer process: take (job_id, html_path, png_path, digest) jobs from its pipe until told to stop,
+    then retire once it has rendered max_jobs badges or its resident memory is above max_memory_mb.
+    """
+    import imgkit
+
+    renderer_config = imgkit.config()  # Resolve the wkhtmltoimage binary once for the lifetime of the worker
+    rendered = 0
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        job_id, html_path, png_path, digest = job
+        try:
+            ok, error = html_to_png_with_transparency(html_path, png_path, digest, renderer_config), None
+        except Exception as e:
+            ok, error = False, str(e)
+        rendered += 1
+        memory_mb = get_memory_mb()
+        retiring = rendered >= max_jobs or (memory_mb is not None and memory_mb > max_memory_mb)
+        connection.send(('done', job_id, ok, error, retiring))
+        if retiring:
+            break
+    connection.close()
+
+class RendererPool:
+    """
+    Keeps N renderer processes warm and hands each one HTML jobs over its own pipe.
+    Workers are recycled after RENDER_WORKER_MAX_JOBS badges or when they exceed RENDER_WORKER_MAX_MEMORY_MB,
+    and replaced if they die, so a long batch never runs out of renderers.
+    No lock is shared with the workers, so a killed worker cannot stall the others: its pipe reaches EOF,
+    its job fails and a new worker takes its place.
+    render() is thread-safe and blocks until the badge is written, its worker dies or `timeout` seconds pass.
+    """
+
+    def __init__(self, workers, max_jobs=RENDER_WORKER_MAX_JOBS, max_memory_mb=RENDER_WORKER_MAX_MEMORY_MB, timeout=RENDER_TIMEOUT):
+        # Spawn (not fork) so workers never inherit locks held by the fetch threads
+        self.context = multiprocessing.get_context('spawn')
+        self.size = workers
+        self.max_jobs = max_jobs
+        self.max_memory_mb = max_memory_mb
+        self.timeout = timeout
+        self.workers = {}         # worker_id -> (Process, Connection)
+        self.idle = []            # worker_ids waiting for a job
+        self.running = {}         # worker_id -> job_id currently being rendered
+        self.backlog = deque()    # jobs waiting for an idle worker
+        self.pending = {}         # job_id -> Future
+        self.worker_ids = itertools.count(1)
+        self.job_ids = itertools.count(1)
+        self.lock = Lock()
+        self.closed = False
+        for _ in range(workers):
+            self.spawn_worker()
+        self.collector = Thread(target=self.collect_results, name='renderer-pool', daemon=True)
+        self.collector.start()
+
+    def spawn_worker(self):
+        worker_id = next(self.worker_ids)
+        connection, worker_connection = self.context.Pipe()
+        process = self.context.Process(
+            target=render_worker,
+            args=(worker_connection, self.max_jobs, self.max_memory_mb),
+            daemon=True,
+        )
+        process.start()
+        worker_connection.close()  # Only the worker holds its end, so its exit shows up as EOF here
+        self.workers[worker_id] = (process, connection)
+        self.idle.append(worker_id)
+
+    def dispatch(self):
+        """Hand the queued jobs to the idle workers (called with the lock held)."""
+        while self.idle and self.backlog:
+            worker_id = self.idle.pop()
+            job = self.backlog.popleft()
+            self.running[worker_id] = job[0]
+            self.workers[worker_id][1].send(job)
+
+    def render(self, html_path, png_path, digest=None):
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("renderer pool is closed")
+            job_id = next(self.job_ids)
+            self.pending[job_id] = future
+            self.backlog.append((job_id, html_path, png_path, digest))
+            self.dispatch()
+        try:
+            ok, error = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self.lock:
+                self.pending.pop(job_id, None)
+                self.backlog = deque(job for job in self.backlog if job[0] != job_id)
+                for worker_id, running_job_id in self.running.items():
+                    if running_job_id == job_id:
+                        self.workers[worker_id][0].terminate()  # A wedged wkhtmltoimage; the worker is replaced on EOF
+            ok, error = False, f"no result from the renderer pool after {self.timeout:g}s"
+        if error:
+            print(f"\nError generating PNG from {html_path}: {error}\n")
+        return ok
+
+    def collect_results(self):
+        """Route worker messages to the waiting render() calls and keep the pool at full size."""
+        while True:
+            with self.lock:
+                if self.closed and not self.workers:
+                    return
+                connections = {connection: worker_id for worker_id, (_, connection) in self.workers.items()}
+
+            # Workers spawned meanwhile are picked up on the next pass
+            for connection in multiprocessing.connection.wait(list(connections), timeout=1):
+                worker_id = connections[connection]
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    message = None
+
+                with self.lock:
+                    if message is None:
+                        self.worker_exited(worker_id)
+                    else:
+                        _, job_id, ok, error, retiring = message
+                        self.running.pop(worker_id, None)
+                        future = self.pending.pop(job_id, None)
+                        if future:
+                            future.set_result((ok, error))
+                        if not retiring and not self.closed:
+                            self.idle.append(worker_id)
+                    self.dispatch()
+
+    def worker_exited(self, worker_id):
+        """
+        Forget a worker whose pipe reached EOF, because it retired or crashed (e.g. killed by the OOM killer),
+        fail the job it was rendering and start a new one (called with the lock held).
+        """
+        process, connection = self.workers.pop(worker_id)
+        connection.close()
+        process.join(timeout=5)
+        if worker_id in self.idle:
+            self.idle.remove(worker_id)
+        job_id = self.running.pop(worker_id, None)
+        future = self.pending.pop(job_id, None) if job_id else None
+        if future:
+            future.set_result((False, f"renderer worker exited with code {process.exitcode}"))
+        if not self.closed:
+            self.spawn_worker()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            for job in self.backlog:
+                future = self.pending.pop(job[0], None)
+                if future:
+                    future.set_result((False, "renderer pool is closed"))
+            self.backlog.clear()
+            for process, connection in self.workers.values():
+                try:
+                    connection.send(None)
+                except OSError:
+                    pass  # Already gone, the collector sees its EOF
+        self.collector.join(timeout=self.timeout)
+        with self.lock:
+            for process, _ in self.workers.values():
+                process.terminate()
+
+# Renderer pool shared by every pipeline in the process, started by the CLI when RENDER_WORKERS > 0
+renderer_pool = None
+
+def start_renderer_pool(workers):
+    """Start the renderer pool used by render_badge() (with 0 workers, badges keep rendering in-process)."""
+    global renderer_pool
+    if workers > 0:
+        renderer_pool = RendererPool(workers)
+    return renderer_pool
+
+def stop_renderer_pool():
+    global renderer_pool
+    if renderer_pool:
+        renderer_pool.close()
+        renderer_pool = None
+
+def get_render_digest(template, user_data, last_update_policy=RENDER_DIGEST_LAST_UPDATE, output_format='png', svg_icons=None):
+    """
+    Digest of everything a render depends on: the template file hash, the values of its placeholders
+    and the renderer options (for an SVG, its layout and the icon references svg_icons instead of the renderer options).
+    last_update is dropped ('ignore'), cut to its date ('date') or kept ('include').
+    """
+    values = {key: user_data.get(key) for key in sorted(template.placeholders)}
+    if 'last_update' in values:
+        if last_update_policy == 'ignore':
+            del values['last_update']
+        elif last_update_policy == 'date':
+            values['last_update'] = str(values['last_update']).split(',', 1)[0]  # '18 Oct 2026, 10:00:00 (UTC+00:00)'
+
+    if output_format == 'svg':
+        state = {'template': template.digest, 'values': values, 'svg_layout': get_svg_layout_digest(os.path.basename(template.path), svg_icons)}
+    else:
+        state = {'template': template.digest, 'values': values, 'options': RENDER_OPTIONS, 'chroma_key_tolerance': CHROMA_KEY_TOLERANCE}
+    return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def read_render_digest(png_path):
+    """Return the render digest stored in an existing badge, or None."""
+    from PIL import Image
+
+    try:
+        with Image.open(png_path) as img:
+            return getattr(img, 'text', {}).get(RENDER_DIGEST_KEY)
+    except (OSError, ValueError):
+        return None
+
+def render_badge(paths, dataset, skip_unchanged=RENDER_SKIP_UNCHANGED, output_format=BADGE_OUTPUT_FORMAT):
+    """
+    Render the badge for a patched dataset, as a PNG through wkhtmltoimage or as an SVG drawn by htb_badge.svg
+    in the layout of the same template. Returns False when the render was skipped because nothing changed.
+    """
+    if output_format not in BADGE_OUTPUT_FORMATS:
+        raise BadgeError(f"unknown badge format '{output_format}' ({', '.join(BADGE_OUTPUT_FORMATS)})")
+
+    # Step 1: Compile the template (cached after the first badge), an SVG only needs its placeholders and not its assets
+    template = compile_template(paths['template_path'], localize=output_format != 'svg')
+    # print(f"\n{Fore.GREEN} Preparing Template.. {Style.RESET_ALL}")
+    print(Style.BRIGHT + Fore.YELLOW + " \n Preparing Template.. " + Style.RESET_ALL)
+    print(f"\n    Template compiled successfully.\n")
+
+    # Step 2: Pick the template values from the dataset, with the avatar served from the local cache
+    user_data = get_user_data(dataset)
+    if 'user_avatar' in template.placeholders:
+        avatar_width = AVATAR_SIZES.get(paths['template_name'], AVATAR_DEFAULT_SIZE)
+        # An SVG embeds the avatar, a file:// URL would only resolve on this machine
+        mode = 'inline' if output_format == 'svg' and ASSET_LOCALIZATION != 'off' else ASSET_LOCALIZATION
+        with tracer.span('avatar', width=avatar_width):
+            user_data['user_avatar'] = avatar_cache.localize(user_data['user_avatar'], avatar_width, mode)
+
+    # Step 3: Skip the render entirely if the last successful one had the same inputs
+    output_path = paths[f'output_{output_format}']
+    svg_icons = get_icon_references() if output_format == 'svg' else None
+    digest = get_render_digest(template, user_data, output_format=output_format, svg_icons=svg_icons)
+    read_digest = read_svg_digest if output_format == 'svg' else read_render_digest
+    if skip_unchanged and read_digest(output_path) == digest:
+        print(Style.BRIGHT + Fore.GREEN + f" ✔️  Badge unchanged, keeping {output_path}." + Style.RESET_ALL)
+        return False
+
+    # No browser engine for an SVG: the layout is drawn from the values, with a transparent background
+    if output_format == 'svg':
+        with tracer.span('svg') as span:
+            span['bytes_out'] = write_svg(output_path, paths['template_name'], user_data, svg_icons, digest)
+        print(Style.BRIGHT + Fore.GREEN + f"\n ✔️  Badge created succesfully and saved in the {os.path.dirname(output_path)} folder." + Style.RESET_ALL)
+        return True
+
+    # Step 4: Render the template into the HTML file handed to the renderer
+    with tracer.span('placeholders') as span:
+        replace_placeholders_in_html(paths['template_path'], paths['output_html'], user_data)
+        span['bytes_out'] = os.path.getsize(paths['output_html'])
+
+    # Step 5: Convert the updated HTML file to PNG with transparency (on a warm worker when the pool is running)
+    render = renderer_pool.render if renderer_pool else html_to_png_with_transparency
+    with tracer.span('html_to_png', pool=renderer_pool is not None) as span:
+        if not render(paths['output_html'], paths['output_png'], digest):
+            raise BadgeError(f"could not render {paths['output_png']}", 'render')
+        span['bytes_out'] = os.path.getsize(paths['output_png'])
+    return True
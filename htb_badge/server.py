@@ -0,0 +1,170 @@
+# --serve: badges over HTTP with an in-memory LRU cache and request coalescing
+
+import os
+import re
+import json
+import time
+
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import BoundedSemaphore, Lock
+from colorama import Fore, Style
+
+from .config import BADGE_TEMPLATE_NAME, BATCH_WORKERS, DIR_TEMPLATES, SERVE_CACHE_MAX_BYTES, SERVE_CACHE_MAX_ITEMS, SERVE_CACHE_TTL, SERVE_HOST, SERVE_PORT
+from .common import BadgeError, get_template_name
+from .client import api_rate_limiter
+from .cache import SingleFlight
+from .pipeline import generate_badge
+from .svg import SVG_LAYOUTS
+
+class BadgeCache:
+    """In-memory LRU of rendered badges, bounded by entry count and bytes, with a TTL per entry."""
+
+    def __init__(self, max_items=SERVE_CACHE_MAX_ITEMS, max_bytes=SERVE_CACHE_MAX_BYTES, ttl=SERVE_CACHE_TTL):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()    # key -> (expires_at, badge bytes), least recently used first
+        self.size = 0
+        self.lock = Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self.remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, data):
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            if len(data) > self.max_bytes:
+                return
+            self.entries[key] = (time.monotonic() + self.ttl, data)
+            self.size += len(data)
+            while len(self.entries) > self.max_items or self.size > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        """Drop an entry, the lock must be held."""
+        _, data = self.entries.pop(key)
+        self.size -= len(data)
+
+    def summary(self):
+        with self.lock:
+            stats = dict(self.stats, entries=len(self.entries), bytes=self.size)
+        return stats
+
+class BadgeServer:
+    """
+    Serves GET /badge/{user_id}.png?template=compact (or .svg, drawn without the renderer) by running the pipeline on demand.
+    The HTTP session and renderer pool stay warm between requests, rendered badges are kept in a BadgeCache,
+    concurrent requests for the same badge share one fetch and render, and at most `workers` pipelines run at once.
+    """
+
+    BADGE_PATH_PATTERN = re.compile(r'^/badge/(\d+)\.(png|svg)$')
+    CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+    # HTTP status of each BadgeError kind: only a private or unknown profile is a 404, throttling and outages are retryable
+    ERROR_STATUS = {'private': 404, 'throttled': 503, 'upstream': 502, 'render': 500}
+    TEMPLATE_PATTERN = re.compile(r'^[A-Za-z0-9_-]+(\.html)?$')
+
+    def __init__(self, host=SERVE_HOST, port=SERVE_PORT, workers=BATCH_WORKERS, default_template=BADGE_TEMPLATE_NAME, cache=None):
+        self.default_template = default_template
+        self.cache = cache or BadgeCache()
+        self.flights = SingleFlight()
+        self.pipelines = BoundedSemaphore(max(1, workers))
+        self.httpd = ThreadingHTTPServer((host, port), self.make_handler())
+        self.httpd.daemon_threads = True
+
+    def make_handler(self):
+        server = self
+
+        class BadgeRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, content_type, body, extra_headers = server.handle(self.path)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in extra_headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                print(f"    {Fore.CYAN}{self.address_string()}{Style.RESET_ALL} {format % args}")
+
+        return BadgeRequestHandler
+
+    def handle(self, path):
+        """Answer one GET request. Returns (status, content type, body, extra headers)."""
+        url = urlsplit(path)
+        if url.path == '/healthz':
+            health = dict(self.cache.summary(), api=api_rate_limiter.stats)
+            return 200, 'application/json', json.dumps(health).encode(), {}
+
+        match = self.BADGE_PATH_PATTERN.match(url.path)
+        if not match:
+            return self.error(404, "not found")
+        template = parse_qs(url.query).get('template', [self.default_template])[0]
+        if not self.TEMPLATE_PATTERN.match(template):
+            return self.error(400, "invalid template name")
+        template_name = get_template_name(template)
+        if not os.path.exists(os.path.join(DIR_TEMPLATES, template_name)):
+            return self.error(404, f"unknown template {template}")
+        if match.group(2) == 'svg' and template_name not in SVG_LAYOUTS:
+            return self.error(404, f"no SVG layout for template {template}")
+
+        key = (match.group(1), template_name, match.group(2))
+        content_type = self.CONTENT_TYPES[match.group(2)]
+        data = self.cache.get(key)
+        if data is not None:
+            self.cache.count('hits')
+            return 200, content_type, data, self.badge_headers('hit')
+
+        try:
+            data, shared = self.flights.do(key, self.render, *key)
+        except BadgeError as e:
+            self.cache.count('errors')
+            headers = {'Retry-After': str(e.retry_after)} if e.retry_after else {}
+            return self.error(self.ERROR_STATUS.get(e.kind, 500), str(e), headers)
+        except Exception as e:
+            self.cache.count('errors')
+            return self.error(500, str(e) or e.__class__.__name__)
+        self.cache.count('coalesced' if shared else 'misses')
+        return 200, content_type, data, self.badge_headers('coalesced' if shared else 'miss')
+
+    def render(self, user_id, template_name, output_format):
+        """Run the pipeline for one badge and cache the PNG or SVG bytes."""
+        with self.pipelines:
+            output_path = generate_badge(user_id, template_name, batch=True, write_artifacts=False, output_format=output_format)
+        with open(output_path, 'rb') as file:
+            data = file.read()
+        self.cache.put((user_id, template_name, output_format), data)
+        return data
+
+    def badge_headers(self, cache_status):
+        return {'Cache-Control': f'public, max-age={self.cache.ttl}', 'X-Badge-Cache': cache_status}
+
+    def error(self, status, message, headers=None):
+        return status, 'application/json', json.dumps({'error': message}).encode(), headers or {}
+
+    def serve_forever(self):
+        host, port = self.httpd.server_address[:2]
+        print(Style.BRIGHT + Fore.YELLOW + f"\n Serving badges on http://{host}:{port}/badge/<user_id>.png (or .svg) " + Style.RESET_ALL)
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.httpd.server_close()
@@ -0,0 +1,272 @@
+# Native SVG output: the built-in layouts drawn straight from the template values, no browser engine involved
+# The output only depends on its inputs (fixed element and attribute order, rounded numbers), so equal badges are equal bytes
+
+import os
+import re
+import html
+import json
+import hashlib
+
+from threading import Lock
+
+from .config import ASSET_LOCALIZATION, DIR_IMAGES, RENDER_DIGEST_KEY
+from .common import BadgeError, write_atomic
+from .template import fetch_asset, get_asset_reference
+
+# Bump when a layout changes, so the badges drawn by the previous version are not kept as unchanged
+SVG_LAYOUT_VERSION = 1
+
+FONT_FAMILY = "neue-haas-unica, 'Helvetica Neue', Helvetica, Arial, sans-serif"
+BACKGROUND = '#111927'
+GREEN = '#9cef00'
+GREY = '#a4b1cd'
+
+# Icons of the HTML templates, embedded as data: URIs from their local copies (downloaded once, or bundled with --bundle-assets)
+ICONS = {
+    'userflag': 'https://app.hackthebox.com/images/icons/ic-machines/ic-userflag.svg',
+    'rootflag': 'https://app.hackthebox.com/images/icons/ic-machines/ic-rootflag.svg',
+    'points': 'https://app.hackthebox.com/images/icons/ic-other/ic-points.svg',
+    'respect': 'https://app.hackthebox.com/images/icons/ic-profile/ic-respect.svg',
+    'rank': 'https://app.hackthebox.com/images/icons/ic-icons-kickass/ic-ranks-big2.svg',
+}
+# Redrawn look-alikes, only used by the SVG backend when an icon can neither be found locally nor downloaded
+ICON_FALLBACK_PATH = f'{DIR_IMAGES}/svg-fallback-{{name}}.svg'
+LOGO_PATH = f'{DIR_IMAGES}/logo-htb.svg'
+LOGO_VIEWBOX = (176.6, 33)
+
+# Characters XML 1.0 does not allow, even escaped
+INVALID_XML_PATTERN = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+LOGO_PATH_PATTERN = re.compile(r'<path class="(st[01])" d="([^"]+)"')
+
+# Advance widths of Helvetica in 1/1000 em, to place the text that follows a value without measuring it in a browser
+NARROW_CHARACTERS = " .,:;!|'ijlI"
+SEMI_NARROW_CHARACTERS = 'frt-()[]/'
+WIDE_CHARACTERS = 'mwMW@%'
+
+def text_width(text, size, bold=False):
+    """Approximate width in pixels of a line of text at `size` px."""
+    width = 0
+    for character in text:
+        if character in NARROW_CHARACTERS:
+            width += 278
+        elif character in SEMI_NARROW_CHARACTERS:
+            width += 333
+        elif character in WIDE_CHARACTERS:
+            width += 889
+        elif character.isupper():
+            width += 722 if bold else 667
+        else:
+            width += 611 if bold else 556
+    return width * size / 1000
+
+def number(value):
+    """Format a coordinate with at most two decimals and no trailing zeros, the same way on every run."""
+    text = f'{value:.2f}'.rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
+
+def escape(value):
+    return html.escape(INVALID_XML_PATTERN.sub('', str(value)), quote=True)
+
+# Icon URL -> data: URI, or the URL itself when neither the icon nor its fallback is available (not tried again by this process)
+icon_references = {}
+icon_references_lock = Lock()
+
+def get_icon_reference(name, mode=ASSET_LOCALIZATION):
+    """
+    Return what the SVG references for an icon: its local copy inlined, or the remote URL with ASSET_LOCALIZATION=off.
+    When the icon can neither be found nor downloaded, its redrawn fallback (ICON_FALLBACK_PATH) is inlined instead.
+    """
+    url = ICONS[name]
+    if mode == 'off':
+        return url
+    with icon_references_lock:
+        if url not in icon_references:
+            path = fetch_asset(url)
+            if path is None and os.path.exists(ICON_FALLBACK_PATH.format(name=name)):
+                path = ICON_FALLBACK_PATH.format(name=name)
+                print(f"Warning: drawing the fallback of the {name} icon in SVG badges")
+            icon_references[url] = get_asset_reference(path, 'inline') if path else url
+        return icon_references[url]
+
+def get_icon_references(mode=ASSET_LOCALIZATION):
+    """The reference of every icon, looked up once per render and shared by the digest and the drawing."""
+    return {name: get_icon_reference(name, mode) for name in ICONS}
+
+# The HTB logo paths from LOGO_PATH: [(class, d)], read once
+logo_paths = None
+
+def get_logo_paths():
+    global logo_paths
+    if logo_paths is None:
+        try:
+            with open(LOGO_PATH, 'r') as file:
+                logo_paths = [(name, ' '.join(d.split())) for name, d in LOGO_PATH_PATTERN.findall(file.read())]
+        except OSError:
+            logo_paths = []
+    return logo_paths
+
+class SvgCanvas:
+    """Collects SVG elements in drawing order and serializes them, with every number formatted by number()."""
+
+    def __init__(self, width, height, icons):
+        self.width = width
+        self.height = height
+        self.icons = icons
+        self.definitions = []
+        self.elements = []
+
+    def rect(self, x, y, width, height, fill, radius=0):
+        self.elements.append(f'<rect x="{number(x)}" y="{number(y)}" width="{number(width)}" height="{number(height)}" rx="{number(radius)}" fill="{fill}"/>')
+
+    def text(self, x, y, content, size, fill, bold=False, anchor='start', opacity=None):
+        """Draw one line of text with its baseline at y. Returns the x where the next text would start."""
+        content = str(content)
+        weight = ' font-weight="bold"' if bold else ''
+        alignment = f' text-anchor="{anchor}"' if anchor != 'start' else ''
+        transparency = f' fill-opacity="{number(opacity)}"' if opacity is not None else ''
+        self.elements.append(f'<text x="{number(x)}" y="{number(y)}" font-size="{number(size)}"{weight} fill="{fill}"{transparency}{alignment} xml:space="preserve">{escape(content)}</text>')
+        return x + text_width(content, size, bold)
+
+    def image(self, x, y, width, height, reference, clip=None):
+        clip_path = f' clip-path="url(#{clip})"' if clip else ''
+        self.elements.append(f'<image x="{number(x)}" y="{number(y)}" width="{number(width)}" height="{number(height)}" xlink:href="{escape(reference)}" preserveAspectRatio="xMidYMid slice"{clip_path}/>')
+
+    def avatar(self, x, y, size, reference, border_color):
+        """The round avatar with its dashed border, `size` px wide inside the border, top-left at (x, y)."""
+        center_x, center_y, radius = x + size / 2, y + size / 2, size / 2
+        self.definitions.append(f'<clipPath id="avatar"><circle cx="{number(center_x)}" cy="{number(center_y)}" r="{number(radius)}"/></clipPath>')
+        if reference:
+            self.image(x, y, size, size, reference, clip='avatar')
+        self.elements.append(f'<circle cx="{number(center_x)}" cy="{number(center_y)}" r="{number(radius + 2.5)}" fill="none" stroke="{border_color}" stroke-width="5" stroke-dasharray="15 10"/>')
+
+    def logo(self, x, y, width, colors):
+        """The HTB logo scaled to `width`, colors being the fills of its cube (st0) and its lettering (st1)."""
+        paths = get_logo_paths()
+        if not paths:
+            self.text(x, y + width * LOGO_VIEWBOX[1] / LOGO_VIEWBOX[0] * 0.75, 'HACKTHEBOX', width / 7, colors['st1'], bold=True)
+            return
+        scale = f'{width / LOGO_VIEWBOX[0]:.4f}'.rstrip('0').rstrip('.')
+        self.elements.append(f'<g transform="translate({number(x)} {number(y)}) scale({scale})">')
+        self.elements += [f'<path fill="{colors[name]}" d="{d}"/>' for name, d in paths]
+        self.elements.append('</g>')
+
+    def stats(self, x, y, items, icon_size, value_size, fill):
+        """A row of (icon name, value) pairs starting at x, with the text baseline at y. Returns the x after the row."""
+        for icon, text, size in items:
+            size = size or icon_size
+            self.image(x, y - (value_size + size) / 2 + value_size * 0.15, size, size, self.icons[icon])
+            x = self.text(x + size + 12, y, text, value_size, fill) + 36
+        return x - 36
+
+    def serialize(self, digest=None):
+        lines = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" width="{number(self.width)}" height="{number(self.height)}" viewBox="0 0 {number(self.width)} {number(self.height)}" font-family="{escape(FONT_FAMILY)}">',
+        ]
+        if digest:
+            lines.append(f'<!-- {RENDER_DIGEST_KEY}: {digest} -->')
+        if self.definitions:
+            lines.append('<defs>' + ''.join(self.definitions) + '</defs>')
+        lines += self.elements
+        lines.append('</svg>')
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+def value(values, key):
+    """A template value as drawn, '-' when the dataset has none (the HTML badge shows its $key$ instead)."""
+    found = values.get(key)
+    return '-' if found is None or found == '' else str(found)
+
+def stat_items(values, respect_size):
+    """The (icon, value, icon size) row shared by the layouts, None keeping the layout's icon size."""
+    return [
+        ('userflag', value(values, 'user_owns'), None),
+        ('rootflag', value(values, 'user_system_owns'), None),
+        ('points', value(values, 'user_points'), None),
+        ('respect', value(values, 'user_respects'), respect_size),
+    ]
+
+def stats_width(items, icon_size, value_size):
+    return sum((size or icon_size) + 12 + text_width(text, value_size) for _, text, size in items) + 36 * (len(items) - 1)
+
+def draw_default(values, icons):
+    """badge-default.html: avatar, name and rank, the stats row, then the logo and global rank, with the credits under the badge."""
+    canvas = SvgCanvas(980, 335, icons)
+    canvas.rect(0, 0, 980, 300, BACKGROUND, radius=28)
+    canvas.avatar(20, 20, 178, values.get('user_avatar'), GREEN)
+    x = canvas.text(223, 88, value(values, 'user_name'), 56, GREY, bold=True)
+    canvas.text(x + 14, 88, value(values, 'user_rank').upper(), 40, GREEN, bold=True)
+    canvas.stats(223, 168, stat_items(values, 35), 37, 42, GREY)
+    canvas.logo(37, 229, 218, {'st0': GREEN, 'st1': '#ffffff'})
+    canvas.image(345, 231, 40, 40, icons['rank'])
+    canvas.text(430, 264, f"Global Rank: #{value(values, 'user_ranking')}".upper(), 35, GREY)
+    credits = f"Last activity: {value(values, 'last_activity')} | Last updated: {value(values, 'last_update')} using yonasuriv HTB Metrics."
+    canvas.text(0, 325, credits.upper(), 15, '#000000', opacity=0.85)
+    return canvas
+
+def draw_compact(values, icons):
+    """badge-compact.html: avatar, name and rank, the stats and global rank rows, then the logo and the activity line."""
+    canvas = SvgCanvas(940, 290, icons)
+    canvas.rect(0, 0, 940, 290, BACKGROUND, radius=28)
+    canvas.avatar(30, 30, 178, values.get('user_avatar'), GREEN)
+    x = canvas.text(238, 80, value(values, 'user_name'), 48, GREY, bold=True)
+    canvas.text(x + 13, 80, value(values, 'user_rank'), 48, GREEN, bold=True)
+    canvas.stats(258, 148, stat_items(values, 35), 37, 42, GREY)
+    canvas.stats(258, 212, [('rank', f"Global Rank: {value(values, 'user_ranking')}", None)], 37, 42, GREY)
+    canvas.logo(25, 236, 198, {'st0': GREEN, 'st1': '#ffffff'})
+    canvas.text(233, 262, f"Last activity: {value(values, 'last_activity')} - Last updated {value(values, 'last_update')}", 20, GREY)
+    return canvas
+
+def draw_wide(values, icons):
+    """badge-wide.html: a larger avatar with the name, rank and stats centered beside it, the logo and global ranking below."""
+    canvas = SvgCanvas(760, 340, icons)
+    canvas.rect(0, 0, 760, 300, BACKGROUND, radius=28)
+    canvas.avatar(30, 30, 200, values.get('user_avatar'), GREEN)
+    center = 495
+    name, rank = value(values, 'user_name'), value(values, 'user_rank').upper()
+    x = center - (text_width(name, 48, True) + 13 + text_width(rank, 38, True)) / 2
+    x = canvas.text(x, 100, name, 48, GREY, bold=True)
+    canvas.text(x + 13, 100, rank, 38, GREEN, bold=True)
+    items = stat_items(values, 32)
+    canvas.stats(center - stats_width(items, 35, 42) / 2, 180, items, 35, 42, GREY)
+    canvas.logo(30, 253, 176.6, {'st0': GREEN, 'st1': '#f5f5f5'})
+    canvas.text(250, 279, f"Global Ranking: #{value(values, 'user_ranking')}".upper(), 27, GREY)
+    canvas.text(380, 328, f"Last activity: {value(values, 'last_activity')} | Last updated: {value(values, 'last_update')}", 20, '#7c7c7c', anchor='middle')
+    return canvas
+
+# SVG counterpart of each built-in template, picked by the template name
+SVG_LAYOUTS = {
+    'badge-default.html': draw_default,
+    'badge-compact.html': draw_compact,
+    'badge-wide.html': draw_wide,
+}
+
+def get_svg_layout(template_name):
+    if template_name not in SVG_LAYOUTS:
+        raise BadgeError(f"no SVG layout for {template_name} (available: {', '.join(SVG_LAYOUTS)})")
+    return SVG_LAYOUTS[template_name]
+
+def get_svg_layout_digest(template_name, icons):
+    """Digest of what an SVG depends on besides the values: the layout and the icons (get_icon_references()) and logo it embeds."""
+    get_svg_layout(template_name)
+    state = [SVG_LAYOUT_VERSION, template_name, [icons[name] for name in ICONS], get_logo_paths()]
+    return hashlib.sha256(json.dumps(state).encode('utf-8')).hexdigest()
+
+def render_svg(template_name, values, icons=None, digest=None):
+    """Return the SVG bytes of a badge, stamped with the render digest when given."""
+    return get_svg_layout(template_name)(values, icons or get_icon_references()).serialize(digest)
+
+def write_svg(path, template_name, values, icons, digest=None):
+    """Write the SVG of a badge. Returns its size in bytes."""
+    content = render_svg(template_name, values, icons, digest)
+    write_atomic(path, content)
+    return len(content)
+
+SVG_DIGEST_PATTERN = re.compile(rf'<!-- {RENDER_DIGEST_KEY}: ([0-9a-f]+) -->'.encode())
+
+def read_svg_digest(svg_path):
+    """Return the render digest stamped in an existing SVG badge, or None."""
+    try:
+        with open(svg_path, 'rb') as file:
+            match = SVG_DIGEST_PATTERN.search(file.read(1024))
+    except OSError:
+        return None
+    return match.group(1).decode() if match else None
@@ -0,0 +1,252 @@
+# Template compilation, asset localization and placeholder replacement
+
+import os
+import re
+import html
+import json
+import glob
+import base64
+import hashlib
+import mimetypes
+import requests
+
+from threading import Lock
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from colorama import Fore, Style
+
+from .config import ASSET_FETCH_TIMEOUT, ASSET_LOCALIZATION, DIR_IMAGES, DIR_TEMPLATES, DIR_TEMPLATE_CACHE, FETCH_CONCURRENCY, TEMPLATE_DISK_CACHE, TEMPLATE_KEYS, YAML_FILE_NAME
+from .common import write_atomic
+from .client import asset_session
+from .history import CHANGE_KEY_PATTERN
+
+# Load the YAML file and extract all required values
+def get_user_data_from_yaml(file_path):
+    from .dataset import get_dataset_store
+
+    return get_user_data(get_dataset_store('yaml').read(file_path))
+
+# Extract the template values from the dataset
+def get_user_data(data):
+    # Extract values or default to None if they don't exist
+    return {key: data.get(key, None) for key in TEMPLATE_KEYS}
+
+
+PLACEHOLDER_PATTERN = re.compile(r'\$([A-Za-z0-9_]+)\$')
+
+class CompiledTemplate:
+    """
+    A badge template parsed once into literal segments and $key$ slots.
+    segments always holds one more item than slots: segments[0] slots[0] segments[1] slots[1] ... segments[-1]
+    """
+
+    def __init__(self, path, digest, segments, slots):
+        self.path = path
+        self.digest = digest
+        self.segments = segments
+        self.slots = slots
+        self.placeholders = set(slots)
+
+    def render(self, values):
+        """
+        Fill every slot in a single pass, HTML-escaping the values.
+        Slots without a value are left as $key$. Returns the HTML and the sorted list of missing keys.
+        """
+        parts = [self.segments[0]]
+        missing = set()
+        for slot, literal in zip(self.slots, self.segments[1:]):
+            value = values.get(slot)
+            if value is None:
+                missing.add(slot)
+                parts.append(f'${slot}$')
+            else:
+                parts.append(html.escape(str(value), quote=True))
+            parts.append(literal)
+        return ''.join(parts), sorted(missing)
+
+# In-memory cache of compiled templates: (path, localization mode) -> (mtime, size, CompiledTemplate)
+compiled_templates = {}
+compiled_templates_lock = Lock()
+# Digests of the templates whose placeholders were already reported, once per process whatever the localization
+reported_templates = set()
+
+def parse_template(content):
+    """Split template content into (segments, slots)."""
+    pieces = PLACEHOLDER_PATTERN.split(content)  # Alternates literal, slot, literal, slot, ..., literal
+    return pieces[0::2], pieces[1::2]
+
+# Remote resources the renderer would download: <img>/<script>/<source> src, <link> href and CSS url()
+ASSET_TAG_PATTERN = re.compile(r"""(<(?:img|script|source|link)\b[^>]*?\s(?:src|href)=)(["'])(https?://[^"']+)\2""", re.IGNORECASE)
+ASSET_CSS_PATTERN = re.compile(r"""(url\()(["']?)(https?://[^"')]+)\2\)""", re.IGNORECASE)
+
+def get_asset_path(url):
+    """
+    Local copy of a remote asset, named after its host and path so two assets sharing a file name never collide:
+    DIR_IMAGES/<host>/<path> (e.g. assets/images/account.hackthebox.com/images/logos/logo-htb.svg).
+    A query string adds a short hash of it to the file name.
+    """
+    parts = urlsplit(url)
+    segments = [segment for segment in parts.path.split('/') if segment not in ('', '.', '..')]
+    if not segments:
+        segments = [hashlib.sha256(url.encode()).hexdigest()[:16]]
+    if parts.query:
+        stem, extension = os.path.splitext(segments[-1])
+        segments[-1] = f"{stem}-{hashlib.sha256(parts.query.encode()).hexdigest()[:8]}{extension}"
+    return os.path.join(DIR_IMAGES, parts.netloc.replace(':', '_'), *segments)
+
+def fetch_asset(url, refresh=False):
+    """
+    Download a remote asset into DIR_IMAGES unless a copy is already there (with refresh, download it again).
+    Returns the local path, or None (with refresh, the previous copy if there is one).
+    """
+    path = get_asset_path(url)
+    if os.path.exists(path) and not refresh:
+        return path
+    try:
+        response = asset_session.get(url, timeout=ASSET_FETCH_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"Warning: could not download asset {url} ({e.__class__.__name__})")
+        return path if os.path.exists(path) else None
+
+    write_atomic(path, response.content)
+    return path
+
+def get_asset_reference(path, mode=ASSET_LOCALIZATION):
+    """What a localized asset is rewritten to: a data: URI or a file:// URL."""
+    if mode == 'file':
+        return f"file://{os.path.abspath(path)}"
+    mime_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    with open(path, 'rb') as file:
+        return f"data:{mime_type};base64,{base64.b64encode(file.read()).decode('ascii')}"
+
+def find_asset_urls(content):
+    """The remote assets of a template (see ASSET_TAG_PATTERN and ASSET_CSS_PATTERN)."""
+    return {match.group(3) for pattern in (ASSET_TAG_PATTERN, ASSET_CSS_PATTERN) for match in pattern.finditer(content)}
+
+def localize_assets(content, mode=ASSET_LOCALIZATION):
+    """
+    Rewrite every remote asset of a template to its local copy, downloading the missing ones once (concurrently).
+    Links (<a href>) are left alone, they are never fetched by the renderer.
+    Returns the new content and the list of URLs that could not be localized (kept remote).
+    """
+    if mode == 'off':
+        return content, []
+
+    urls = find_asset_urls(content)
+    if not urls:
+        return content, []
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as executor:
+        paths = dict(zip(urls, executor.map(fetch_asset, urls)))
+    references = {url: get_asset_reference(path, mode) for url, path in paths.items() if path}
+
+    def replace(match):
+        reference = references.get(match.group(3))
+        if reference is None:
+            return match.group(0)
+        closing = match.group(2) + (')' if match.group(1).lower() == 'url(' else '')
+        return f"{match.group(1)}{match.group(2)}{reference}{closing}"
+
+    for pattern in (ASSET_TAG_PATTERN, ASSET_CSS_PATTERN):
+        content = pattern.sub(replace, content)
+    return content, sorted(url for url, path in paths.items() if not path)
+
+def bundle_assets(template_dir=DIR_TEMPLATES):
+    """
+    Download the remote assets of every template into DIR_IMAGES, again for the ones already there, so re-running it
+    refreshes the local copies (nothing else revalidates them). The compiled templates cached on disk are dropped,
+    so the next render embeds the refreshed copies. Returns True if all of the assets are local.
+    """
+    print(Style.BRIGHT + Fore.YELLOW + "\n Bundling template assets.. \n" + Style.RESET_ALL)
+    complete = True
+    paths = {}
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as executor:
+        for template_path in sorted(glob.glob(os.path.join(template_dir, '*.html'))):
+            with open(template_path, 'r') as file:
+                urls = find_asset_urls(file.read())
+            missing = sorted(urls - set(paths))
+            paths.update(zip(missing, executor.map(lambda url: fetch_asset(url, refresh=True), missing)))
+            unresolved = [url for url in urls if not paths[url]]
+            status = f"{Fore.GREEN}OK  {Style.RESET_ALL}" if not unresolved else f"{Fore.RED}{len(unresolved):<4}{Style.RESET_ALL}"
+            print(f"    {status} {template_path}")
+            complete &= not unresolved
+    for cache_path in glob.glob(os.path.join(DIR_TEMPLATE_CACHE, '*.json')):
+        os.remove(cache_path)
+    print(f"\n    🔹 Assets stored in {DIR_IMAGES}")
+    return complete
+
+def compile_template(template_path, localize=True):
+    """
+    Return the compiled form of a template, parsing it only when the file changed.
+    Remote assets are localized (see localize_assets) before parsing, so renders never wait on the network.
+    With localize=False they are left as they are and nothing is downloaded, for callers that only need the placeholders.
+    Compiled templates are also kept under DIR_TEMPLATE_CACHE keyed by file hash, so a new process skips parsing.
+    """
+    mode = ASSET_LOCALIZATION if localize else 'off'
+    stat = os.stat(template_path)
+    with compiled_templates_lock:
+        cached = compiled_templates.get((template_path, mode))
+        if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[2]
+
+    with open(template_path, 'rb') as file:
+        raw = file.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    cache_path = os.path.join(DIR_TEMPLATE_CACHE, f'{digest}-{mode}.json')
+
+    compiled = None
+    if TEMPLATE_DISK_CACHE and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r') as file:
+                cached_form = json.load(file)
+            compiled = CompiledTemplate(template_path, digest, cached_form['segments'], cached_form['slots'])
+        except (OSError, ValueError, KeyError):
+            compiled = None
+
+    if compiled is None:
+        content, unresolved = localize_assets(raw.decode('utf-8'), mode)
+        if unresolved:
+            print(f"Warning: {len(unresolved)} asset(s) of {template_path} stay remote: {', '.join(unresolved)}")
+        segments, slots = parse_template(content)
+        compiled = CompiledTemplate(template_path, digest, segments, slots)
+        report_template_placeholders(compiled)
+        # Only keep fully localized templates, so the missing assets are retried by the next process
+        if TEMPLATE_DISK_CACHE and not unresolved:
+            write_atomic(cache_path, json.dumps({'segments': segments, 'slots': slots}))
+
+    with compiled_templates_lock:
+        compiled_templates[(template_path, mode)] = (stat.st_mtime, stat.st_size, compiled)
+    return compiled
+
+def report_template_placeholders(compiled):
+    """
+    Warn about placeholders the dataset cannot fill, and dataset keys the template never uses (once per template).
+    The <metric>_change_<N>d keys are optional extras computed from the history, they are never reported as unused.
+    """
+    with compiled_templates_lock:
+        if compiled.digest in reported_templates:
+            return
+        reported_templates.add(compiled.digest)
+    unknown = sorted(compiled.placeholders - set(TEMPLATE_KEYS))
+    unused = [key for key in TEMPLATE_KEYS if key not in compiled.placeholders and not CHANGE_KEY_PATTERN.match(key)]
+    name = os.path.basename(compiled.path)
+    if unknown:
+        print(f"\n{Fore.RED} Warning: unknown placeholders in {name}: {', '.join(unknown)}{Style.RESET_ALL}")
+    if unused:
+        print(f"\n{Fore.MAGENTA} Note: {name} does not use: {', '.join(unused)}{Style.RESET_ALL}")
+
+# Fill the template placeholders and write the HTML file
+def replace_placeholders_in_html(template_path, html_path, user_data):
+    html_content, missing_values = compile_template(template_path).render(user_data)
+
+    # Write the rendered template in one go
+    with open(html_path, 'w') as file:
+        file.write(html_content)
+
+    # Print if any placeholders were not replaced due to missing values
+    if missing_values:
+        print(f"\nWarning: The following placeholders were not replaced due to missing values in '{YAML_FILE_NAME}'\n: {', '.join(missing_values)}")
+    else:
+        # print(f"{Fore.GREEN} Rendering Output.. {Style.RESET_ALL}")
+        print(Style.BRIGHT + Fore.YELLOW + " Rendering Output.. " + Style.RESET_ALL)
+        print(f"\n    All template placeholders in were successfully replaced. {Style.RESET_ALL}")
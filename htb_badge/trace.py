@@ -0,0 +1,81 @@
+# Timed spans around the pipeline stages and HTTP calls (--trace, batch percentiles)
+
+import os
+import json
+import time
+import contextlib
+
+from threading import Lock, get_ident
+from colorama import Fore, Style
+
+class Tracer:
+    """
+    Records a timed span around every pipeline stage and HTTP call: name, category, start, duration,
+    thread and free-form args (user, bytes in/out, cache status, ...).
+    Spans cost a clock read when disabled; enable() starts keeping them for export and percentile summaries.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.lock = Lock()
+        self.origin = time.perf_counter()
+
+    def enable(self):
+        self.enabled = True
+
+    @contextlib.contextmanager
+    def span(self, name, category='stage', **args):
+        """Time the block; the yielded dict can be filled with more args (status, bytes, ...) before it ends."""
+        started = time.perf_counter()
+        try:
+            yield args
+        except BaseException as e:
+            args['error'] = e.__class__.__name__
+            raise
+        finally:
+            if self.enabled:
+                event = {'name': name, 'cat': category, 'start': started - self.origin,
+                         'duration': time.perf_counter() - started, 'tid': get_ident(), 'args': args}
+                with self.lock:
+                    self.events.append(event)
+
+    def write(self, path):
+        """Write the spans as JSON lines (.jsonl) or as a Chrome trace (anything else, open it in chrome://tracing or Perfetto)."""
+        with self.lock:
+            events = list(self.events)
+        with open(path, 'w') as file:
+            if path.endswith('.jsonl'):
+                for event in events:
+                    file.write(json.dumps(event, default=str) + '\n')
+            else:
+                json.dump({'traceEvents': [{
+                    'name': event['name'], 'cat': event['cat'], 'ph': 'X', 'pid': os.getpid(), 'tid': event['tid'],
+                    'ts': round(event['start'] * 1e6), 'dur': round(event['duration'] * 1e6), 'args': event['args'],
+                } for event in events], 'displayTimeUnit': 'ms'}, file, default=str)
+
+    def percentiles(self, category='stage'):
+        """Return {span name: (count, p50, p90, p99, max)} in seconds, for the spans of one category."""
+        durations = {}
+        with self.lock:
+            for event in self.events:
+                if event['cat'] == category:
+                    durations.setdefault(event['name'], []).append(event['duration'])
+
+        def percentile(values, fraction):
+            return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            summary[name] = (len(values), percentile(values, 0.5), percentile(values, 0.9), percentile(values, 0.99), values[-1])
+        return summary
+
+    def print_percentiles(self):
+        print(Style.BRIGHT + Fore.YELLOW + "\n Stage timings.. \n" + Style.RESET_ALL)
+        print(f"    {'stage':<20}{'count':>7}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+        for category in ('stage', 'http'):
+            for name, (count, p50, p90, p99, slowest) in self.percentiles(category).items():
+                print(f"    {name:<20}{count:>7}" + "".join(f"{value * 1000:>8.1f}ms" for value in (p50, p90, p99, slowest)))
+
+tracer = Tracer()
@@ -0,0 +1,147 @@
+# Record/replay transport adapter for the API and asset sessions
+
+import os
+import json
+import time
+import base64
+import hashlib
+import requests
+
+from threading import Lock
+from urllib.parse import quote, urlsplit
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from . import config
+from .config import FETCH_CONCURRENCY, HTTP_CACHE_ENABLED, HTTP_CASSETTE_DIR, REPLAY_LATENCY
+from .common import BadgeError, write_atomic
+from .client import asset_session, session
+from .cache import http_cache
+
+class CassetteMiss(requests.RequestException):
+    """Replay mode was asked for a URL that was never recorded."""
+
+class CassetteAdapter(HTTPAdapter):
+    """
+    Transport adapter recording responses to a cassette directory, or replaying them from it without any network.
+    API responses are stored by their path under API_URL (so a recording replays whatever HTB_API_URL points to),
+    other hosts (avatars, template assets) by host and path, one JSON file per URL.
+    """
+
+    # Response headers kept in the cassette (validators for the HTTP cache, the type for assets)
+    KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+    def __init__(self, mode, directory, latency='0', **kwargs):
+        super().__init__(**kwargs)
+        self.mode = mode
+        self.directory = directory
+        self.latency = latency
+        self.lock = Lock()  # The fetch threads share the adapter
+        self.stats = {'recorded': 0, 'replayed': 0, 'missing': 0}
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def entry_path(self, url):
+        """Cassette file of a URL: <dir>/api/profile/780424.json, <dir>/<host>/storage/avatars/....json"""
+        if url.startswith(config.API_URL):
+            parts = urlsplit(url[len(config.API_URL):])
+            segments = ['api'] + parts.path.split('/')
+        else:
+            parts = urlsplit(url)
+            segments = [parts.netloc] + parts.path.split('/')
+        segments = [quote(segment, safe='') for segment in segments if segment not in ('', '.', '..')]
+        if parts.query:
+            segments[-1] += '_' + hashlib.sha256(parts.query.encode()).hexdigest()[:12]
+        return os.path.join(self.directory, *segments) + '.json'
+
+    def send(self, request, **kwargs):
+        if self.mode == 'replay':
+            return self.replay(request)
+
+        # Record full responses, not 304s with nothing to replay
+        request.headers.pop('If-None-Match', None)
+        request.headers.pop('If-Modified-Since', None)
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        self.record(request.url, response, time.perf_counter() - started)
+        return response
+
+    def record(self, url, response, elapsed):
+        content = response.content
+        entry = {
+            'url': url,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {name: response.headers[name] for name in self.KEPT_HEADERS if name in response.headers},
+            'elapsed': round(elapsed, 4),
+        }
+        try:
+            entry['body'] = content.decode('utf-8')
+        except UnicodeDecodeError:
+            entry['body_base64'] = base64.b64encode(content).decode('ascii')
+
+        write_atomic(self.entry_path(url), json.dumps(entry, indent=1))
+        self.count('recorded')
+
+    def replay(self, request):
+        try:
+            with open(self.entry_path(request.url), 'r') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            self.count('missing')
+            raise CassetteMiss(f"no recorded response for {request.url} in {self.directory}", request=request)
+
+        time.sleep(entry.get('elapsed', 0) if self.latency == 'recorded' else float(self.latency))
+        self.count('replayed')
+
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        response.status_code = entry['status']
+        response.reason = entry.get('reason')
+        response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        response.encoding = 'utf-8'
+        etag = response.headers.get('ETag')
+        if etag and request.headers.get('If-None-Match') == etag:
+            response.status_code, response.reason = 304, 'Not Modified'
+            response._content = b''
+        elif 'body_base64' in entry:
+            response._content = base64.b64decode(entry['body_base64'])
+        else:
+            response._content = entry.get('body', '').encode('utf-8')
+        return response
+
+    def summary(self):
+        stats = self.stats
+        if self.mode == 'replay':
+            return f"replayed {stats['replayed']} responses from {self.directory} ({stats['missing']} not recorded)"
+        return f"recorded {stats['recorded']} responses to {self.directory}"
+
+def set_transport(mode, directory=HTTP_CASSETTE_DIR, latency=REPLAY_LATENCY):
+    """
+    Route the API and asset sessions through the given transport: 'live', 'record' or 'replay'.
+    While recording, the HTTP cache is disabled, so no endpoint is answered from a fresh cache entry and missed by the cassette.
+    Returns the cassette adapter, or None for 'live'.
+    """
+    global cassette
+    if mode not in ('live', 'record', 'replay'):
+        raise BadgeError(f"unknown HTTP transport '{mode}' (live, record or replay)")
+    if mode != 'live' and latency != 'recorded':
+        try:
+            float(latency)
+        except ValueError:
+            raise BadgeError(f"replay latency must be a number of seconds or 'recorded', not '{latency}'")
+
+    # One adapter for both sessions, so the API responses and the assets they link to land in the same cassette
+    cassette = None if mode == 'live' else CassetteAdapter(mode, directory, latency, pool_maxsize=FETCH_CONCURRENCY)
+    session.mount('https://', cassette or HTTPAdapter(pool_connections=1, pool_maxsize=FETCH_CONCURRENCY))
+    asset_session.mount('https://', cassette or HTTPAdapter(pool_maxsize=FETCH_CONCURRENCY))
+    for http_session in (session, asset_session):
+        http_session.mount('http://', cassette or HTTPAdapter())
+    http_cache.enabled = HTTP_CACHE_ENABLED and mode != 'record'
+    return cassette
+
+# Adapter installed by set_transport(), None while live (the CLI applies HTTP_TRANSPORT, importing this module does not)
+cassette = None
@@ -7,19 +7,19 @@ import os
 import shutil
 import sys
 
+from concurrent.futures import ThreadPoolExecutor
+
+# The API client (session, rate limiter, retries) is the one of the htb_badge package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from htb_badge.config import API_MAX_RETRIES, API_URL, FETCH_CONCURRENCY, PRIVATE_STATUS_CODES
+from htb_badge.client import api_get, api_rate_limiter, session
+
 # Get environment variables
 DATA_DIR = os.environ.get('DATA_DIR')
 USER_ID = os.environ.get('USER_ID')
 
-# Constants
-API_URL = "https://labs.hackthebox.com/api/v4"
-
-# Request Headers
-headers = {
-    'Content-Type': 'application/json',
-    'Accept': 'application/json',
-    'User-Agent': 'Python-Script/1.0'
-}
+class FetchError(Exception):
+    """Raised by the fetch threads, the main thread prints it and exits."""
 
 # Create directories if they don't exist
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -40,15 +40,60 @@ user_endpoints = {
         "user_activity": f"{API_URL}/profile/activity/{USER_ID}",
     }
 
+def get_team_endpoints(team_id):
+    """Build the team URLs to dynamically fetch data from."""
+    return {
+        "team": f"{API_URL}/public/team/info/{team_id}",
+        "team_bracket": f"{API_URL}/public/rankings/team/ranking_bracket/{team_id}",
+        "team_rank_best": f"{API_URL}/public/rankings/team/best/{team_id}?period=1Y",
+        "team_machines": f"{API_URL}/public/team/chart/machines/attack/{team_id}",
+        "team_challenges": f"{API_URL}/public/team/chart/challenge/categories/{team_id}",
+    }
+
 def user_fetch_data(url):
     """Fetch data from a given URL and return JSON response if successful."""
-    response = requests.get(url, headers=headers)
+    response = api_get(session, url)
     
     if response.status_code == 200:
         return response.json()
+    elif response.status_code in PRIVATE_STATUS_CODES:
+        raise FetchError(f"Failed to retrieve data from {url}. Status code: {response.status_code} - The profile is private.")
     else:
-        print(f"Failed to retrieve data from {url}. Status code: {response.status_code} - The profile is private.")
-        sys.exit(1)  # Graceful exit with a status code indicating an error
+        raise FetchError(f"Failed to retrieve data from {url}. Status code: {response.status_code} - Still failing after {API_MAX_RETRIES} retries.\n"
+                         f"API: {api_rate_limiter.summary()}")
+
+def team_fetch_data(url):
+    """Fetch data from a given URL and return JSON response if successful."""
+    response = api_get(session, url)
+    if response.status_code == 200:
+        return response.json()
+    else:
+        print(f"Failed to retrieve data from {url}. Status code: {response.status_code}")
+        return None
+
+def get_team_id(profile_data):
+    """Return the team id from a profile response, or None if the user has no team."""
+    team_info = (profile_data or {}).get("profile", {}).get("team", None)
+    if team_info and isinstance(team_info, dict):
+        return team_info.get('id', None)
+    return None
+
+def fetch_all_endpoints():
+    """
+    Fetch every user and team endpoint concurrently over the shared session.
+    The team requests are queued as soon as the profile response reveals the TEAM_ID.
+    Returns two dicts (user and team futures) keyed by endpoint name, in endpoint order.
+    """
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as executor:
+        user_futures = {name: executor.submit(user_fetch_data, url) for name, url in user_endpoints.items()}
+
+        # Queue the team endpoints while the remaining user endpoints are still in flight
+        team_futures = {}
+        team_id = get_team_id(user_futures["user"].result())
+        if team_id:
+            team_futures = {name: executor.submit(team_fetch_data, url) for name, url in get_team_endpoints(team_id).items()}
+
+    return user_futures, team_futures
 
 # Variable to track if any save operation fails
 user_save_failed = False
@@ -70,17 +115,23 @@ if user_save_failed:
     print("Error: One or more files failed to save.")
     sys.exit(1)
 
-def user_process_and_save(endpoint_name, url):
-    """Fetch, process, and save the data for a specific endpoint."""
+def user_process_and_save(endpoint_name, data):
+    """Process and save the fetched data for a specific endpoint."""
     global fileid_counter
-    data = user_fetch_data(url)
     if data:
         user_save_to_json(data, f"ud{fileid_counter}{endpoint_name}.json")
         fileid_counter += 1  # Increment the counter for the next file
 
-# Loop through all user endpoints and process each
-for name, url in user_endpoints.items():
-    user_process_and_save(name, url)
+# Fire all requests at once, then save each response in endpoint order
+try:
+    user_futures, team_futures = fetch_all_endpoints()
+    user_results = {name: future.result() for name, future in user_futures.items()}
+except (FetchError, requests.RequestException) as e:
+    print(e)
+    sys.exit(1)  # Graceful exit with a status code indicating an error
+
+for name, data in user_results.items():
+    user_process_and_save(name, data)
 
 # Function to check if 'team' key exists in profile_data.json
 def check_team_in_profile():
@@ -115,24 +166,6 @@ def check_team_in_profile():
 check_team_in_profile()
 
 if TEAM_ID:
-    # URLs to dynamically fetch data from
-    team_endpoints = {
-        "team": f"{API_URL}/public/team/info/{TEAM_ID}",
-        "team_bracket": f"{API_URL}/public/rankings/team/ranking_bracket/{TEAM_ID}",
-        "team_rank_best": f"{API_URL}/public/rankings/team/best/{TEAM_ID}?period=1Y",
-        "team_machines": f"{API_URL}/public/team/chart/machines/attack/{TEAM_ID}",
-        "team_challenges": f"{API_URL}/public/team/chart/challenge/categories/{TEAM_ID}",
-    }
-
-    def team_fetch_data(url):
-        """Fetch data from a given URL and return JSON response if successful."""
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(f"Failed to retrieve data from {url}. Status code: {response.status_code}")
-            return None
-
     # Variable to track if any save operation fails
     team_save_failed = False
 
@@ -151,17 +184,16 @@ if TEAM_ID:
         print("Error: One or more files failed to save.")
         sys.exit(1)
 
-    def team_process_and_save(endpoint_name, url):
-        """Fetch, process, and save the data for a specific endpoint."""
+    def team_process_and_save(endpoint_name, data):
+        """Process and save the fetched data for a specific endpoint."""
         global fileid_counter
-        data = team_fetch_data(url)
         if data:
             team_save_to_json(data, f"ut{fileid_counter}{endpoint_name}.json")
             fileid_counter += 1  # Increment the counter for the next file
 
-    # Loop through all team endpoints and process each
-    for name, url in team_endpoints.items():
-        team_process_and_save(name, url)
+    # The team requests were already started alongside the user ones, just collect them in order
+    for name, future in team_futures.items():
+        team_process_and_save(name, future.result())
 
     print(f"\nTeam data files created successfully.")
 else:
@@ -10,37 +10,64 @@ from datetime import datetime
 # Get environment variables
 DATA_FILE_YML = os.environ.get('DATA_FILE_YML')
 DATA_PATH = os.environ.get('DATA_PATH')
+FLATTEN_MAX_LIST_ITEMS = int(os.environ['FLATTEN_MAX_LIST_ITEMS']) if os.environ.get('FLATTEN_MAX_LIST_ITEMS') else None
 
 # Constants
 BASE_URL = "https://labs.hackthebox.com"
 
 print(f"\nGenerating dataset..")
 
-def flatten_json(data, parent_key='', sep='_'):
+def flatten_json(data, parent_key='', sep='_', prefix='', max_list_items=None, out=None):
     """
-    Recursively flatten the JSON structure.
-    Concatenate nested keys with a separator to make them unique.
+    Flatten the JSON structure iteratively (no recursion, so any depth works).
+    Concatenate nested keys with a separator to make them unique, list items get their index appended.
+    Every leaf is written straight into `out` (a new dict by default) with `prefix` in front of its key,
+    so nothing is copied per nesting level. Only the first max_list_items of each list are kept if set.
     """
-    items = []
-    if isinstance(data, dict):
-        for k, v in data.items():
-            new_key = f"{parent_key}{sep}{k}" if parent_key else k
-            if isinstance(v, dict):
-                items.extend(flatten_json(v, new_key, sep=sep).items())
-            elif isinstance(v, list):
-                # Handle lists of dictionaries (e.g., prolabs or challenge categories)
-                for i, item in enumerate(v):
-                    items.extend(flatten_json(item, f"{new_key}_{i}", sep=sep).items())
-            else:
-                items.append((new_key, v))
-    elif isinstance(data, list):
-        # Handle list case at root level if needed
-        for i, item in enumerate(data):
-            items.extend(flatten_json(item, f"{parent_key}_{i}", sep=sep).items())
-    else:
-        # Base case where the value is not a dict or list
-        items.append((parent_key, data))
-    return dict(items)
+    if out is None:
+        out = {}
+
+    # Base case where the value is not a dict or list
+    if not isinstance(data, (dict, list)):
+        out[f"{prefix}{parent_key}"] = data
+        return out
+
+    def children(key, value):
+        if isinstance(value, dict):
+            return ((f"{key}{sep}{k}" if key else k, v) for k, v in value.items())
+        # Handle lists of dictionaries (e.g., prolabs or challenge categories)
+        items = value if max_list_items is None else value[:max_list_items]
+        return ((f"{key}_{i}", item) for i, item in enumerate(items))
+
+    # Explicit stack of child iterators: leaves are written in document order as they are reached,
+    # containers suspend their parent until they are fully walked
+    stack = [children(parent_key, data)]
+    while stack:
+        for key, value in stack[-1]:
+            if isinstance(value, (dict, list)):
+                stack.append(children(key, value))
+                break
+            out[f"{prefix}{key}"] = value
+        else:
+            stack.pop()
+    return out
+
+# Skips the whitespace between two top-level JSON values
+JSON_WHITESPACE = re.compile(r'\s*')
+json_decoder = json.JSONDecoder()
+
+def iter_json_objects(text):
+    """
+    Yield every top-level JSON value of a document in a single linear pass.
+    Works for a single (pretty-printed) object as well as several concatenated or newline-delimited ones.
+    Raises json.JSONDecodeError, with the line and column, at the first malformed value.
+    """
+    idx = JSON_WHITESPACE.match(text, 0).end()
+    end = len(text)
+    while idx < end:
+        obj, idx = json_decoder.raw_decode(text, idx)
+        yield obj
+        idx = JSON_WHITESPACE.match(text, idx).end()
 
 def read_json_files(directory):
     """
@@ -74,32 +101,25 @@ def json_to_flat_yaml(DATA_FILE_YML):
         
         for json_file in json_files:
             with open(json_file, 'r') as f:
-                json_objects = []
-                current_json = ''
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        current_json += line
-                    if line.endswith('}'):  # When we reach the end of a JSON object
-                        try:
-                            json_objects.append(json.loads(current_json))
-                            current_json = ''  # Reset to capture next JSON object
-                        except json.JSONDecodeError:
-                            pass  # Silently skip invalid JSON objects
+                try:
+                    json_objects = list(iter_json_objects(f.read()))
+                except json.JSONDecodeError as e:
+                    print(f"Malformed JSON in {json_file} at line {e.lineno}, column {e.colno}: {e.msg}")
+                    raise
 
                 # Flatten each JSON object and add to the combined data
                 for json_obj in json_objects:
                     try:
-                        flattened = flatten_json(json_obj)
-                        
                         # Check the first two characters of the file name and append the appropriate prefix
                         file_name = os.path.basename(json_file)
+                        prefix = ''
                         if file_name.startswith('ud'):
-                            flattened = {f"user_{k}": v for k, v in flattened.items()}
+                            prefix = 'user_'
                         elif file_name.startswith('ut'):
-                            flattened = {f"team_{k}": v for k, v in flattened.items()}
+                            prefix = 'team_'
 
-                        combined_data.update(flattened)
+                        # Flatten straight into the combined data
+                        flatten_json(json_obj, prefix=prefix, max_list_items=FLATTEN_MAX_LIST_ITEMS, out=combined_data)
                         
                     except AttributeError as e:
                         print(f"Error processing JSON object in file {json_file}: {e}")
@@ -2,10 +2,14 @@
 # ID 3 - data_PATCH.py
 
 import os
+import sys
 import glob
-import re
 from datetime import datetime, timezone
 
+# The cleaning rules are the ones of the htb_badge package (compiled once, applied in a single pass)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from htb_badge.patch import clean_file
+
 # Get environment variables
 DATA_DIR = os.environ.get('DATA_DIR')
 DATA_EXT = os.environ.get('DATA_EXT')
@@ -72,105 +76,6 @@ def append_metadata(DATA_PATH, lines):
         lines = metadata + lines
     return lines
 
-# Step 4: Cleaning function
-def clean_file(lines, commands):
-    changes = []
-    
-    for command in commands:
-        silent = False
-        
-        # Check if the command is marked as silent
-        if command.startswith("silent "):
-            command = command.replace("silent ", "", 1)
-            silent = True
-        
-        # Handle "-r" to remove a specific text from a line
-        if command.startswith('-r '):
-            match = re.match(r'-r "(.*)"', command)
-            if match:
-                text = match.group(1)
-                for idx, line in enumerate(lines):
-                    if text in line:
-                        old_value = line.strip()
-                        new_value = line.replace(text, "")
-                        lines[idx] = new_value
-                        if not silent:
-                            changes.append((idx + 1, old_value, new_value.strip(), "deletion"))
-        
-        # Handle "-rF" to remove an entire line containing a key
-        elif command.startswith('-rF '):
-            match = re.match(r'-rF "(.*)"', command)
-            if match:
-                key = match.group(1)
-                for idx, line in enumerate(lines):
-                    if key in line.split(':', 1)[0]:  # Match key before the colon
-                        old_value = line.strip()
-                        lines[idx] = ""  # Remove the line
-                        if not silent:
-                            changes.append((idx + 1, old_value, "", "deletion (entire line)"))
-        
-        # Handle "-c" to replace old text with new text
-        elif command.startswith('-c '):
-            match = re.match(r'-c "(.*)" "(.*)"', command)
-            if match:
-                old_text, new_text = match.groups()
-                for idx, line in enumerate(lines):
-                    if old_text in line:
-                        old_value = line.strip()
-                        lines[idx] = line.replace(old_text, new_text)
-                        if not silent:
-                            changes.append((idx + 1, old_value, lines[idx].strip(), "replacement"))
-
-        # Handle "+k" to insert new text before the key (text)
-        elif command.startswith('+k '):
-            match = re.match(r'\+k "(.*)" "(.*)"', command)
-            if match:
-                text, new_data = match.groups()
-                for idx, line in enumerate(lines):
-                    if text in line and ':' in line.split(text)[0]:  # Key domain check
-                        old_value = line.strip()
-                        lines[idx] = new_data + " " + line
-                        changes.append((idx + 1, old_value, lines[idx].strip(), "insertion before key"))
-
-        # Handle "k+" to insert new text after the key (text)
-        elif command.startswith('k+ '):
-            match = re.match(r'k\+ "(.*)" "(.*)"', command)
-            if match:
-                text, new_data = match.groups()
-                for idx, line in enumerate(lines):
-                    if text in line and ':' in line.split(text)[0]:  # Key domain check
-                        old_value = line.strip()
-                        lines[idx] = line.strip() + " " + new_data + "\n"
-                        changes.append((idx + 1, old_value, lines[idx].strip(), "insertion after key"))
-
-        # Handle "+v" to insert new text before the value (text)
-        elif command.startswith('+v '):
-            match = re.match(r'\+v "(.*)" "(.*)"', command)
-            if match:
-                text, new_data = match.groups()
-                for idx, line in enumerate(lines):
-                    if ':' in line and text in line.split(':', 1)[1]:  # Value domain check
-                        old_value = line.strip()
-                        key, value = line.split(':', 1)  # Split key and value at the first colon
-                        new_value = key + ": " + new_data + "" + value.strip()
-                        lines[idx] = new_value + "\n"
-                        changes.append((idx + 1, old_value, lines[idx].strip(), "insertion before value"))
-
-        # Handle "v+" to insert new text after the value (text)
-        elif command.startswith('v+ '):
-            match = re.match(r'v\+ "(.*)" "(.*)"', command)
-            if match:
-                text, new_data = match.groups()
-                for idx, line in enumerate(lines):
-                    if ':' in line and text in line.split(':', 1)[1]:  # Value domain check
-                        old_value = line.strip()
-                        key, value = line.split(':', 1)  # Split key and value at the first colon
-                        new_value = key + ": " + value.strip() + " " + new_data
-                        lines[idx] = new_value
-                        changes.append((idx + 1, old_value, lines[idx].strip(), "insertion after value"))
-
-    return lines, changes
-
 # Step 5: Output the changes made
 def report_changes(changes, initial_lines, initial_chars, final_lines, final_chars):
     if not changes:
@@ -1,9 +1,14 @@
 import yaml
 import os
 import shutil  # Used to copy the BADGE_FILE_NAME file
+import sys
 import imgkit
 from PIL import Image
 
+# The transparency pass is the one of the htb_badge package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from htb_badge.render import make_white_transparent
+
 # Get environment variables
 ROOT_DIR = os.environ.get('ROOT_DIR')
 DATA_PATH = os.environ.get('DATA_PATH')
@@ -13,6 +18,7 @@ PNG_FILE_NAME = os.environ.get('PNG_FILE_NAME')
 PNG_FILE_OUTPUT = os.environ.get('PNG_FILE_OUTPUT')
 TEMPLATE_DEFAULT = os.environ.get('TEMPLATE_DEFAULT')
 DATA_FILE_YML = os.environ.get('DATA_FILE_YML')
+CHROMA_KEY_TOLERANCE = int(os.environ.get('CHROMA_KEY_TOLERANCE', 0))
 
 # Check if required environment variables are set
 if not all([ROOT_DIR, DATA_PATH, BADGE_FILE_NAME, BADGE_FILE_HTML, PNG_FILE_NAME, PNG_FILE_OUTPUT, TEMPLATE_DEFAULT]):
@@ -84,21 +90,9 @@ def html_to_png_with_transparency(BADGE_FILE_HTML, PNG_FILE_OUTPUT):
         return
 
     # Step 3: Open the PNG image and process the transparency
-    img = Image.open(PNG_FILE_OUTPUT)
-    img = img.convert("RGBA")  # Ensure the image is in RGBA mode
-
-    # Create a new data array for the modified image
-    new_data = []
-    
-    for item in img.getdata():
-        # Check if the pixel is white (R=255, G=255, B=255)
-        if item[:3] == (255, 255, 255):  # Pure white
-            new_data.append((255, 255, 255, 0))  # Make it fully transparent
-        else:
-            new_data.append(item)  # Keep original pixels
+    img = make_white_transparent(Image.open(PNG_FILE_OUTPUT), CHROMA_KEY_TOLERANCE)
 
-    # Apply the new data to the image and save it
-    img.putdata(new_data)
+    # Save the image
     img.save(PNG_FILE_OUTPUT, "PNG")
     # print(f"\nConverted {BADGE_FILE_HTML} to PNG with transparent background saved as {PNG_FILE_OUTPUT}")
 
@@ -0,0 +1,31 @@
+# Lets the tests import htb_badge (and the benchmark helpers) from a plain `python -m pytest` at the repository root
+
+import os
+import sys
+import shutil
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (ROOT_DIR, os.path.join(ROOT_DIR, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory holding a copy of the assets, so data/ and the caches are created there."""
+    shutil.copytree(os.path.join(ROOT_DIR, 'assets'), tmp_path / 'assets')
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    """The benchmarks' stand-in for the API serving the small fixtures, with config.API_URL pointed at it."""
+    from fixtures import load_payloads
+    from stub_api import StubApi
+    from htb_badge import config
+
+    with StubApi(load_payloads('small')) as stub:
+        monkeypatch.setattr(config, 'API_URL', stub.url)
+        yield stub
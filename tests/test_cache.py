@@ -0,0 +1,48 @@
+# HTTP cache of the API responses
+
+import json
+
+import requests
+
+from htb_badge.cache import HttpCache
+from htb_badge.client import RateLimiter
+
+class FakeSession:
+    """Answers every GET with the next (status, body) of `responses` and keeps the headers it was sent."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent_headers = []
+
+    def get(self, url, headers=None, timeout=None):
+        status, body = self.responses.pop(0)
+        self.sent_headers.append(dict(headers or {}))
+        response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response._content = json.dumps(body).encode() if body is not None else b''
+        response.headers['ETag'] = '"v1"'
+        return response
+
+def make_cache(tmp_path, monkeypatch):
+    import htb_badge.client
+
+    monkeypatch.setattr(htb_badge.client, 'api_rate_limiter', RateLimiter(rate=0))
+    return HttpCache(str(tmp_path / 'http'), adaptive=False)
+
+def test_hit_and_revalidation(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch)
+    session = FakeSession((200, {'a': 1}), (304, None))
+    assert cache.fetch(session, 'https://api.example/x', ttl=60) == (200, {'a': 1})
+    assert cache.fetch(session, 'https://api.example/x', ttl=60) == (200, {'a': 1})
+    assert cache.stats['hits'] == 1
+    cache.clock = lambda: 10 ** 12
+    assert cache.fetch(session, 'https://api.example/x', ttl=60) == (200, {'a': 1})
+    assert session.sent_headers[-1] == {'If-None-Match': '"v1"'}
+    assert cache.stats['revalidated'] == 1
+
+def test_304_without_entry_is_retried(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch)
+    session = FakeSession((304, None), (200, {'a': 2}))
+    assert cache.fetch(session, 'https://api.example/y', ttl=60) == (200, {'a': 2})
+    assert session.sent_headers == [{}, {}]
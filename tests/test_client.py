@@ -0,0 +1,12 @@
+# Rate limiter of the API client
+
+from htb_badge.client import RateLimiter
+from htb_badge.config import API_BACKOFF_MAX
+
+def test_retry_after_is_the_rest_of_the_pause():
+    limiter = RateLimiter(rate=0)
+    assert limiter.retry_after() == 1
+    limiter.pause(2.5)
+    assert limiter.retry_after() == 3
+    limiter.pause(API_BACKOFF_MAX * 10)
+    assert limiter.retry_after() == API_BACKOFF_MAX
@@ -0,0 +1,51 @@
+# Every dataset format reads back what was written
+
+import pytest
+
+from htb_badge.common import BadgeError
+from htb_badge.dataset import DATASET_STORES, get_dataset_store, get_dataset_store_for
+
+DATASET = {
+    'last_update': '18 Oct 2026, 10:00:00 (UTC+00:00)',
+    'user_name': 'bøb "the" hacker',
+    'user_points': 1234,
+    'user_ranking': -1,
+    'user_ratio': 0.75,
+    'user_vip': True,
+    'user_banned': False,
+    'user_team': None,
+    'user_empty': '',
+    'user_big': 2 ** 62,
+    'user_tags': ['a', 'b'],
+    'user_profile_activity_1_date_diff': '2 days ago',
+}
+
+@pytest.fixture(params=sorted(DATASET_STORES))
+def store(request):
+    return DATASET_STORES[request.param]
+
+def test_round_trip(store, tmp_path):
+    path = str(tmp_path / store.file_name)
+    store.write(path, DATASET)
+    assert store.read(path) == DATASET
+
+def test_get_subset(store, tmp_path):
+    path = str(tmp_path / store.file_name)
+    store.write(path, DATASET)
+    assert store.get(path, ['user_points', 'missing', 'user_team', 'user_name']) == {
+        'user_points': 1234, 'user_team': None, 'user_name': DATASET['user_name']}
+
+def test_rewrite_replaces_index(store, tmp_path):
+    path = str(tmp_path / store.file_name)
+    store.write(path, DATASET)
+    store.get(path, ['user_name'])
+    store.write(path, {'user_name': 'alice', 'user_points': 1})
+    assert store.get(path, ['user_name', 'user_ratio']) == {'user_name': 'alice'}
+
+def test_store_lookup():
+    assert get_dataset_store_for('data/dataset.bin') is get_dataset_store('binary')
+    assert get_dataset_store_for('dataset.yaml') is get_dataset_store('yaml')
+    with pytest.raises(BadgeError):
+        get_dataset_store('xml')
+    with pytest.raises(BadgeError):
+        get_dataset_store_for('dataset.xml')
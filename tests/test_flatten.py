@@ -0,0 +1,51 @@
+# Flattening of the API responses into the single-level dataset
+
+import json
+
+import pytest
+
+from htb_badge.common import BadgeError
+from htb_badge.flatten import flatten_json, flatten_json_files, flatten_response, iter_json_objects
+
+def test_flatten_nested_dicts_and_lists():
+    data = {'profile': {'name': 'bob', 'team': {'id': 7}}, 'labs': [{'name': 'a'}, {'name': 'b'}], 'tags': []}
+    assert flatten_json(data) == {'profile_name': 'bob', 'profile_team_id': 7, 'labs_0_name': 'a', 'labs_1_name': 'b'}
+
+def test_flatten_keeps_document_order_and_prefix():
+    data = {'b': 1, 'a': {'z': 2, 'y': [3, 4]}, 'c': 5}
+    assert list(flatten_json(data, prefix='user_')) == ['user_b', 'user_a_z', 'user_a_y_0', 'user_a_y_1', 'user_c']
+
+def test_flatten_scalar_and_list_limit():
+    assert flatten_json(42, parent_key='answer') == {'answer': 42}
+    assert flatten_json({'items': [1, 2, 3]}, max_list_items=2) == {'items_0': 1, 'items_1': 2}
+
+def test_flatten_deep_nesting_without_recursion():
+    data = leaf = {}
+    for _ in range(5000):
+        leaf['n'] = {}
+        leaf = leaf['n']
+    leaf['n'] = 1
+    flat = flatten_json(data)
+    assert list(flat.values()) == [1]
+    assert list(flat)[0] == '_'.join(['n'] * 5001)
+
+def test_flatten_into_shared_mapping():
+    out = {}
+    flatten_response('user', {'profile': {'name': 'bob'}}, out)
+    flatten_response('team_bracket', {'rank': 3}, out)
+    assert out == {'user_profile_name': 'bob', 'team_rank': 3}
+
+def test_iter_json_objects_concatenated():
+    text = '{"a": 1}\n{"b": [1, 2]}  \n\n 3'
+    assert list(iter_json_objects(text)) == [{'a': 1}, {'b': [1, 2]}, 3]
+
+def test_flatten_json_files(tmp_path):
+    (tmp_path / 'UD2user_os.json').write_text(json.dumps({'os': ['linux']}))
+    (tmp_path / 'UD1user.json').write_text(json.dumps({'profile': {'id': 1}}, indent=4))
+    (tmp_path / 'UT10team.json').write_text(json.dumps({'name': 'red'}))
+    assert list(flatten_json_files(str(tmp_path)).items()) == [('user_profile_id', 1), ('user_os_0', 'linux'), ('team_name', 'red')]
+
+def test_flatten_json_files_malformed(tmp_path):
+    (tmp_path / 'UD1user.json').write_text('{"profile": ')
+    with pytest.raises(BadgeError):
+        flatten_json_files(str(tmp_path))
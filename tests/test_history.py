@@ -0,0 +1,82 @@
+# Metric history: delta-encoded samples read back as the full series
+
+from htb_badge import pipeline
+from htb_badge.fetch import plan_endpoints
+from htb_badge.history import DURATION_UNITS, HistoryStore, history_store
+
+DAY = DURATION_UNITS['d']
+START = 1_700_000_000 // DAY * DAY
+
+# Daily snapshots of a user, most of them repeating the previous values
+SNAPSHOTS = [(START + day * DAY, {'user_points': points, 'user_ranking': ranking})
+             for day, (points, ranking) in enumerate([(10, 500), (10, 500), (12, 480), (12, 480), (12, 470), (20, 470)])]
+
+def make_store(tmp_path, **kwargs):
+    store = HistoryStore(str(tmp_path / 'history.db'), **kwargs)
+    store.record_many([(1, ts, values) for ts, values in SNAPSHOTS])
+    return store
+
+def test_only_changes_are_stored(tmp_path):
+    store = make_store(tmp_path)
+    assert store.stats['samples'] == 6
+    assert store.stats['unchanged'] == 6
+    assert store.series(1, 'user_points') == [(START, 10), (START + 2 * DAY, 12), (START + 5 * DAY, 20)]
+    assert store.tracked(1) == (START, START + 5 * DAY)
+    store.close()
+
+def test_round_trip_every_snapshot(tmp_path):
+    store = make_store(tmp_path)
+    for ts, values in SNAPSHOTS:
+        for metric, value in values.items():
+            assert store.value_at(1, metric, ts) == value
+            assert store.value_at(1, metric, ts + DAY // 2) == value
+    assert store.value_at(1, 'user_points', START - 1) is None
+    assert store.latest(1) == SNAPSHOTS[-1][1]
+    store.close()
+
+def test_round_trip_after_reopen(tmp_path):
+    make_store(tmp_path).close()
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    assert store.record(1, {'user_points': 20, 'user_ranking': 470}, START + 6 * DAY) == 0
+    assert store.record(1, {'user_points': 21, 'user_ranking': 470}, START + 7 * DAY) == 1
+    assert store.series(1, 'user_points', START + 3 * DAY) == [(START + 3 * DAY, 12), (START + 5 * DAY, 20), (START + 7 * DAY, 21)]
+    store.close()
+
+def test_downsample_and_change(tmp_path):
+    store = make_store(tmp_path)
+    assert store.downsample(1, 'user_ranking', START, START + 5 * DAY, DAY) == [
+        (START + day * DAY, ranking) for day, ranking in enumerate([500, 500, 480, 480, 470, 470])]
+    assert store.change(1, 'user_points', 30 * DAY, now=START + 5 * DAY) == 10
+    assert store.change(1, 'user_ranking', 2 * DAY, now=START + 5 * DAY) == -10
+    assert store.change(1, 'user_respects', 30 * DAY, now=START + 5 * DAY) is None
+    store.close()
+
+def test_compact_keeps_values(tmp_path):
+    store = make_store(tmp_path, retention='1d:2d')
+    store.record(1, {'user_points': 25}, START + 5 * DAY + 3600)
+    now = START + 10 * DAY
+    expected = {ts: store.value_at(1, 'user_points', ts) for ts in range(START, now, 2 * DAY)}
+    assert store.compact(now) == 1
+    assert {ts: store.value_at(1, 'user_points', ts) for ts in expected} == expected
+    assert store.series(1, 'user_points') == [(START, 10), (START + 2 * DAY, 12), (START + 5 * DAY + 3600, 25)]
+    store.close()
+
+def test_plan_adds_history_endpoints():
+    assert list(plan_endpoints(['user_name'])) == ['user']
+    assert list(plan_endpoints(['user_name'], history=True)) == ['user', 'user_os', 'user_challenges']
+
+def test_planned_run_records_history_groups(workdir, stub_api, monkeypatch):
+    monkeypatch.setattr(history_store, 'path', str(workdir / 'history.db'))
+    monkeypatch.setattr(history_store, 'enabled', True)
+    monkeypatch.setattr(pipeline, 'render_badge', lambda *args: True)
+    try:
+        pipeline.generate_badge('1', 'badge-default.html', force=True)
+        metrics = history_store.metrics(1)
+    finally:
+        history_store.close()
+
+    assert any(path.startswith('/api/v4/profile/progress/machines/os/') for path in stub_api.paths)
+    assert not any(path.startswith('/api/v4/profile/progress/sherlocks/') for path in stub_api.paths)
+    assert 'user_os_Linux_owned_machines' in metrics
+    assert any(metric.startswith('user_challenge_cat_') and metric.endswith('_owned_flags') for metric in metrics)
+    assert 'user_points' in metrics
@@ -0,0 +1,20 @@
+# Cold import of the package: fast, lazy and side-effect free (the checks of benchmarks/bench_import.py)
+
+import os
+
+from bench_import import import_time
+
+# Median cold import of htb_badge.cli allowed, generous enough for a slow CI runner
+IMPORT_TIME_LIMIT_MS = float(os.environ.get('IMPORT_TIME_LIMIT_MS', 500))
+
+def test_cli_import_time(tmp_path):
+    totals = []
+    for _ in range(3):
+        timings, loaded = import_time('htb_badge.cli', str(tmp_path))
+        assert loaded == [], f"importing htb_badge.cli loaded {', '.join(loaded)}"
+        totals.append(timings['htb_badge.cli'][1] / 1000)
+    assert sorted(totals)[1] <= IMPORT_TIME_LIMIT_MS
+
+def test_import_creates_nothing(tmp_path):
+    import_time('htb_badge', str(tmp_path))
+    assert os.listdir(tmp_path) == []
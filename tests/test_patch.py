@@ -0,0 +1,53 @@
+# Dataset clean-up rules: the YAML text path and the in-memory path must agree
+
+from htb_badge.config import PATCH_COMMANDS
+from htb_badge.patch import PatchRules, add_metadata, append_metadata
+
+DATASET = {
+    'user_profile_id': 1,
+    'user_profile_name': 'bob',
+    'user_profile_avatar_thumb': '/storage/avatars/bob.png',
+    'user_profile_sso_id': 12,
+    'user_profile_user_rank': 'Pro Hacker',
+    'user_profile_activity_1_date_diff': '2 days ago',
+    'user_machines_attack_paths_web_solved': 4,
+    'user_os_operating_systems_0_name': 'Linux',
+    'user_challenges_challenge_categories_0_name': 'Crypto',
+    'user_prolabs_0_name': "Window's Infinity",
+    'user_respects': 3,
+}
+
+def to_lines(data):
+    return [f"{key}: {value}\n" for key, value in data.items()]
+
+def test_mapping_matches_text():
+    rules = PatchRules(PATCH_COMMANDS)
+    lines, line_changes = rules.apply_to_lines(to_lines(DATASET))
+    data, mapping_changes = rules.apply_to_mapping(DATASET)
+
+    assert [line for line in lines if line] == to_lines(data)
+    assert [change[1:] for change in mapping_changes] == [change[1:] for change in line_changes]
+
+def test_default_rules():
+    data, _ = PatchRules(PATCH_COMMANDS).apply_to_mapping(DATASET)
+    assert 'user_profile_sso_id' not in data and 'user_sso_id' not in data
+    assert data['user_avatar'] == 'https://labs.hackthebox.com/storage/avatars/bob.png'
+    assert data['user_rank'] == 'Pro Hacker'
+    assert data['user_machinesap_web_solved'] == 4
+    assert data['user_os_os_0_name'] == 'Linux'
+    assert data['user_challenges_challenge_cat_0_name'] == 'Crypto'
+    assert data['user_prolabs_0_name'] == 'Windows Infinity'
+
+def test_silent_and_invalid_commands():
+    rules = PatchRules(['silent -c "bob" "alice"', 'bogus "x"'])
+    data, changes = rules.apply_to_mapping({'user_name': 'bob'})
+    assert data == {'user_name': 'alice'}
+    assert changes == []
+    assert len(rules.rules) == 1
+
+def test_metadata_matches_text():
+    data = add_metadata(DATASET)
+    lines = append_metadata(to_lines(DATASET))
+    assert list(data)[:2] == ['last_update', 'last_activity']
+    assert lines[1] == "last_activity: 2 days ago\n"
+    assert lines[2:] == to_lines(DATASET)
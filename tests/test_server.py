@@ -0,0 +1,66 @@
+# --serve against the stub API
+
+import time
+import threading
+
+import pytest
+import requests
+
+from htb_badge import render, svg
+from htb_badge.history import history_store
+from htb_badge.server import BadgeCache, BadgeServer
+
+@pytest.fixture
+def serve(workdir, stub_api, monkeypatch):
+    """Start a BadgeServer on a free port; call the fixture with a BadgeCache to use, returns the server's base URL."""
+    monkeypatch.setattr(history_store, 'enabled', False)
+    monkeypatch.setattr(render, 'get_icon_references', lambda: svg.get_icon_references('off'))
+    servers = []
+
+    def start(cache=None):
+        server = BadgeServer(port=0, workers=2, cache=cache)
+        threading.Thread(target=server.httpd.serve_forever, daemon=True).start()
+        servers.append(server)
+        host, port = server.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    yield start
+    for server in servers:
+        server.httpd.shutdown()
+        server.httpd.server_close()
+
+def test_badge_then_cache_hit(serve, stub_api):
+    url = serve()
+    response = requests.get(f'{url}/badge/1.svg?template=compact')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'image/svg+xml'
+    assert response.headers['X-Badge-Cache'] == 'miss'
+    assert response.content.startswith(b'<svg')
+    api_requests = stub_api.requests
+
+    cached = requests.get(f'{url}/badge/1.svg?template=compact')
+    assert cached.status_code == 200
+    assert cached.headers['X-Badge-Cache'] == 'hit'
+    assert cached.content == response.content
+    assert stub_api.requests == api_requests
+    assert requests.get(f'{url}/healthz').json()['hits'] == 1
+
+@pytest.mark.parametrize('user_id, api_status, status', [
+    ('2', 403, 404),    # Private profile
+    ('3', 429, 503),    # Still throttled after the retries
+    ('4', 500, 502),    # API error
+])
+def test_error_status(serve, stub_api, user_id, api_status, status):
+    stub_api.statuses[f'/api/v4/profile/{user_id}'] = api_status
+    url = serve()
+    response = requests.get(f'{url}/badge/{user_id}.svg')
+    assert response.status_code == status
+    assert 'error' in response.json()
+    assert ('Retry-After' in response.headers) == (status == 503)
+
+def test_cache_ttl_expiry(serve):
+    url = serve(BadgeCache(ttl=0.5))
+    assert requests.get(f'{url}/badge/1.svg').headers['X-Badge-Cache'] == 'miss'
+    assert requests.get(f'{url}/badge/1.svg').headers['X-Badge-Cache'] == 'hit'
+    time.sleep(0.6)
+    assert requests.get(f'{url}/badge/1.svg').headers['X-Badge-Cache'] == 'miss'
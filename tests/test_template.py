@@ -0,0 +1,53 @@
+# Remote template assets: local copy naming and refresh
+
+from threading import Thread
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from htb_badge.template import fetch_asset, get_asset_path, localize_assets
+
+@pytest.fixture
+def asset_server():
+    """Serves the bytes in `server.content` for any path."""
+    class AssetHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/svg+xml')
+            self.send_header('Content-Length', str(len(server.content)))
+            self.end_headers()
+            self.wfile.write(server.content)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), AssetHandler)
+    server.content = b'<svg/>'
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_asset_paths_do_not_collide():
+    urls = ['https://a.example/images/logo.svg', 'https://b.example/images/logo.svg',
+            'https://a.example/other/logo.svg', 'https://a.example/images/logo.svg?v=2']
+    assert len({get_asset_path(url) for url in urls}) == len(urls)
+    assert get_asset_path('https://a.example/images/logo.svg').endswith('a.example/images/logo.svg')
+    assert '..' not in get_asset_path('https://a.example/../../etc/passwd')
+
+def test_fetch_asset_reuses_then_refreshes(workdir, asset_server):
+    url = f'http://127.0.0.1:{asset_server.server_address[1]}/icons/ic-points.svg'
+    path = fetch_asset(url)
+    asset_server.content = b'<svg version="2"/>'
+    assert fetch_asset(url) == path
+    assert open(path, 'rb').read() == b'<svg/>'
+    assert fetch_asset(url, refresh=True) == path
+    assert open(path, 'rb').read() == b'<svg version="2"/>'
+
+def test_localize_assets_inline(workdir, asset_server):
+    url = f'http://127.0.0.1:{asset_server.server_address[1]}/logo.svg'
+    content, unresolved = localize_assets(f'<img src="{url}"><a href="{url}">', 'inline')
+    assert unresolved == []
+    assert content.startswith('<img src="data:image/svg+xml;base64,')
+    assert content.endswith(f'<a href="{url}">')
@@ -0,0 +1,30 @@
+# Record/replay transport
+
+from htb_badge import pipeline
+from htb_badge.cache import http_cache
+from htb_badge.history import history_store
+from htb_badge.transport import set_transport
+
+def test_record_bypasses_fresh_cache_entries(workdir, stub_api, monkeypatch):
+    monkeypatch.setattr(history_store, 'enabled', False)
+    monkeypatch.setattr(pipeline, 'render_badge', lambda *args: True)
+    monkeypatch.setattr(http_cache, 'enabled', True)
+    pipeline.generate_badge('1', 'badge-default.html')
+    requests_before = stub_api.requests
+
+    cassette = set_transport('record', str(workdir / 'cassette'))
+    try:
+        assert not http_cache.enabled
+        pipeline.generate_badge('1', 'badge-default.html')
+    finally:
+        set_transport('live')
+    assert stub_api.requests == 2 * requests_before
+    assert cassette.stats['recorded'] == requests_before
+
+    cassette = set_transport('replay', str(workdir / 'cassette'))
+    try:
+        monkeypatch.setattr(http_cache, 'enabled', False)
+        pipeline.generate_badge('1', 'badge-default.html')
+    finally:
+        set_transport('live')
+    assert cassette.stats == {'recorded': 0, 'replayed': requests_before, 'missing': 0}